@@ -0,0 +1,47 @@
+"""add spot favourite counts
+
+Revision ID: 5e1d8f3b6a27
+Revises: 9c2e5b7a1f84
+Create Date: 2026-10-18 19:05:52.604718
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5e1d8f3b6a27"
+down_revision: str | None = "9c2e5b7a1f84"
+branch_labels: str | (Sequence[str] | None) = None
+depends_on: str | (Sequence[str] | None) = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "spots",
+        sa.Column("favourite_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(
+        "UPDATE spots SET favourite_count = "
+        "(SELECT count(*) FROM user_spots WHERE user_spots.spot_id = spots.id)"
+    )
+    op.create_index(
+        "ix_spots_favourite_count",
+        "spots",
+        [sa.text("favourite_count DESC"), "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_spots_country_favourite_count",
+        "spots",
+        ["country", sa.text("favourite_count DESC"), "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_spots_country_favourite_count", table_name="spots")
+    op.drop_index("ix_spots_favourite_count", table_name="spots")
+    op.drop_column("spots", "favourite_count")
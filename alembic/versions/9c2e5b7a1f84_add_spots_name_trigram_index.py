@@ -0,0 +1,33 @@
+"""add spots name trigram index
+
+Revision ID: 9c2e5b7a1f84
+Revises: f3a8c6b1d472
+Create Date: 2026-10-18 18:21:09.318245
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "9c2e5b7a1f84"
+down_revision: str | None = "f3a8c6b1d472"
+branch_labels: str | (Sequence[str] | None) = None
+depends_on: str | (Sequence[str] | None) = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # serves both the prefix (LIKE 'q%') and the similarity (%) filters
+    op.create_index(
+        "ix_spots_name_trgm",
+        "spots",
+        [sa.text("lower(name) gin_trgm_ops")],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_spots_name_trgm", table_name="spots")
@@ -0,0 +1,67 @@
+"""add spot conditions
+
+Revision ID: a6c4e2d9b813
+Revises: 5e1d8f3b6a27
+Create Date: 2026-10-18 20:14:37.552193
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a6c4e2d9b813"
+down_revision: str | None = "5e1d8f3b6a27"
+branch_labels: str | (Sequence[str] | None) = None
+depends_on: str | (Sequence[str] | None) = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "spot_conditions",
+        sa.Column("spot_id", sa.Integer(), nullable=False),
+        sa.Column("observed_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("wind_speed", sa.Float(), nullable=False),
+        sa.Column("gust", sa.Float(), nullable=True),
+        sa.Column("direction", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["spot_id"], ["spots.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("spot_id", "observed_at"),
+    )
+    op.create_index(
+        "ix_spot_conditions_observed_at",
+        "spot_conditions",
+        ["observed_at"],
+        unique=False,
+    )
+    op.create_table(
+        "spot_condition_rollups",
+        sa.Column("spot_id", sa.Integer(), nullable=False),
+        sa.Column("resolution", sa.String(), nullable=False),
+        sa.Column("bucket_start", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("readings", sa.Integer(), nullable=False),
+        sa.Column("wind_speed_sum", sa.Float(), nullable=False),
+        sa.Column("wind_speed_max", sa.Float(), nullable=False),
+        sa.Column("gust_max", sa.Float(), nullable=True),
+        sa.Column("direction_x", sa.Float(), nullable=False),
+        sa.Column("direction_y", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["spot_id"], ["spots.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("spot_id", "resolution", "bucket_start"),
+    )
+    op.create_index(
+        "ix_spot_condition_rollups_resolution_bucket",
+        "spot_condition_rollups",
+        ["resolution", "bucket_start"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_spot_condition_rollups_resolution_bucket",
+        table_name="spot_condition_rollups",
+    )
+    op.drop_table("spot_condition_rollups")
+    op.drop_index("ix_spot_conditions_observed_at", table_name="spot_conditions")
+    op.drop_table("spot_conditions")
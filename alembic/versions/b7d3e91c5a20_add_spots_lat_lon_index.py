@@ -0,0 +1,27 @@
+"""add spots lat lon index
+
+Revision ID: b7d3e91c5a20
+Revises: 44ff88520794
+Create Date: 2026-10-18 10:12:31.482915
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d3e91c5a20"
+down_revision: str | None = "44ff88520794"
+branch_labels: str | (Sequence[str] | None) = None
+depends_on: str | (Sequence[str] | None) = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_spots_latitude_longitude", "spots", ["latitude", "longitude"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_spots_latitude_longitude", table_name="spots")
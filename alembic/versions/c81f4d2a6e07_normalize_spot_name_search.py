@@ -0,0 +1,55 @@
+"""normalize spot name search
+
+Revision ID: c81f4d2a6e07
+Revises: a6c4e2d9b813
+Create Date: 2026-10-18 22:41:53.106824
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c81f4d2a6e07"
+down_revision: str | None = "a6c4e2d9b813"
+branch_labels: str | (Sequence[str] | None) = None
+depends_on: str | (Sequence[str] | None) = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    # names normalised like countries.normalize; unaccent() is only stable,
+    # so it is wrapped with the dictionary fixed to be usable in an index
+    op.execute(
+        r"""
+        CREATE FUNCTION spot_name_key(name text) RETURNS text
+        LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+        AS $$
+            SELECT lower(btrim(regexp_replace(
+                public.unaccent('public.unaccent'::regdictionary, name),
+                '\s+', ' ', 'g'
+            )))
+        $$
+        """
+    )
+    op.drop_index("ix_spots_name_trgm", table_name="spots")
+    # serves the prefix (LIKE 'q%'), word prefix (~) and similarity (%) filters
+    op.create_index(
+        "ix_spots_name_trgm",
+        "spots",
+        [sa.text("spot_name_key(name) gin_trgm_ops")],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_spots_name_trgm", table_name="spots")
+    op.create_index(
+        "ix_spots_name_trgm",
+        "spots",
+        [sa.text("lower(name) gin_trgm_ops")],
+        postgresql_using="gin",
+    )
+    op.execute("DROP FUNCTION spot_name_key(text)")
@@ -0,0 +1,47 @@
+"""add spot versions
+
+Revision ID: d41f7a2c9e63
+Revises: b7d3e91c5a20
+Create Date: 2026-10-18 14:37:05.216840
+
+"""
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d41f7a2c9e63"
+down_revision: str | None = "b7d3e91c5a20"
+branch_labels: str | (Sequence[str] | None) = None
+depends_on: str | (Sequence[str] | None) = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "spots",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "spots",
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    catalog_version = op.create_table(
+        "catalog_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.bulk_insert(catalog_version, [{"id": 1, "version": 1}])
+
+
+def downgrade() -> None:
+    op.drop_table("catalog_version")
+    op.drop_column("spots", "updated_at")
+    op.drop_column("spots", "version")
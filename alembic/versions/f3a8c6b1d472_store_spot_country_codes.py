@@ -0,0 +1,45 @@
+"""store spot country codes
+
+Revision ID: f3a8c6b1d472
+Revises: d41f7a2c9e63
+Create Date: 2026-10-18 16:02:44.671209
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+import pycountry
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f3a8c6b1d472"
+down_revision: str | None = "d41f7a2c9e63"
+branch_labels: str | (Sequence[str] | None) = None
+depends_on: str | (Sequence[str] | None) = None
+
+spots = sa.table("spots", sa.column("country", sa.String))
+
+
+def _convert(to_value) -> None:
+    connection = op.get_bind()
+    for (country,) in connection.execute(sa.select(spots.c.country).distinct()):
+        try:
+            new_value = to_value(pycountry.countries.lookup(country))
+        except LookupError:
+            # left as is, fails validation when the spot is next updated
+            continue
+        if new_value != country:
+            connection.execute(
+                spots.update()
+                .where(spots.c.country == country)
+                .values(country=new_value)
+            )
+
+
+def upgrade() -> None:
+    _convert(lambda country: country.alpha_2)
+
+
+def downgrade() -> None:
+    _convert(lambda country: country.name)
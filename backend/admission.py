@@ -0,0 +1,239 @@
+"""Admission control: per route class concurrency caps and load shedding.
+
+Every request belongs to a route class: the one its route declares with
+`route_class`, otherwise "read" for GET, HEAD and OPTIONS and "write" for
+the rest.
+
+    @router.post("/login")
+    @admission.route_class("auth")
+    def login(...): ...
+
+settings.admission_limits caps how many requests of a class are served at
+once and how many may wait for a turn. A request finding the queue full,
+or waiting longer than settings.admission_queue_timeout_seconds, is shed
+right away with 503 and Retry-After, so a storm of bcrypt-heavy logins
+queues behind its own cap instead of taking every threadpool thread and
+pool connection away from cheap reads.
+
+Classes in settings.admission_rate_limits are also rate limited per client
+address with token buckets; requests without a token get 429. Behind a
+proxy, run uvicorn with --forwarded-allow-ips so the address is the
+client's. Queue depths, requests in flight and shed requests are exported
+as Prometheus metrics.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from typing import TypeVar
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .config import settings
+
+F = TypeVar("F", bound=Callable)
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# buckets kept per route class, the least recently seen client is dropped
+MAX_TRACKED_CLIENTS = 100_000
+
+QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for a turn.",
+    ["route_class"],
+    multiprocess_mode="livesum",
+)
+IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Requests admitted and being served.",
+    ["route_class"],
+    multiprocess_mode="livesum",
+)
+QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds",
+    "Time admitted requests waited for a turn.",
+    ["route_class"],
+)
+SHED = Counter(
+    "admission_shed",
+    "Requests rejected by admission control.",
+    ["route_class", "reason"],
+)
+
+
+def route_class(name: str) -> Callable[[F], F]:
+    """Declare the route class of a route, applied below its route decorator."""
+
+    def declare(endpoint: F) -> F:
+        endpoint.__route_class__ = name
+        return endpoint
+
+    return declare
+
+
+def classify(scope: Scope) -> str:
+    # routing has not run yet, so the routes are matched here
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            if name := getattr(
+                getattr(route, "endpoint", None), "__route_class__", None
+            ):
+                return name
+            break
+    return "read" if scope["method"] in SAFE_METHODS else "write"
+
+
+class Gate:
+    """At most `concurrency` holders, at most `queue_size` waiting in order."""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.active = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def enter(self, timeout: float) -> str | None:
+        """Take a slot, or return why the request is shed."""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        QUEUE_DEPTH.labels(self.name).inc()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # handed a slot just as the wait ended
+                if isinstance(e, TimeoutError):
+                    return None
+                self.leave()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                QUEUE_DEPTH.labels(self.name).dec()
+            if isinstance(e, TimeoutError):
+                return "queue_timeout"
+            raise
+        return None
+
+    def leave(self) -> None:
+        # the slot goes straight to the first waiter, active stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            QUEUE_DEPTH.labels(self.name).dec()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class TokenBuckets:
+    """A bucket per client, refilled with `rate` tokens a second up to `burst`."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        # client: (tokens, time of the last refill)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, client: str, now: float) -> float:
+        """Take a token; return 0, or the seconds until the client has one."""
+        tokens, refilled = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - refilled) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > MAX_TRACKED_CLIENTS:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionControl:
+    """Gates and token buckets of the route classes, built from settings."""
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self.gates: dict[str, Gate] = {}
+        self.buckets: dict[str, TokenBuckets] = {}
+
+    def gate(self, name: str) -> Gate | None:
+        if name not in self.gates and name in settings.admission_limits:
+            self.gates[name] = Gate(name, *settings.admission_limits[name])
+        return self.gates.get(name)
+
+    def token_buckets(self, name: str) -> TokenBuckets | None:
+        if name not in self.buckets and name in settings.admission_rate_limits:
+            self.buckets[name] = TokenBuckets(*settings.admission_rate_limits[name])
+        return self.buckets.get(name)
+
+
+admission_control = AdmissionControl()
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.admission_control:
+            await self.app(scope, receive, send)
+            return
+
+        name = classify(scope)
+        buckets = admission_control.token_buckets(name)
+        if buckets is not None:
+            client = scope["client"][0] if scope.get("client") else ""
+            if wait := buckets.take(client, time.monotonic()):
+                SHED.labels(name, "rate_limited").inc()
+                await _reject(429, "Too many requests", wait)(scope, receive, send)
+                return
+
+        gate = admission_control.gate(name)
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        if reason := await gate.enter(settings.admission_queue_timeout_seconds):
+            SHED.labels(name, reason).inc()
+            await _reject(503, "Server is busy, try again later", 1)(
+                scope, receive, send
+            )
+            return
+        QUEUE_WAIT.labels(name).observe(time.perf_counter() - start)
+        in_flight = IN_FLIGHT.labels(name)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            in_flight.dec()
+            gate.leave()
@@ -0,0 +1,88 @@
+"""Catalog version counters and conditional GET helpers for spots resources.
+
+Every write to the spots table bumps the catalog version in the same
+transaction, so its value changes exactly when some spot representation
+changed, favourite counts included. ETags are derived from it (lists) or from
+the per-spot version (single spots) and checked against If-None-Match before
+any row is loaded.
+
+The geometry version only moves when spots are created, updated or deleted,
+not when their favourite counts change. The in-memory indexes built from
+positions and names follow it, so favourites do not make every worker reload
+them.
+"""
+
+from fastapi import Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import database, models
+
+CATALOG_ID = 1
+GEOMETRY_ID = 2
+
+
+def _version_query(counter: int):
+    return select(models.CatalogVersion.version).where(
+        models.CatalogVersion.id == counter
+    )
+
+
+def _bump(db: Session, counters: list[int]) -> dict[int, int]:
+    stmt = database.dialect_insert(db)(models.CatalogVersion).values(
+        [{"id": counter, "version": 1} for counter in counters]
+    )
+    return dict(
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[models.CatalogVersion.id],
+                set_={"version": models.CatalogVersion.version + 1},
+            ).returning(models.CatalogVersion.id, models.CatalogVersion.version)
+        ).all()
+    )
+
+
+def bump(db: Session) -> int:
+    """Increment the catalog version as part of the current transaction."""
+    return _bump(db, [CATALOG_ID])[CATALOG_ID]
+
+
+def bump_geometry(db: Session) -> int:
+    """Increment the catalog and geometry versions, return the geometry one."""
+    return _bump(db, [CATALOG_ID, GEOMETRY_ID])[GEOMETRY_ID]
+
+
+def current_version(db: Session) -> int:
+    return db.scalar(_version_query(CATALOG_ID)) or 0
+
+
+def geometry_version(db: Session) -> int:
+    return db.scalar(_version_query(GEOMETRY_ID)) or 0
+
+
+async def current_version_async(db: AsyncSession) -> int:
+    return await db.scalar(_version_query(CATALOG_ID)) or 0
+
+
+def catalog_etag(version: int) -> str:
+    return f'"catalog-{version}"'
+
+
+def spot_etag(spot_id: int, version: int) -> str:
+    return f'"spot-{spot_id}-{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (
+        candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
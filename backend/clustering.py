@@ -0,0 +1,199 @@
+"""Map-viewport tiling and per-tile spot clusters.
+
+Tiles follow the web mercator (slippy map) scheme used by map clients.
+Clusters of a tile are computed once from the lat/lon index and cached until
+a spot write touches that tile or the geometry version changes.
+"""
+
+import math
+import threading
+from collections.abc import Iterable
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from . import catalog, models
+from .cache import LRUCache
+
+MAX_MERCATOR_LATITUDE = 85.0511287798
+# zoom levels at or below this one are served as clusters
+CLUSTER_MAX_ZOOM = 10
+# every tile is split into 2**CLUSTER_GRID_BITS x 2**CLUSTER_GRID_BITS cells
+CLUSTER_GRID_BITS = 3
+MAX_VIEWPORT_TILES = 256
+
+Tile = tuple[int, int, int]
+Cluster = tuple[float, float, int]
+BBox = tuple[float, float, float, float]
+
+
+def tile_xy(latitude: float, longitude: float, zoom: int) -> tuple[int, int]:
+    n = 1 << zoom
+    latitude = max(-MAX_MERCATOR_LATITUDE, min(MAX_MERCATOR_LATITUDE, latitude))
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _tile_latitude(y: int, n: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> BBox:
+    """Return (min_lat, min_lon, max_lat, max_lon) of a tile."""
+    n = 1 << zoom
+    # edge rows also hold the spots clamped from beyond the mercator limit
+    north = 90.0 if y == 0 else _tile_latitude(y, n)
+    south = -90.0 if y == n - 1 else _tile_latitude(y + 1, n)
+    return south, x / n * 360.0 - 180.0, north, (x + 1) / n * 360.0 - 180.0
+
+
+def bbox_tile_columns(bbox: BBox, zoom: int) -> tuple[list[range], range]:
+    """
+    Return the tile x ranges and the y range covering a bounding box.
+
+    A box with min_lon > max_lon crosses the antimeridian and is covered
+    by two x ranges.
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    west, north = tile_xy(max_lat, min_lon, zoom)
+    east, south = tile_xy(min_lat, max_lon, zoom)
+    if min_lon <= max_lon:
+        columns = [range(west, east + 1)]
+    else:
+        columns = [range(west, 1 << zoom), range(0, east + 1)]
+    return columns, range(north, south + 1)
+
+
+def in_bbox(latitude: float, longitude: float, bbox: BBox) -> bool:
+    min_lat, min_lon, max_lat, max_lon = bbox
+    if not min_lat <= latitude <= max_lat:
+        return False
+    if min_lon <= max_lon:
+        return min_lon <= longitude <= max_lon
+    return longitude >= min_lon or longitude <= max_lon
+
+
+def bbox_filter(bbox: BBox):
+    """SQL filter over the (latitude, longitude) index."""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    latitude_filter = models.Spot.latitude.between(min_lat, max_lat)
+    if min_lon <= max_lon:
+        return latitude_filter & models.Spot.longitude.between(min_lon, max_lon)
+    return latitude_filter & or_(
+        models.Spot.longitude >= min_lon, models.Spot.longitude <= max_lon
+    )
+
+
+def cluster_points(points: Iterable[tuple[float, float]], zoom: int) -> list[Cluster]:
+    cells: dict[tuple[int, int], list[float]] = {}
+    for latitude, longitude in points:
+        cell = cells.setdefault(
+            tile_xy(latitude, longitude, zoom + CLUSTER_GRID_BITS), [0.0, 0.0, 0]
+        )
+        cell[0] += latitude
+        cell[1] += longitude
+        cell[2] += 1
+    return [(lat / count, lon / count, count) for lat, lon, count in cells.values()]
+
+
+class TileClusterCache:
+    """
+    Clusters per (zoom, x, y) tile.
+
+    Writes bump a generation counter, so a tile computed from a snapshot
+    that was read before a concurrent write is never stored. Tiles belong
+    to one geometry version: writes of this process invalidate their tiles
+    and move the cache to the version they committed, writes of other
+    workers only show up as a new version, which empties the cache.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self._tiles = LRUCache(maxsize)
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.version: int | None = None
+
+    def get(self, tile: Tile, version: int) -> list[Cluster] | None:
+        with self._lock:
+            if version != self.version:
+                self.generation += 1
+                self._tiles.clear()
+                self.version = version
+                return None
+        return self._tiles.get(tile)
+
+    def set(self, tile: Tile, clusters: list[Cluster], generation: int) -> None:
+        with self._lock:
+            if generation == self.generation:
+                self._tiles.set(tile, clusters)
+
+    def invalidate_point(self, latitude: float, longitude: float) -> None:
+        with self._lock:
+            self.generation += 1
+            for zoom in range(CLUSTER_MAX_ZOOM + 1):
+                self._tiles.delete((zoom, *tile_xy(latitude, longitude, zoom)))
+
+    def written(self, version: int) -> None:
+        """Record that a write of this process committed the given version.
+
+        Its tiles were invalidated already, the rest stay valid unless
+        another worker wrote since they were computed.
+        """
+        with self._lock:
+            if self.version == version - 1:
+                self.version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._tiles.clear()
+            self.version = None
+
+
+tile_cache = TileClusterCache()
+
+
+def _load_tiles(db: Session, zoom: int, tiles: list[Tile]) -> dict[Tile, list[Cluster]]:
+    """Compute clusters of the given tiles, all lying in one tile column range."""
+    xs = [x for _, x, _ in tiles]
+    ys = [y for _, _, y in tiles]
+    south, west, _, _ = tile_bounds(zoom, min(xs), max(ys))
+    _, _, north, east = tile_bounds(zoom, max(xs), min(ys))
+
+    points: dict[Tile, list[tuple[float, float]]] = {tile: [] for tile in tiles}
+    rows = db.query(models.Spot.latitude, models.Spot.longitude).filter(
+        bbox_filter((south, west, north, east))
+    )
+    for latitude, longitude in rows:
+        tile = (zoom, *tile_xy(latitude, longitude, zoom))
+        if tile in points:
+            points[tile].append((latitude, longitude))
+    return {
+        tile: cluster_points(tile_points, zoom) for tile, tile_points in points.items()
+    }
+
+
+def viewport_clusters(db: Session, bbox: BBox, zoom: int) -> list[Cluster]:
+    columns, rows = bbox_tile_columns(bbox, zoom)
+    if sum(len(xs) for xs in columns) * len(rows) > MAX_VIEWPORT_TILES:
+        raise ValueError("Viewport covers too many tiles for this zoom level")
+
+    version = catalog.geometry_version(db)
+    clusters: list[Cluster] = []
+    for xs in columns:
+        missing: list[Tile] = []
+        for x in xs:
+            for y in rows:
+                cached = tile_cache.get((zoom, x, y), version)
+                if cached is None:
+                    missing.append((zoom, x, y))
+                else:
+                    clusters.extend(cached)
+        if missing:
+            generation = tile_cache.generation
+            for tile, tile_clusters in _load_tiles(db, zoom, missing).items():
+                tile_cache.set(tile, tile_clusters, generation)
+                clusters.extend(tile_clusters)
+
+    return [cluster for cluster in clusters if in_bbox(cluster[0], cluster[1], bbox)]
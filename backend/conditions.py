@@ -0,0 +1,278 @@
+"""Wind readings of spots: group-committed ingestion, rollups and retention.
+
+Collectors push readings in batches. Batches arriving together are written
+in one transaction by GroupCommit: the first request of a group waits up to
+settings.conditions_commit_delay_ms for others to join, then writes all of
+their readings with its session, and every request of the group answers
+once that transaction is committed.
+
+Each write also adds the new readings to hourly and daily rollups, which is
+what queries read: the history of a spot and the windiest spots right now
+never touch raw readings. Raw readings and hourly rollups older than their
+retention are deleted by the writes themselves, at most once per
+PRUNE_INTERVAL_SECONDS.
+"""
+
+import asyncio
+import contextlib
+import math
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from typing import Literal, NamedTuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Row, delete, func, select
+from sqlalchemy.orm import Session
+
+from . import database, models
+from .config import settings
+
+Resolution = Literal["hour", "day"]
+
+PRUNE_INTERVAL_SECONDS = 3600
+
+_last_prune = -math.inf
+
+
+class Written(NamedTuple):
+    # (spot_id, observed_at) of the readings stored by this write
+    inserted: set[tuple[int, datetime]]
+    known_spots: set[int]
+
+
+def utc(value: datetime) -> datetime:
+    """UTC datetime, naive values (SQLite) are taken as UTC already."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value.astimezone(UTC)
+
+
+def bucket_start(observed_at: datetime, resolution: Resolution) -> datetime:
+    start = utc(observed_at).replace(minute=0, second=0, microsecond=0)
+    return start.replace(hour=0) if resolution == "day" else start
+
+
+def _increments(readings: list[Row]) -> list[dict]:
+    """Rollup rows holding the sums of the readings of each bucket."""
+    buckets: dict[tuple[int, str, datetime], dict] = {}
+    for reading in readings:
+        radians = math.radians(reading.direction)
+        for resolution in ("hour", "day"):
+            start = bucket_start(reading.observed_at, resolution)
+            row = buckets.setdefault(
+                (reading.spot_id, resolution, start),
+                {
+                    "spot_id": reading.spot_id,
+                    "resolution": resolution,
+                    "bucket_start": start,
+                    "readings": 0,
+                    "wind_speed_sum": 0.0,
+                    "wind_speed_max": 0.0,
+                    "gust_max": None,
+                    "direction_x": 0.0,
+                    "direction_y": 0.0,
+                },
+            )
+            row["readings"] += 1
+            row["wind_speed_sum"] += reading.wind_speed
+            row["wind_speed_max"] = max(row["wind_speed_max"], reading.wind_speed)
+            if reading.gust is not None:
+                row["gust_max"] = max(row["gust_max"] or 0.0, reading.gust)
+            row["direction_x"] += math.cos(radians)
+            row["direction_y"] += math.sin(radians)
+    # rows locked in the same order by every writer cannot deadlock
+    return [buckets[key] for key in sorted(buckets)]
+
+
+def _greatest(db: Session, a, b):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.greatest(a, b)
+    # SQLite's max() is NULL when either argument is
+    return func.max(func.coalesce(a, b), func.coalesce(b, a))
+
+
+def write_readings(db: Session, rows: list[dict]) -> Written:
+    """Store readings of known spots, add them to the rollups and commit."""
+    known_spots = set(
+        db.scalars(
+            select(models.Spot.id).where(
+                models.Spot.id.in_({row["spot_id"] for row in rows})
+            )
+        )
+    )
+    rows = [row for row in rows if row["spot_id"] in known_spots]
+    insert = database.dialect_insert(db)
+    try:
+        inserted = []
+        if rows:
+            inserted = db.execute(
+                insert(models.SpotCondition)
+                .on_conflict_do_nothing()
+                .returning(*models.SpotCondition.__table__.c),
+                rows,
+            ).all()
+        if increments := _increments(inserted):
+            rollup = models.SpotConditionRollup
+            stmt = insert(rollup)
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[
+                        rollup.spot_id,
+                        rollup.resolution,
+                        rollup.bucket_start,
+                    ],
+                    set_={
+                        "readings": rollup.readings + stmt.excluded.readings,
+                        "wind_speed_sum": rollup.wind_speed_sum
+                        + stmt.excluded.wind_speed_sum,
+                        "wind_speed_max": _greatest(
+                            db, rollup.wind_speed_max, stmt.excluded.wind_speed_max
+                        ),
+                        "gust_max": _greatest(
+                            db, rollup.gust_max, stmt.excluded.gust_max
+                        ),
+                        "direction_x": rollup.direction_x + stmt.excluded.direction_x,
+                        "direction_y": rollup.direction_y + stmt.excluded.direction_y,
+                    },
+                ),
+                increments,
+            )
+        _maybe_prune(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return Written(
+        {(reading.spot_id, utc(reading.observed_at)) for reading in inserted},
+        known_spots,
+    )
+
+
+def prune(db: Session, now: datetime) -> None:
+    """Delete raw readings and hourly rollups past their retention."""
+    db.execute(
+        delete(models.SpotCondition).where(
+            models.SpotCondition.observed_at
+            < now - timedelta(days=settings.conditions_raw_retention_days)
+        )
+    )
+    db.execute(
+        delete(models.SpotConditionRollup).where(
+            models.SpotConditionRollup.resolution == "hour",
+            models.SpotConditionRollup.bucket_start
+            < now - timedelta(days=settings.conditions_hourly_retention_days),
+        )
+    )
+
+
+def _maybe_prune(db: Session) -> None:
+    global _last_prune
+    if time.monotonic() - _last_prune >= PRUNE_INTERVAL_SECONDS:
+        prune(db, datetime.now(UTC))
+        _last_prune = time.monotonic()
+
+
+class _Group:
+    def __init__(self) -> None:
+        self.rows: list[dict] = []
+        self.full = asyncio.Event()
+        self.committed: asyncio.Future[Written] = (
+            asyncio.get_running_loop().create_future()
+        )
+
+
+class GroupCommit:
+    """Merges the readings of concurrent requests into one transaction."""
+
+    def __init__(
+        self, write: Callable[[Session, list[dict]], Written] = write_readings
+    ) -> None:
+        self._write = write
+        self._group: _Group | None = None
+
+    async def submit(self, db: Session, rows: list[dict]) -> Written:
+        """Write the rows with the rest of their group, return the group result."""
+        if (group := self._group) is not None:
+            group.rows.extend(rows)
+            if len(group.rows) >= settings.conditions_commit_max_rows:
+                # closed, later requests start the next group
+                self._group = None
+                group.full.set()
+            return await asyncio.shield(group.committed)
+
+        # first of its group: collect others for a while, then write them all
+        group = self._group = _Group()
+        group.rows.extend(rows)
+        try:
+            if len(group.rows) < settings.conditions_commit_max_rows:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(
+                        group.full.wait(), settings.conditions_commit_delay_ms / 1000
+                    )
+            if self._group is group:
+                self._group = None
+            written = await run_in_threadpool(self._write, db, group.rows)
+        except BaseException as e:
+            if self._group is group:
+                self._group = None
+            # the whole group fails with the leader: nothing is retried here,
+            # each client must resend its batch (stored readings are skipped)
+            group.committed.set_exception(
+                e if isinstance(e, Exception) else RuntimeError("group commit aborted")
+            )
+            # retrieved, so a failure nobody else waited for is not logged
+            group.committed.exception()
+            raise
+        group.committed.set_result(written)
+        return written
+
+
+def history(
+    db: Session, spot_id: int, resolution: Resolution, since: datetime
+) -> list[Row]:
+    rollup = models.SpotConditionRollup
+    return db.execute(
+        select(*rollup.__table__.c)
+        .where(
+            rollup.spot_id == spot_id,
+            rollup.resolution == resolution,
+            rollup.bucket_start >= since,
+        )
+        .order_by(rollup.bucket_start)
+    ).all()
+
+
+def windiest(db: Session, columns: list, now: datetime, limit: int) -> list[Row]:
+    """Spots by average wind over the current and previous hour."""
+    rollup = models.SpotConditionRollup
+    recent = (
+        select(
+            rollup.spot_id,
+            (func.sum(rollup.wind_speed_sum) / func.sum(rollup.readings)).label(
+                "wind_speed_avg"
+            ),
+            func.max(rollup.gust_max).label("gust_max"),
+            func.sum(rollup.direction_x).label("direction_x"),
+            func.sum(rollup.direction_y).label("direction_y"),
+        )
+        .where(
+            rollup.resolution == "hour",
+            rollup.bucket_start >= bucket_start(now, "hour") - timedelta(hours=1),
+        )
+        .group_by(rollup.spot_id)
+        .subquery()
+    )
+    return db.execute(
+        select(*columns, *recent.c[1:])
+        .join(recent, recent.c.spot_id == models.Spot.id)
+        .order_by(recent.c.wind_speed_avg.desc(), models.Spot.id)
+        .limit(limit)
+    ).all()
+
+
+def mean_direction(direction_x: float, direction_y: float) -> int:
+    return round(math.degrees(math.atan2(direction_y, direction_x))) % 360
+
+
+group_commit = GroupCommit()
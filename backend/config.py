@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import PostgresDsn
 
@@ -13,5 +15,82 @@ class Settings(BaseSettings):
     algorithm: str
     access_token_expire_minutes: int
 
+    # connection pool, defaults match SQLAlchemy's
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+
+    # read replicas serving the routes that depend on replicas.get_read_db,
+    # in turn; a replica refusing connections is skipped for a while
+    db_replica_dsns: list[str] = []
+    db_replica_retry_seconds: float = 30
+    # after a write, the client's reads go to the primary for this long,
+    # which should cover the replication lag
+    db_read_your_writes_seconds: float = 5
+
+    # bcrypt cost, stored hashes with another cost are rehashed on login
+    bcrypt_rounds: int = 12
+    # worker processes for password hashing, None for one per core, 0 inline
+    password_hash_workers: int | None = None
+    # hashing calls allowed to wait for a worker before answering 503
+    password_hash_queue_size: int = 16
+
+    # decoded tokens and authenticated users; changes made through another
+    # worker reach this one after at most auth_cache_ttl_seconds
+    auth_cache_size: int = 10_000
+    auth_cache_ttl_seconds: float = 60
+
+    # serialized spot read responses; "sqlite" shares them between the
+    # workers of a host through response_cache_path
+    response_cache_backend: Literal["memory", "sqlite", "none"] = "memory"
+    response_cache_size: int = 1024
+    response_cache_path: str = "/tmp/kitespots-response-cache.sqlite3"
+
+    # precomputed country table written by `python -m backend.countries`,
+    # built from pycountry on first use when unset
+    countries_file: str | None = None
+
+    # spot name search: "memory" keeps a process-local index updated on writes,
+    # "database" queries the pg_trgm index (Postgres only)
+    spot_search: Literal["memory", "database"] = "memory"
+
+    # spot conditions: readings of concurrent ingestion requests are committed
+    # together, the first request waits this long for others to join
+    conditions_commit_delay_ms: float = 50
+    # a group is written at once when it reaches this many readings
+    conditions_commit_max_rows: int = 5000
+    # raw readings and hourly rollups are deleted after this many days,
+    # daily rollups are kept
+    conditions_raw_retention_days: int = 7
+    conditions_hourly_retention_days: int = 90
+
+    # admission control, see backend/admission.py: per route class, requests
+    # served at once and requests waiting for a turn; more are shed with 503
+    admission_control: bool = True
+    admission_limits: dict[str, tuple[int, int]] = {
+        "auth": (4, 32),
+        "write": (32, 128),
+        "read": (128, 512),
+    }
+    admission_queue_timeout_seconds: float = 5
+    # per client token buckets: tokens a second and bucket size, by route class
+    admission_rate_limits: dict[str, tuple[float, int]] = {"auth": (1, 10)}
+
+    # open pool connections, spawn hashing workers and build the spot index
+    # and country table before serving, instead of on first use
+    startup_warmup: bool = False
+
+    # check the SQL statements of each request against the budget its route
+    # declares with query_budget.limit; "warn" logs, "raise" buffers responses
+    # and answers 500 instead when over budget (tests and development only)
+    query_budget: Literal["off", "warn", "raise"] = "off"
+    # times a request may run one statement before it is reported as N+1
+    query_budget_max_repeats: int = 3
+
+    # serve read-heavy routes from AsyncSession (asyncpg) instead of the threadpool
+    db_async: bool = False
+
 
 settings = Settings()  # type: ignore - issue with pylance, waiting for fix on github
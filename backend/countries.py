@@ -0,0 +1,80 @@
+"""Country validation against a precomputed lookup table.
+
+The table maps normalised country names (short, official and common) and
+ISO 3166 alpha-2/alpha-3 codes to the alpha-2 code, so validating a country
+is a single dict lookup. It is built from pycountry on first use, or read
+from settings.countries_file when set; write that file once with
+
+    python -m backend.countries backend/countries.json
+
+to keep pycountry out of the server process altogether.
+"""
+
+import json
+import sys
+import unicodedata
+from functools import cache
+from pathlib import Path
+from typing import Annotated
+
+from pydantic import AfterValidator, Field
+from pydantic_core import PydanticCustomError
+
+from .config import settings
+
+
+def normalize(value: str) -> str:
+    """Casefold, drop accents and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.split()).casefold()
+
+
+def build_table() -> dict[str, str]:
+    import pycountry
+
+    table = {}
+    for country in pycountry.countries:
+        for key in (
+            country.name,
+            getattr(country, "official_name", None),
+            getattr(country, "common_name", None),
+            country.alpha_3,
+            country.alpha_2,
+        ):
+            if key:
+                table[normalize(key)] = country.alpha_2
+    return table
+
+
+def write_table(path: str | Path) -> None:
+    Path(path).write_text(json.dumps(build_table(), ensure_ascii=False, indent=0))
+
+
+@cache
+def table() -> dict[str, str]:
+    if settings.countries_file:
+        return json.loads(Path(settings.countries_file).read_text())
+    return build_table()
+
+
+def to_alpha2(value: str) -> str | None:
+    return table().get(normalize(value))
+
+
+def _validate(value: str) -> str:
+    if code := to_alpha2(value):
+        return code
+    raise PydanticCustomError("country", "Invalid country name or ISO 3166 code")
+
+
+# accepts a country name or ISO 3166 code, stores the alpha-2 code
+CountryCode = Annotated[
+    str,
+    AfterValidator(_validate),
+    Field(examples=["PL", "Poland"], description="Country name or ISO 3166 code"),
+]
+
+
+if __name__ == "__main__":
+    write_table(sys.argv[1])
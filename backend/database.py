@@ -1,17 +1,112 @@
+from functools import cache
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from . import pool_metrics
 from .config import settings
 
-engine = create_engine(f"{settings.pg_dsn}")
-
-SessionLocal = sessionmaker(autocommit=False, bind=engine, autoflush=True)
+# sessions are bound once the engine is created, see get_engine
+SessionLocal = sessionmaker(autocommit=False, autoflush=True)
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
 
 
+def pool_options() -> dict:
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+# engines are created on first use rather than at import, which also defers
+# loading the database drivers until the app starts
+@cache
+def get_engine() -> Engine:
+    engine = create_engine(
+        f"{settings.pg_dsn}",
+        poolclass=pool_metrics.instrumented_pool_class(
+            QueuePool, pool_metrics.primary_pool_metrics
+        ),
+        **pool_options(),
+    )
+    pool_metrics.listen(engine, pool_metrics.primary_pool_metrics)
+    SessionLocal.configure(bind=engine)
+    return engine
+
+
+def async_url(dsn: str) -> URL:
+    """Point a DSN at the asyncio driver of its database."""
+    url = make_url(dsn)
+    backend = url.get_backend_name()
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}[backend]
+    return url.set(drivername=f"{backend}+{driver}")
+
+
+@cache
+def get_async_engine() -> AsyncEngine | None:
+    # only created when enabled, so asyncpg stays optional
+    if not settings.db_async:
+        return None
+    async_engine = create_async_engine(
+        async_url(f"{settings.pg_dsn}"),
+        poolclass=pool_metrics.instrumented_pool_class(
+            AsyncAdaptedQueuePool, pool_metrics.async_pool_metrics
+        ),
+        **pool_options(),
+    )
+    pool_metrics.listen(async_engine.sync_engine, pool_metrics.async_pool_metrics)
+    AsyncSessionLocal.configure(bind=async_engine)
+    return async_engine
+
+
+def __getattr__(name: str):
+    # database.engine and database.async_engine, created on first access
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def dispose() -> None:
+    """Close the pooled connections of the engines created so far."""
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+    if get_async_engine.cache_info().currsize and (async_engine := get_async_engine()):
+        await async_engine.dispose()
+
+
+def dialect_insert(db: Session):
+    """insert() of the session's dialect, for ON CONFLICT clauses."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,159 @@
+"""Vectorized great-circle distances between sets of points.
+
+Distances are haversine, computed with NumPy over whole coordinate arrays.
+Ranking a point set against the catalog uses unit vectors instead: for
+points on the unit sphere the haversine term equals (1 - u·v) / 2, so the
+dot products of a matrix product order spots exactly like their distances.
+Only the k best of each row are then measured with the haversine formula.
+
+The coordinates of the catalog are kept as arrays in CatalogArrays, loaded
+again once the geometry version changes. NumPy is slow to import, so the
+routes import this module on first use, see startup.DEFERRED_MODULES.
+"""
+
+import threading
+from collections.abc import Callable, Iterable
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .spatial import EARTH_RADIUS_KM
+
+# elements of one block of the point by catalog similarity matrix, 32 MiB
+BLOCK_ELEMENTS = 1 << 22
+
+
+def haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Distances in km between points given in degrees, broadcasting arrays."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_lam = np.radians(lon2) - np.radians(lon1)
+    a = (
+        np.sin((phi2 - phi1) / 2) ** 2
+        + np.cos(phi1) * np.cos(phi2) * np.sin(d_lam / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def haversine_matrix(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    other_latitudes: np.ndarray | None = None,
+    other_longitudes: np.ndarray | None = None,
+) -> np.ndarray:
+    """Distance of every point to every other point, or to the points given."""
+    if other_latitudes is None:
+        other_latitudes, other_longitudes = latitudes, longitudes
+    return haversine(
+        latitudes[:, None], longitudes[:, None], other_latitudes, other_longitudes
+    )
+
+
+def coordinate_arrays(
+    points: Iterable[tuple[float, float]],
+) -> tuple[np.ndarray, np.ndarray]:
+    """Latitude and longitude arrays of (latitude, longitude) pairs."""
+    table = np.array(list(points), dtype=np.float64).reshape(-1, 2)
+    return table[:, 0].copy(), table[:, 1].copy()
+
+
+def closest(
+    latitude: float,
+    longitude: float,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    limit: int,
+) -> list[tuple[int, float]]:
+    """(position, distance_km) of the `limit` points closest to one point."""
+    distances_km = haversine(latitude, longitude, latitudes, longitudes)
+    order = np.argsort(distances_km, kind="stable")[:limit]
+    return list(zip(order.tolist(), distances_km[order].tolist(), strict=True))
+
+
+def unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    phi, lam = np.radians(latitudes), np.radians(longitudes)
+    cos_phi = np.cos(phi)
+    return np.column_stack((cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)))
+
+
+class SpotArrays:
+    """Ids and coordinates of spots as parallel arrays."""
+
+    def __init__(self, rows: list[tuple[int, float, float]]) -> None:
+        table = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        self.ids = table[:, 0].astype(np.int64)
+        self.latitudes = table[:, 1].copy()
+        self.longitudes = table[:, 2].copy()
+        self.vectors = unit_vectors(self.latitudes, self.longitudes)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class Nearest(NamedTuple):
+    # positions in the SpotArrays, closest first; one row per query point
+    indices: np.ndarray
+    distances_km: np.ndarray
+
+
+def nearest(
+    spots: SpotArrays, latitudes: np.ndarray, longitudes: np.ndarray, k: int
+) -> Nearest:
+    """The k spots closest to each point."""
+    k = min(k, len(spots))
+    indices = np.empty((len(latitudes), k), dtype=np.intp)
+    if k:
+        queries = unit_vectors(latitudes, longitudes)
+        rows = max(1, BLOCK_ELEMENTS // len(spots))
+        for start in range(0, len(queries), rows):
+            similarity = queries[start : start + rows] @ spots.vectors.T
+            if k == 1:
+                best = similarity.argmax(axis=1)[:, None]
+            elif k < len(spots):
+                best = np.argpartition(similarity, -k, axis=1)[:, -k:]
+            else:
+                best = np.broadcast_to(np.arange(k), similarity.shape)
+            order = np.argsort(
+                -np.take_along_axis(similarity, best, axis=1), axis=1, kind="stable"
+            )
+            indices[start : start + rows] = np.take_along_axis(best, order, axis=1)
+    distances = haversine(
+        latitudes[:, None],
+        longitudes[:, None],
+        spots.latitudes[indices],
+        spots.longitudes[indices],
+    )
+    return Nearest(indices, distances)
+
+
+def load_rows(db: Session) -> list[tuple[int, float, float]]:
+    return db.execute(
+        select(models.Spot.id, models.Spot.latitude, models.Spot.longitude)
+    ).all()
+
+
+class CatalogArrays:
+    """The coordinates of every spot, as of one geometry version."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version: int | None = None
+            self._spots: SpotArrays | None = None
+
+    def get(
+        self, version: int, load_rows: Callable[[], list[tuple[int, float, float]]]
+    ) -> SpotArrays:
+        with self._lock:
+            if self._spots is None or self._version != version:
+                self._spots = SpotArrays(load_rows())
+                self._version = version
+            return self._spots
+
+
+catalog_arrays = CatalogArrays()
@@ -0,0 +1,77 @@
+"""Maintenance of the denormalized spots.favourite_count counter.
+
+Every write to user_spots adjusts the counter of the spots involved in the
+same transaction, so ranking spots by popularity is an index scan instead of
+a GROUP BY over user_spots. The counter is part of the spot representation:
+adjusting it also bumps the spot and catalog versions, changing their ETags,
+but not the geometry version the in-memory indexes follow.
+
+Counters drifting from user_spots, e.g. after rows were changed by hand,
+are corrected by the reconciliation job:
+
+    python -m backend.favourites
+"""
+
+from collections.abc import Collection
+
+from sqlalchemy import ColumnElement, func, select, update
+from sqlalchemy.orm import Session
+
+from . import catalog, database, models
+
+
+def _adjust(db: Session, condition: ColumnElement[bool], delta: int) -> list[int]:
+    adjusted = db.scalars(
+        update(models.Spot)
+        .where(condition)
+        .values(
+            favourite_count=models.Spot.favourite_count + delta,
+            version=models.Spot.version + 1,
+        )
+        .returning(models.Spot.id)
+    ).all()
+    if adjusted:
+        catalog.bump(db)
+    return adjusted
+
+
+def adjust(db: Session, spot_ids: Collection[int], delta: int) -> list[int]:
+    """Add `delta` to the counters of existing spots, return their ids."""
+    if not spot_ids:
+        return []
+    return _adjust(db, models.Spot.id.in_(spot_ids), delta)
+
+
+def forget_user(db: Session, user_id: int) -> None:
+    """Decrement the counters of a user's spots, call before deleting the user."""
+    _adjust(
+        db,
+        models.Spot.id.in_(
+            select(models.UserSpots.spot_id).where(models.UserSpots.user_id == user_id)
+        ),
+        -1,
+    )
+
+
+def reconcile(db: Session) -> int:
+    """Recount every counter from user_spots and commit, return the spots fixed."""
+    actual = (
+        select(func.count())
+        .where(models.UserSpots.spot_id == models.Spot.id)
+        .scalar_subquery()
+    )
+    fixed = db.execute(
+        update(models.Spot)
+        .where(models.Spot.favourite_count != actual)
+        .values(favourite_count=actual, version=models.Spot.version + 1)
+    ).rowcount
+    if fixed:
+        catalog.bump(db)
+    db.commit()
+    return fixed
+
+
+if __name__ == "__main__":
+    database.get_engine()
+    with database.SessionLocal() as db:
+        print(f"{reconcile(db)} spot counters fixed")
@@ -1,11 +1,28 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from .routers import users, auth, spots
+from fastapi.concurrency import run_in_threadpool
+from .routers import users, auth, spots, async_spots, async_users, admin, conditions
 from fastapi.middleware.cors import CORSMiddleware
+from . import admission, database, metrics, query_budget, replicas, startup, utils
+from .config import settings
 
 # done by alembic
 # models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # engines, the spot index and heavy modules are otherwise set up lazily
+    if settings.startup_warmup:
+        app.state.warmup_ms = await run_in_threadpool(startup.warm_up)
+    yield
+    utils.hashing_pool.shutdown()
+    await database.dispose()
+    replicas.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,10 +31,27 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(replicas.ReadYourWritesMiddleware)
+app.add_middleware(query_budget.QueryBudgetMiddleware)
+# inside metrics, so shed requests are recorded too
+app.add_middleware(admission.AdmissionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
+
+
+def include_routers(app: FastAPI, db_async: bool = False) -> None:
+    if db_async:
+        # registered first, so they shadow their sync counterparts
+        app.include_router(async_users.router)
+        app.include_router(async_spots.router)
+    app.include_router(users.router)
+    app.include_router(auth.router)
+    app.include_router(spots.router)
+    app.include_router(conditions.router)
+    app.include_router(admin.router)
+
 
-app.include_router(users.router)
-app.include_router(auth.router)
-app.include_router(spots.router)
+include_routers(app, settings.db_async)
 
 
 @app.get("/")
@@ -1,5 +1,14 @@
 from .database import Base
-from sqlalchemy import Boolean, Column, String, Integer, Float, ForeignKey
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    String,
+    Integer,
+    Float,
+    ForeignKey,
+    Index,
+)
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from sqlalchemy.sql.functions import func
 from sqlalchemy.orm import relationship
@@ -30,11 +39,27 @@ class Spot(Base):
     longitude = Column(Float, nullable=False)
     name = Column(String, nullable=False, unique=True)
     country = Column(String, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # users who have the spot among theirs, maintained by backend.favourites
+    favourite_count = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
 
     users = relationship(
         "User", secondary="user_spots", back_populates="spots", passive_deletes=True
     )
 
+    __table_args__ = (
+        Index("ix_spots_latitude_longitude", "latitude", "longitude"),
+        # top spots, overall and per country
+        Index("ix_spots_favourite_count", favourite_count.desc(), id),
+        Index("ix_spots_country_favourite_count", country, favourite_count.desc(), id),
+    )
+
 
 class UserSpots(Base):
     __tablename__ = "user_spots"
@@ -45,3 +70,59 @@ class UserSpots(Base):
     spot_id = Column(
         Integer, ForeignKey("spots.id", ondelete="CASCADE"), primary_key=True
     )
+
+
+class CatalogVersion(Base):
+    """Version counters of the spots catalog, one row each, see catalog.py."""
+
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+
+class SpotCondition(Base):
+    """Raw wind reading pushed by a collector, kept for a few days."""
+
+    __tablename__ = "spot_conditions"
+
+    spot_id = Column(
+        Integer, ForeignKey("spots.id", ondelete="CASCADE"), primary_key=True
+    )
+    observed_at = Column(TIMESTAMP(timezone=True), primary_key=True)
+    # knots
+    wind_speed = Column(Float, nullable=False)
+    gust = Column(Float)
+    # degrees the wind comes from
+    direction = Column(Integer, nullable=False)
+
+    # retention deletes
+    __table_args__ = (Index("ix_spot_conditions_observed_at", "observed_at"),)
+
+
+class SpotConditionRollup(Base):
+    """
+    Aggregates of the readings of a spot over an hour or a day.
+
+    Sums rather than averages are stored, so readings can be added to a
+    bucket as they arrive. The direction is summed as unit vectors.
+    """
+
+    __tablename__ = "spot_condition_rollups"
+
+    spot_id = Column(
+        Integer, ForeignKey("spots.id", ondelete="CASCADE"), primary_key=True
+    )
+    resolution = Column(String, primary_key=True)
+    bucket_start = Column(TIMESTAMP(timezone=True), primary_key=True)
+    readings = Column(Integer, nullable=False)
+    wind_speed_sum = Column(Float, nullable=False)
+    wind_speed_max = Column(Float, nullable=False)
+    gust_max = Column(Float)
+    direction_x = Column(Float, nullable=False)
+    direction_y = Column(Float, nullable=False)
+
+    # latest buckets of every spot, and retention deletes
+    __table_args__ = (
+        Index("ix_spot_condition_rollups_resolution_bucket", resolution, bucket_start),
+    )
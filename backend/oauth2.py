@@ -1,11 +1,14 @@
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 
+import time
 from datetime import datetime, timedelta
 from typing import Annotated
 
+from .cache import TTLCache
 from .config import settings
 from . import schemas, database, models
 
@@ -16,6 +19,11 @@ SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
+# decoded tokens, kept until the token expires at the latest
+token_cache = TTLCache(settings.auth_cache_size, settings.auth_cache_ttl_seconds)
+# column values of authenticated users, keyed by user id
+principal_cache = TTLCache(settings.auth_cache_size, settings.auth_cache_ttl_seconds)
+
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -24,34 +32,93 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    # imported on first use, it takes a large share of the app's import time
+    from jose import jwt
+
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def verify_access_token(token: str) -> schemas.TokenData:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credatials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def _decode_access_token(token: str) -> tuple[schemas.TokenData, float | None]:
+    """Return the token data and the expiry timestamp of a token."""
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         token_data = schemas.TokenData(
             id=payload.get("user_id"), email=payload.get("user_email")
         )
         if token_data.id is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    return token_data, payload.get("exp")
+
 
+def verify_access_token(token: str) -> schemas.TokenData:
+    token_data, _ = _decode_access_token(token)
+    return token_data
+
+
+def _verify_access_token_cached(token: str) -> schemas.TokenData:
+    if (token_data := token_cache.get(token)) is None:
+        token_data, expires_at = _decode_access_token(token)
+        token_cache.set(
+            token, token_data, None if expires_at is None else expires_at - time.time()
+        )
     return token_data
 
 
+def _cache_principal(user: models.User | None) -> models.User:
+    if user is None or not user.active:
+        raise _credentials_exception()
+    principal_cache.set(
+        user.id,
+        {column.key: getattr(user, column.key) for column in models.User.__table__.c},
+    )
+    return user
+
+
+def _cached_principal(user_id: int) -> models.User | None:
+    """Rebuild a cached user as a detached instance, ready to merge into a session."""
+    if (columns := principal_cache.get(user_id)) is None:
+        return None
+    user = models.User(**columns)
+    make_transient_to_detached(user)
+    return user
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a cached principal, call after the user is changed or deleted."""
+    principal_cache.delete(user_id)
+
+
 def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: Annotated[Session, Depends(database.get_db)],
 ):
-    token_data = verify_access_token(token)
+    token_data = _verify_access_token_cached(token)
+    if user := _cached_principal(token_data.id):
+        return db.merge(user, load=False)
     user = db.query(models.User).filter(models.User.id == token_data.id).first()
-    return user
+    return _cache_principal(user)
+
+
+async def get_current_user_async(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(database.get_async_db)],
+):
+    token_data = _verify_access_token_cached(token)
+    if user := _cached_principal(token_data.id):
+        return await db.merge(user, load=False)
+    user = await db.scalar(select(models.User).where(models.User.id == token_data.id))
+    return _cache_principal(user)
@@ -0,0 +1,150 @@
+"""Keyset pagination and streamed JSON arrays for list endpoints.
+
+List endpoints select plain column tuples with Core and encode them with
+orjson, skipping ORM hydration and response_model validation; routes keep
+their response_model for the OpenAPI schema only. The selected columns are
+derived from the response schema with `columns`, so the two stay in sync.
+"""
+
+import base64
+import binascii
+import json
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+import orjson
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel
+from sqlalchemy import Row, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute, Session
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_id = json.loads(payload)["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from e
+    if not isinstance(last_id, int):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return last_id
+
+
+def columns(schema: type[BaseModel], model: type) -> list[InstrumentedAttribute]:
+    """Columns of a model matching the fields of its response schema."""
+    return [getattr(model, field) for field in schema.model_fields]
+
+
+def dump_rows(rows: Iterable[Row]) -> bytes:
+    return orjson.dumps([row._asdict() for row in rows])
+
+
+def json_page(rows: list[Row], response: Response) -> Response:
+    """Encode a page of rows, keeping the next page cursor set by paginate."""
+    headers = {}
+    if cursor := response.headers.get(NEXT_CURSOR_HEADER):
+        headers[NEXT_CURSOR_HEADER] = cursor
+    return Response(dump_rows(rows), media_type="application/json", headers=headers)
+
+
+def keyset(stmt: Select, key: InstrumentedAttribute, after: str | None) -> Select:
+    """Order a statement by its key column and skip rows up to the cursor."""
+    if after is not None:
+        stmt = stmt.where(key > decode_cursor(after))
+    return stmt.order_by(key)
+
+
+def paginate(
+    db: Session,
+    stmt: Select,
+    key: InstrumentedAttribute,
+    limit: int,
+    after: str | None,
+    response: Response,
+) -> list[Row]:
+    """
+    Return one page of rows ordered by key.
+
+    The cursor of the next page is sent in the X-Next-Cursor header
+    and is omitted on the last page.
+    """
+    rows = db.execute(keyset(stmt, key, after).limit(limit + 1)).all()
+    return _trim_page(rows, key, limit, response)
+
+
+async def paginate_async(
+    db: AsyncSession,
+    stmt: Select,
+    key: InstrumentedAttribute,
+    limit: int,
+    after: str | None,
+    response: Response,
+) -> list[Row]:
+    """Same as paginate for an AsyncSession."""
+    result = await db.execute(keyset(stmt, key, after).limit(limit + 1))
+    return _trim_page(result.all(), key, limit, response)
+
+
+def _trim_page(
+    rows: list[Row], key: InstrumentedAttribute, limit: int, response: Response
+) -> list[Row]:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(rows[-1], key.key))
+    return rows
+
+
+def stream_json_array(
+    rows: Iterable[Row], batch_size: int = STREAM_BATCH_SIZE
+) -> Iterator[bytes]:
+    """Encode rows as a JSON array, yielding one chunk per batch of rows."""
+    encoder = _JsonArrayEncoder(batch_size)
+    for row in rows:
+        if chunk := encoder.add(row):
+            yield chunk
+    yield encoder.close()
+
+
+async def stream_json_array_async(
+    rows: AsyncIterable[Row], batch_size: int = STREAM_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    encoder = _JsonArrayEncoder(batch_size)
+    async for row in rows:
+        if chunk := encoder.add(row):
+            yield chunk
+    yield encoder.close()
+
+
+class _JsonArrayEncoder:
+    def __init__(self, batch_size: int) -> None:
+        self.batch_size = batch_size
+        self.count = 0
+        self.chunk = [b"["]
+
+    def add(self, row: Row) -> bytes | None:
+        if self.count:
+            self.chunk.append(b",")
+        self.chunk.append(orjson.dumps(row._asdict()))
+        self.count += 1
+        if self.count % self.batch_size == 0:
+            chunk, self.chunk = b"".join(self.chunk), []
+            return chunk
+        return None
+
+    def close(self) -> bytes:
+        self.chunk.append(b"]")
+        return b"".join(self.chunk)
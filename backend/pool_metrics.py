@@ -0,0 +1,122 @@
+"""Connection pool statistics.
+
+Checkout wait time is measured by a QueuePool subclass, the remaining
+counters come from pool events. Together they tell requests queueing for
+a connection (high wait, pool at size + overflow) apart from slow queries
+(low wait, connections held for long).
+"""
+
+import bisect
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+# upper bounds of the checkout wait histogram buckets, in milliseconds
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def snapshot(self) -> dict:
+        """Cumulative bucket counts keyed by upper bound, like Prometheus."""
+        buckets, cumulative = {}, 0
+        for bound, count in zip((*self.bounds, "+Inf"), self.counts, strict=True):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"buckets": buckets, "count": cumulative, "sum": self.total}
+
+
+class PoolMetrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkout_wait_ms = Histogram(WAIT_BUCKETS_MS)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+
+    def observe_checkout(self, wait_ms: float, timed_out: bool) -> None:
+        with self._lock:
+            self.checkout_wait_ms.observe(wait_ms)
+            if timed_out:
+                self.checkout_timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self, pool: Pool) -> dict:
+        with self._lock:
+            return {
+                # gauges are only available on queue pools
+                "pool_size": getattr(pool, "size", lambda: 0)(),
+                "checked_in": getattr(pool, "checkedin", lambda: 0)(),
+                "checked_out": getattr(pool, "checkedout", lambda: 0)(),
+                "overflow": max(getattr(pool, "overflow", lambda: 0)(), 0),
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "connects": self.connects,
+                "closes": self.closes,
+                "invalidations": self.invalidations,
+                "checkout_wait_ms": self.checkout_wait_ms.snapshot(),
+            }
+
+
+class _TimedCheckout:
+    metrics: PoolMetrics
+
+    def connect(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.metrics.observe_checkout(
+                (time.perf_counter() - start) * 1000, timed_out
+            )
+
+
+def instrumented_pool_class(base: type[Pool], metrics: PoolMetrics) -> type[Pool]:
+    """Subclass a pool class to time checkouts; survives pool recreation."""
+    return type(f"Timed{base.__name__}", (_TimedCheckout, base), {"metrics": metrics})
+
+
+def listen(engine: Engine, metrics: PoolMetrics) -> None:
+    """Count connection churn of an engine's pool."""
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.count("connects")
+
+    @event.listens_for(engine, "close")
+    def on_close(dbapi_connection, connection_record):
+        metrics.count("closes")
+
+    @event.listens_for(engine, "close_detached")
+    def on_close_detached(dbapi_connection):
+        metrics.count("closes")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.count("invalidations")
+
+
+primary_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
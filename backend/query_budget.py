@@ -0,0 +1,171 @@
+"""Query budgets: catch routes that run more SQL than they should.
+
+Routes declare how many statements a request may run with `limit`:
+
+    @router.get("/spots/{id}")
+    @query_budget.limit(queries=3)
+    def get_one_spot(...): ...
+
+With settings.query_budget set to "warn" or "raise", QueryBudgetMiddleware
+counts the statements of every request through engine events and logs or
+raises QueryBudgetExceeded when a route goes over its budget, or runs one
+statement more than settings.query_budget_max_repeats times, which usually
+means an N+1 lazy load. In "raise" mode responses are buffered until the
+route is done, so a request over budget is answered with 500 instead; that
+includes streamed responses, which makes the mode unfit for production.
+The test suite runs in "raise" mode. Code outside of
+a request is checked with the `budget` context manager:
+
+    with query_budget.budget(queries=2):
+        client.post("/users/add_spot/1")
+"""
+
+import contextvars
+import logging
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import NamedTuple, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class Budget(NamedTuple):
+    queries: int | None = None
+    repeats: int | None = None
+
+
+class QueryLog:
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, more_than: int) -> dict[str, int]:
+        """Statements run more than `more_than` times, with their counts."""
+        return {
+            statement: count
+            for statement, count in Counter(self.statements).items()
+            if count > more_than
+        }
+
+    def violations(self, budget: Budget) -> list[str]:
+        problems = []
+        if budget.queries is not None and self.count > budget.queries:
+            problems.append(f"ran {self.count} queries, budget is {budget.queries}")
+        repeats = (
+            settings.query_budget_max_repeats
+            if budget.repeats is None
+            else budget.repeats
+        )
+        for statement, count in self.repeated(repeats).items():
+            problems.append(f"ran {count} times: {' '.join(statement.split())}")
+        return problems
+
+
+# the log of the request being served, see QueryBudgetMiddleware
+request_log: contextvars.ContextVar[QueryLog | None] = contextvars.ContextVar(
+    "request_log", default=None
+)
+# logs of `capture` blocks, which record statements from every thread
+_captures: list[QueryLog] = []
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record(conn, cursor, statement, parameters, context, executemany):
+    if (log := request_log.get()) is not None:
+        log.statements.append(statement)
+    for log in _captures:
+        log.statements.append(statement)
+
+
+def retried() -> None:
+    """Leave out the last statement of the request, it failed and runs again."""
+    if (log := request_log.get()) is not None and log.statements:
+        log.statements.pop()
+
+
+def limit(queries: int | None = None, repeats: int | None = None) -> Callable[[F], F]:
+    """Declare the query budget of a route, applied below its route decorator."""
+
+    def declare(endpoint: F) -> F:
+        endpoint.__query_budget__ = Budget(queries, repeats)
+        return endpoint
+
+    return declare
+
+
+@contextmanager
+def capture() -> Iterator[QueryLog]:
+    """Record every statement run, in any thread, until the block exits."""
+    log = QueryLog()
+    _captures.append(log)
+    try:
+        yield log
+    finally:
+        _captures.remove(log)
+
+
+@contextmanager
+def budget(
+    queries: int | None = None, repeats: int | None = None
+) -> Iterator[QueryLog]:
+    """Raise QueryBudgetExceeded if the block goes over the budget."""
+    with capture() as log:
+        yield log
+    if problems := log.violations(Budget(queries, repeats)):
+        raise QueryBudgetExceeded("; ".join(problems))
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or settings.query_budget == "off":
+            await self.app(scope, receive, send)
+            return
+
+        raising = settings.query_budget == "raise"
+        # held back in "raise" mode, the response is only known to be
+        # within budget once the route is done
+        held: list[Message] = []
+
+        async def hold(message: Message) -> None:
+            held.append(message)
+
+        log = QueryLog()
+        token = request_log.set(log)
+        try:
+            await self.app(scope, receive, hold if raising else send)
+        finally:
+            request_log.reset(token)
+
+        route = scope.get("route")
+        declared = getattr(getattr(route, "endpoint", None), "__query_budget__", None)
+        if problems := log.violations(declared or Budget()):
+            path = getattr(route, "path", scope["path"])
+            message = f"{scope['method']} {path} " + "; ".join(problems)
+            if raising:
+                await PlainTextResponse("Internal Server Error", status_code=500)(
+                    scope, receive, send
+                )
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        for message in held:
+            await send(message)
@@ -0,0 +1,214 @@
+"""Read replica routing.
+
+Routes depending on get_read_db instead of get_db run their queries on one
+of settings.db_replica_dsns, taken in turn. A replica refusing connections,
+or failing the first statement of a request, is skipped for
+settings.db_replica_retry_seconds and the request reads from the primary;
+with no replica configured or reachable, reads go to the primary like
+everything else.
+
+Replicas lag behind the primary, so a client that has just written would
+not see its own write. ReadYourWritesMiddleware gives successful (2xx)
+responses to POST, PUT, PATCH and DELETE requests a cookie sending that
+client's reads to the primary for settings.db_read_your_writes_seconds.
+Failed or rejected writes changed nothing, so they leave reads alone.
+"""
+
+import contextvars
+import itertools
+import math
+import threading
+import time
+from collections.abc import Iterator
+from functools import cache
+from http.cookies import SimpleCookie
+from typing import Annotated
+
+from fastapi import Depends
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.pool import QueuePool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import database, pool_metrics, query_budget
+from .config import settings
+
+# holds the time until which the client reads from the primary
+STICKY_COOKIE = "read_primary_until"
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+class Replica:
+    def __init__(self, engine: Engine, metrics: pool_metrics.PoolMetrics) -> None:
+        self.engine = engine
+        self.metrics = metrics
+        self.down_until = 0.0
+
+
+class ReplicaSet:
+    """Round-robin over replicas, leaving out those that failed recently."""
+
+    def __init__(self, replicas: list[Replica], retry_seconds: float) -> None:
+        self.replicas = replicas
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+
+    def candidates(self) -> list[Replica]:
+        """Replicas to try in order, starting from the next one in turn."""
+        if not self.replicas:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._turn) % len(self.replicas)
+        rotated = self.replicas[start:] + self.replicas[:start]
+        return [replica for replica in rotated if replica.down_until <= now]
+
+    def mark_down(self, replica: Replica) -> None:
+        replica.down_until = time.monotonic() + self.retry_seconds
+
+
+def create_replica(dsn: str) -> Replica:
+    metrics = pool_metrics.PoolMetrics()
+    engine = create_engine(
+        dsn,
+        poolclass=pool_metrics.instrumented_pool_class(QueuePool, metrics),
+        **database.pool_options(),
+    )
+    pool_metrics.listen(engine, metrics)
+    return Replica(engine, metrics)
+
+
+@cache
+def get_replica_set() -> ReplicaSet:
+    return ReplicaSet(
+        [create_replica(dsn) for dsn in settings.db_replica_dsns],
+        settings.db_replica_retry_seconds,
+    )
+
+
+def dispose() -> None:
+    if get_replica_set.cache_info().currsize:
+        for replica in get_replica_set().replicas:
+            replica.engine.dispose()
+
+
+# set for requests of clients that wrote recently, see ReadYourWritesMiddleware
+read_from_primary: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "read_from_primary", default=False
+)
+
+
+def get_read_db(
+    primary: Annotated[Session, Depends(database.get_db)],
+) -> Iterator[Session]:
+    """Session on a replica, or the primary session if none is usable."""
+    if read_from_primary.get():
+        yield primary
+        return
+    replica_set = get_replica_set()
+    for candidate in replica_set.candidates():
+        try:
+            connection = candidate.engine.connect()
+        except DBAPIError:
+            replica_set.mark_down(candidate)
+            continue
+        try:
+            with database.SessionLocal(bind=connection) as db:
+                _fall_back_to_primary(db, primary, replica_set, candidate)
+                yield db
+        finally:
+            connection.close()
+        return
+    yield primary
+
+
+def _fall_back_to_primary(
+    db: Session, primary: Session, replica_set: ReplicaSet, replica: Replica
+) -> None:
+    """Run the statements of `db` on the primary once its first one failed.
+
+    Nothing was returned to the route before the first statement, so it is
+    safe to repeat; failures of later statements are raised as usual.
+    """
+    state = {"first": True, "failed": False}
+
+    @event.listens_for(db, "do_orm_execute")
+    def execute(orm_execute_state: ORMExecuteState):
+        if state["failed"]:
+            return _execute_on(primary, orm_execute_state)
+        if not state["first"]:
+            return None
+        state["first"] = False
+        try:
+            return orm_execute_state.invoke_statement()
+        except DBAPIError:
+            replica_set.mark_down(replica)
+            state["failed"] = True
+            query_budget.retried()
+            return _execute_on(primary, orm_execute_state)
+
+
+def _execute_on(session: Session, orm_execute_state: ORMExecuteState):
+    return session.execute(
+        orm_execute_state.statement,
+        orm_execute_state.parameters,
+        execution_options=orm_execute_state.local_execution_options,
+    )
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.db_replica_dsns:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in SAFE_METHODS:
+            token = read_from_primary.set(_sticky(scope))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                read_from_primary.reset(token)
+            return
+        if scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if (
+                message["type"] == "http.response.start"
+                and 200 <= message["status"] < 300
+            ):
+                seconds = settings.db_read_your_writes_seconds
+                cookie = SimpleCookie()
+                cookie[STICKY_COOKIE] = str(time.time() + seconds)
+                cookie[STICKY_COOKIE]["max-age"] = math.ceil(seconds)
+                cookie[STICKY_COOKIE]["path"] = "/"
+                cookie[STICKY_COOKIE]["httponly"] = True
+                MutableHeaders(scope=message).append(
+                    "set-cookie", cookie.output(header="").strip()
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def _sticky(scope: Scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            cookie = SimpleCookie()
+            cookie.load(value.decode("latin-1"))
+            if morsel := cookie.get(STICKY_COOKIE):
+                try:
+                    return float(morsel.value) > time.time()
+                except ValueError:
+                    return False
+    return False
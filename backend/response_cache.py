@@ -0,0 +1,212 @@
+"""Cache of serialized spot read responses, invalidated by spot writes.
+
+Keys include the catalog version, so an entry can never be served once any
+spot changed, even if the write happened in another worker and the
+invalidation hook never ran here; invalidation only reclaims the space.
+Two backends are available: an in-process LRU, and an SQLite file shared
+by all workers on a host so that an entry computed by one is reused by all.
+Misses go through a single-flight guard, so concurrent requests for the
+same key run one query and the rest wait for its result.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import NamedTuple, Protocol
+
+import orjson
+from fastapi import Response
+from sqlalchemy import Row
+
+from . import catalog, pagination, schemas
+from .cache import LRUCache
+from .config import settings
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: dict[str, str]
+
+
+class CacheBackend(Protocol):
+    def __len__(self) -> int: ...
+
+    def get(self, key: str) -> CachedResponse | None: ...
+
+    def set(self, key: str, value: CachedResponse) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class MemoryBackend(LRUCache):
+    """In-process LRU, every worker keeps its own copy."""
+
+
+class SqliteBackend:
+    """LRU stored in an SQLite file, shared by the processes opening it."""
+
+    def __init__(self, path: str, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, body BLOB NOT NULL, headers TEXT NOT NULL, "
+            "used REAL NOT NULL)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            row = self._db.execute(
+                "UPDATE responses SET used = ? WHERE key = ? RETURNING body, headers",
+                (time.time(), key),
+            ).fetchone()
+        return CachedResponse(row[0], json.loads(row[1])) if row else None
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, value.body, json.dumps(value.headers), time.time()),
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                "ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+
+class _Flight:
+    __slots__ = ("lock", "waiters")
+
+    def __init__(self, lock) -> None:
+        self.lock = lock
+        self.waiters = 0
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend | None) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._flights: dict[str, _Flight] = {}
+        self._async_flights: dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str) -> CachedResponse | None:
+        if (value := self.backend.get(key)) is not None:
+            self.hits += 1
+        return value
+
+    def _store(self, key: str, value: CachedResponse) -> CachedResponse:
+        self.misses += 1
+        self.backend.set(key, value)
+        return value
+
+    def _join(self, flights: dict[str, _Flight], key: str, lock_type) -> _Flight:
+        with self._lock:
+            flight = flights.get(key)
+            if flight is None:
+                flight = flights[key] = _Flight(lock_type())
+            flight.waiters += 1
+            return flight
+
+    def _leave(self, flights: dict[str, _Flight], key: str, flight: _Flight) -> None:
+        with self._lock:
+            flight.waiters -= 1
+            if not flight.waiters:
+                del flights[key]
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], CachedResponse]
+    ) -> CachedResponse:
+        """Return the cached response, computing it at most once per miss."""
+        if self.backend is None:
+            return compute()
+        if (value := self._lookup(key)) is not None:
+            return value
+        flight = self._join(self._flights, key, threading.Lock)
+        try:
+            with flight.lock:
+                if (value := self._lookup(key)) is not None:
+                    return value
+                return self._store(key, compute())
+        finally:
+            self._leave(self._flights, key, flight)
+
+    async def get_or_compute_async(
+        self, key: str, compute: Callable[[], Awaitable[CachedResponse]]
+    ) -> CachedResponse:
+        if self.backend is None:
+            return await compute()
+        if (value := self._lookup(key)) is not None:
+            return value
+        flight = self._join(self._async_flights, key, asyncio.Lock)
+        try:
+            async with flight.lock:
+                if (value := self._lookup(key)) is not None:
+                    return value
+                return self._store(key, await compute())
+        finally:
+            self._leave(self._async_flights, key, flight)
+
+    def invalidate(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.backend) if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def spot_page(spots: list[Row], etag: str, page_response: Response) -> CachedResponse:
+    """Serialize a page of spots with its ETag and next page cursor."""
+    headers = {"ETag": etag}
+    if cursor := page_response.headers.get(pagination.NEXT_CURSOR_HEADER):
+        headers[pagination.NEXT_CURSOR_HEADER] = cursor
+    return CachedResponse(pagination.dump_rows(spots), headers)
+
+
+def spot(row: Row) -> CachedResponse:
+    """Serialize a spot row, which also holds its version for the ETag."""
+    return CachedResponse(
+        orjson.dumps(
+            {field: getattr(row, field) for field in schemas.SpotOut.model_fields}
+        ),
+        {"ETag": catalog.spot_etag(row.id, row.version)},
+    )
+
+
+def to_response(entry: CachedResponse) -> Response:
+    return Response(entry.body, media_type="application/json", headers=entry.headers)
+
+
+def create_backend() -> CacheBackend | None:
+    if settings.response_cache_backend == "sqlite":
+        return SqliteBackend(settings.response_cache_path, settings.response_cache_size)
+    if settings.response_cache_backend == "memory":
+        return MemoryBackend(settings.response_cache_size)
+    return None
+
+
+spot_cache = ResponseCache(create_backend())
@@ -0,0 +1,54 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from .. import (
+    database,
+    models,
+    oauth2,
+    pool_metrics,
+    replicas,
+    response_cache,
+    schemas,
+)
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+# common dependency
+CurrentUserDep = Annotated[models.User, Depends(oauth2.get_current_user)]
+
+
+@router.get("/pool", response_model=dict[str, schemas.PoolStats])
+def get_pool_stats(current_user: CurrentUserDep):
+    """
+    Get connection pool statistics.
+
+    Requests queueing on the pool show up as a full pool (checked_out at
+    pool_size + overflow) with a growing checkout wait, slow queries as
+    connections held out with short checkout waits.
+    """
+    stats = {
+        "primary": pool_metrics.primary_pool_metrics.snapshot(database.engine.pool)
+    }
+    if database.async_engine is not None:
+        stats["async"] = pool_metrics.async_pool_metrics.snapshot(
+            database.async_engine.pool
+        )
+    for i, replica in enumerate(replicas.get_replica_set().replicas):
+        stats[f"replica-{i}"] = replica.metrics.snapshot(replica.engine.pool)
+    return stats
+
+
+@router.get("/auth-cache", response_model=dict[str, schemas.CacheStats])
+def get_auth_cache_stats(current_user: CurrentUserDep):
+    """Get hit rates of the decoded token and authenticated user caches."""
+    return {
+        "tokens": oauth2.token_cache.stats(),
+        "principals": oauth2.principal_cache.stats(),
+    }
+
+
+@router.get("/response-cache", response_model=schemas.CacheStats)
+def get_response_cache_stats(current_user: CurrentUserDep):
+    """Get the hit rate of the spot read response cache."""
+    return response_cache.spot_cache.stats()
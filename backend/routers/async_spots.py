@@ -0,0 +1,113 @@
+"""Read-only spot routes on AsyncSession, mounted instead of the sync ones
+when settings.db_async is enabled."""
+
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import (
+    catalog,
+    models,
+    oauth2,
+    pagination,
+    query_budget,
+    response_cache,
+    schemas,
+)
+from ..database import get_async_db
+
+router = APIRouter(prefix="/spots", tags=["Spots"])
+
+# common dependency
+AsyncDbDep = Annotated[AsyncSession, Depends(get_async_db)]
+CurrentUserDep = Annotated[models.User, Depends(oauth2.get_current_user_async)]
+IfNoneMatchDep = Annotated[str | None, Header()]
+
+SPOT_COLUMNS = pagination.columns(schemas.SpotOut, models.Spot)
+
+
+@router.get("/", status_code=status.HTTP_200_OK, response_model=list[schemas.SpotOut])
+@query_budget.limit(queries=3)
+async def get_spots_async(
+    db: AsyncDbDep,
+    current_user: CurrentUserDep,
+    limit: Annotated[
+        int, Query(ge=1, le=pagination.MAX_PAGE_SIZE)
+    ] = pagination.DEFAULT_PAGE_SIZE,
+    after: str | None = None,
+    stream: bool = False,
+    if_none_match: IfNoneMatchDep = None,
+):
+    """
+    Get spots ordered by ID, one page at a time.
+
+    Pass the X-Next-Cursor response header as `after` to get the next page.
+    With `stream` set, all spots after the cursor are streamed instead.
+    Answers 304 when If-None-Match holds the current catalog ETag.
+    Pages are served from the response cache until the next spot write.
+    """
+    version = await catalog.current_version_async(db)
+    etag = catalog.catalog_etag(version)
+    if catalog.etag_matches(if_none_match, etag):
+        return catalog.not_modified(etag)
+
+    stmt = select(*SPOT_COLUMNS)
+    if stream:
+        rows = await db.stream(
+            pagination.keyset(stmt, models.Spot.id, after).execution_options(
+                yield_per=pagination.STREAM_BATCH_SIZE
+            )
+        )
+        return StreamingResponse(
+            pagination.stream_json_array_async(rows),
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
+
+    async def load_page() -> response_cache.CachedResponse:
+        page_response = Response()
+        spots = await pagination.paginate_async(
+            db, stmt, models.Spot.id, limit, after, page_response
+        )
+        return response_cache.spot_page(spots, etag, page_response)
+
+    return response_cache.to_response(
+        await response_cache.spot_cache.get_or_compute_async(
+            f"spots:{version}:{limit}:{after}", load_page
+        )
+    )
+
+
+# int converter, so static routes like /spots/nearby fall through to the sync router
+@router.get("/{id:int}", status_code=status.HTTP_200_OK, response_model=schemas.SpotOut)
+@query_budget.limit(queries=3)
+async def get_one_spot_async(
+    id: int,
+    db: AsyncDbDep,
+    current_user: CurrentUserDep,
+    if_none_match: IfNoneMatchDep = None,
+):
+    """Get a spot by ID, answering 304 when If-None-Match holds its ETag."""
+
+    async def load_spot() -> response_cache.CachedResponse:
+        if spot := (
+            await db.execute(
+                select(*models.Spot.__table__.c).where(models.Spot.id == id)
+            )
+        ).first():
+            return response_cache.spot(spot)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Spot with ID {id} not found",
+            )
+
+    entry = await response_cache.spot_cache.get_or_compute_async(
+        f"spot:{await catalog.current_version_async(db)}:{id}", load_spot
+    )
+    if catalog.etag_matches(if_none_match, entry.headers["ETag"]):
+        return catalog.not_modified(entry.headers["ETag"])
+    return response_cache.to_response(entry)
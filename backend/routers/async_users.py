@@ -0,0 +1,75 @@
+"""Read-only user routes on AsyncSession, mounted instead of the sync ones
+when settings.db_async is enabled."""
+
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, oauth2, pagination, query_budget, schemas
+from ..database import get_async_db
+
+router = APIRouter(prefix="/users", tags=["Users"])
+
+# common dependency
+AsyncDbDep = Annotated[AsyncSession, Depends(get_async_db)]
+CurrentUserDep = Annotated[models.User, Depends(oauth2.get_current_user_async)]
+
+USER_COLUMNS = pagination.columns(schemas.UserOut, models.User)
+SPOT_COLUMNS = pagination.columns(schemas.SpotOut, models.Spot)
+
+
+@router.get("/spots", response_model=schemas.UserWithSpots)
+@query_budget.limit(queries=3)
+async def get_user_spots_async(db: AsyncDbDep, user_auth: CurrentUserDep):
+    user = (
+        await db.execute(select(*USER_COLUMNS).where(models.User.id == user_auth.id))
+    ).one()
+    spots = await db.execute(
+        select(*SPOT_COLUMNS)
+        .join(models.UserSpots, models.UserSpots.spot_id == models.Spot.id)
+        .where(models.UserSpots.user_id == user_auth.id)
+    )
+    return ORJSONResponse(
+        {**user._asdict(), "spots": [spot._asdict() for spot in spots]}
+    )
+
+
+@router.get("/", response_model=list[schemas.UserOut])
+async def get_all_active_users_async(
+    response: Response,
+    db: AsyncDbDep,
+    limit: Annotated[
+        int, Query(ge=1, le=pagination.MAX_PAGE_SIZE)
+    ] = pagination.DEFAULT_PAGE_SIZE,
+    after: str | None = None,
+    stream: bool = False,
+):
+    """
+    Get active users ordered by ID, one page at a time.
+
+    Pass the X-Next-Cursor response header as `after` to get the next page.
+    With `stream` set, all users after the cursor are streamed instead.
+    """
+    stmt = select(*USER_COLUMNS).where(models.User.active.is_(True))
+    if stream:
+        rows = await db.stream(
+            pagination.keyset(stmt, models.User.id, after).execution_options(
+                yield_per=pagination.STREAM_BATCH_SIZE
+            )
+        )
+        return StreamingResponse(
+            pagination.stream_json_array_async(rows),
+            media_type="application/json",
+        )
+    users = await pagination.paginate_async(
+        db, stmt, models.User.id, limit, after, response
+    )
+    # an empty page past the last cursor is not an error
+    if not users and after is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No users found in database"
+        )
+    return pagination.json_page(users, response)
@@ -4,12 +4,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
-from .. import database, models, oauth2, schemas, utils
+from .. import admission, database, models, oauth2, schemas, utils
 
 router = APIRouter(tags=["Authentification"])
 
 
 @router.post("/login", response_model=schemas.Token)
+@admission.route_class("auth")
 def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: Annotated[Session, Depends(database.get_db)],
@@ -23,9 +24,16 @@ def login(
     if not user:
         raise HTTP_INVALID_CREDENTIALS
 
-    verified_password = utils.verify_password(form_data.password, user.password)
+    verified_password, new_hash = utils.verify_and_update_password(
+        form_data.password, user.password
+    )
     if not verified_password:
         raise HTTP_INVALID_CREDENTIALS
+    if new_hash:
+        # stored hash uses outdated settings, e.g. another bcrypt cost
+        user.password = new_hash
+        db.commit()
+        oauth2.invalidate_user(user.id)
 
     # Create token - password verified
     access_token = oauth2.create_access_token(
@@ -0,0 +1,101 @@
+from datetime import UTC, datetime, timedelta
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import conditions, models, oauth2, pagination, query_budget, schemas
+from ..database import get_db
+
+router = APIRouter(prefix="/conditions", tags=["Conditions"])
+
+# common dependency
+DbDep = Annotated[Session, Depends(get_db)]
+CurrentUserDep = Annotated[models.User, Depends(oauth2.get_current_user)]
+
+SPOT_COLUMNS = pagination.columns(schemas.SpotOut, models.Spot)
+
+MAX_HISTORY_HOURS = 24 * 90
+MAX_WINDIEST_SPOTS = 100
+
+
+@router.post(
+    "/", status_code=status.HTTP_201_CREATED, response_model=schemas.ReadingsAccepted
+)
+async def ingest_readings(
+    batch: schemas.ReadingBatch, db: DbDep, current_user: CurrentUserDep
+):
+    """
+    Store a batch of wind readings pushed by a collector.
+
+    Answers once the readings are committed, together with those of other
+    batches sent at the same time. Readings of a spot at a time already
+    stored are skipped, so failed batches can simply be sent again.
+    """
+    rows = [
+        {**reading.model_dump(), "observed_at": conditions.utc(reading.observed_at)}
+        for reading in batch.readings
+    ]
+    written = await conditions.group_commit.submit(db, rows)
+    accepted = sum(
+        (row["spot_id"], row["observed_at"]) in written.inserted for row in rows
+    )
+    unknown_spots = sorted({row["spot_id"] for row in rows} - written.known_spots)
+    return {
+        "accepted": accepted,
+        "duplicates": sum(row["spot_id"] in written.known_spots for row in rows)
+        - accepted,
+        "unknown_spots": unknown_spots,
+    }
+
+
+@router.get("/windiest", response_model=list[schemas.SpotConditions])
+@query_budget.limit(queries=2)
+def get_windiest_spots(
+    db: DbDep,
+    current_user: CurrentUserDep,
+    limit: Annotated[int, Query(ge=1, le=MAX_WINDIEST_SPOTS)] = 10,
+):
+    """Get the spots with the strongest average wind over the last hour or two."""
+    spots = conditions.windiest(db, SPOT_COLUMNS, datetime.now(UTC), limit)
+    return [
+        {
+            **spot._asdict(),
+            "direction": conditions.mean_direction(spot.direction_x, spot.direction_y),
+        }
+        for spot in spots
+    ]
+
+
+@router.get("/{spot_id}", response_model=list[schemas.Conditions])
+@query_budget.limit(queries=3)
+def get_spot_conditions(
+    spot_id: int,
+    db: DbDep,
+    current_user: CurrentUserDep,
+    hours: Annotated[int, Query(ge=1, le=MAX_HISTORY_HOURS)] = 24,
+    resolution: conditions.Resolution = "hour",
+):
+    """Get hourly or daily aggregates of a spot's wind over the last `hours`."""
+    if db.scalar(select(models.Spot.id).where(models.Spot.id == spot_id)) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Spot with ID {spot_id} not found",
+        )
+    since = conditions.bucket_start(
+        datetime.now(UTC) - timedelta(hours=hours), resolution
+    )
+    return [
+        {
+            "bucket_start": conditions.utc(bucket.bucket_start),
+            "readings": bucket.readings,
+            "wind_speed_avg": bucket.wind_speed_sum / bucket.readings,
+            "wind_speed_max": bucket.wind_speed_max,
+            "gust_max": bucket.gust_max,
+            "direction": conditions.mean_direction(
+                bucket.direction_x, bucket.direction_y
+            ),
+        }
+        for bucket in conditions.history(db, spot_id, resolution, since)
+    ]
@@ -1,33 +1,401 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
-from fastapi.encoders import jsonable_encoder
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import delete, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from .. import models, oauth2, schemas
+from .. import (
+    catalog,
+    clustering,
+    models,
+    oauth2,
+    pagination,
+    query_budget,
+    replicas,
+    response_cache,
+    schemas,
+    search,
+    spatial,
+    spot_export,
+    spot_import,
+)
+from ..config import settings
+from ..countries import CountryCode
 from ..database import get_db
 
 router = APIRouter(prefix="/spots", tags=["Spots"])
 
 # common dependency
 DbDep = Annotated[Session, Depends(get_db)]
+ReadDbDep = Annotated[Session, Depends(replicas.get_read_db)]
 CurrentUserDep = Annotated[models.User, Depends(oauth2.get_current_user)]
+IfNoneMatchDep = Annotated[str | None, Header()]
 
+SPOT_COLUMNS = pagination.columns(schemas.SpotOut, models.Spot)
 
-@router.get("/", status_code=status.HTTP_200_OK, response_model=list[schemas.SpotOut])
-def get_spots(db: DbDep, current_user: CurrentUserDep):
-    return db.query(models.Spot).all()
+MAX_NEARBY_SPOTS = 100
+MAX_VIEWPORT_SPOTS = 2000
+MAX_SEARCH_RESULTS = 50
+MAX_TOP_SPOTS = 100
 
+Position = tuple[float, float]
 
-@router.get("/{id}", status_code=status.HTTP_200_OK, response_model=schemas.SpotOut)
-def get_one_spot(id: int, db: DbDep, current_user: CurrentUserDep):
-    if spot := db.query(models.Spot).filter(models.Spot.id == id).first():
-        return spot
+
+def _spot_written(
+    spot_id: int,
+    old: Position | None,
+    new: Position | None,
+    name: str | None,
+    version: int,
+):
+    """Propagate a committed spot write to the in-memory indexes and caches.
+
+    `new` and `name` are None when the spot was deleted, `version` is the
+    geometry version the write committed.
+    """
+    response_cache.spot_cache.invalidate()
+    if old:
+        clustering.tile_cache.invalidate_point(*old)
+    if new:
+        clustering.tile_cache.invalidate_point(*new)
+        spatial.spot_index.add(spot_id, *new)
+        search.name_index.add(spot_id, name)
     else:
+        spatial.spot_index.remove(spot_id)
+        search.name_index.remove(spot_id)
+    spatial.spot_index.written(version)
+    search.name_index.written(version)
+    clustering.tile_cache.written(version)
+
+
+@router.get("/", status_code=status.HTTP_200_OK, response_model=list[schemas.SpotOut])
+@query_budget.limit(queries=3)
+def get_spots(
+    db: ReadDbDep,
+    current_user: CurrentUserDep,
+    limit: Annotated[
+        int, Query(ge=1, le=pagination.MAX_PAGE_SIZE)
+    ] = pagination.DEFAULT_PAGE_SIZE,
+    after: str | None = None,
+    stream: bool = False,
+    if_none_match: IfNoneMatchDep = None,
+):
+    """
+    Get spots ordered by ID, one page at a time.
+
+    Pass the X-Next-Cursor response header as `after` to get the next page.
+    With `stream` set, all spots after the cursor are streamed instead.
+    Answers 304 when If-None-Match holds the current catalog ETag.
+    Pages are served from the response cache until the next spot write.
+    """
+    version = catalog.current_version(db)
+    etag = catalog.catalog_etag(version)
+    if catalog.etag_matches(if_none_match, etag):
+        return catalog.not_modified(etag)
+
+    stmt = select(*SPOT_COLUMNS)
+    if stream:
+        rows = db.execute(
+            pagination.keyset(stmt, models.Spot.id, after).execution_options(
+                yield_per=pagination.STREAM_BATCH_SIZE
+            )
+        )
+        return StreamingResponse(
+            pagination.stream_json_array(rows),
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
+
+    def load_page() -> response_cache.CachedResponse:
+        page_response = Response()
+        spots = pagination.paginate(
+            db, stmt, models.Spot.id, limit, after, page_response
+        )
+        return response_cache.spot_page(spots, etag, page_response)
+
+    return response_cache.to_response(
+        response_cache.spot_cache.get_or_compute(
+            f"spots:{version}:{limit}:{after}", load_page
+        )
+    )
+
+
+@router.get(
+    "/nearby",
+    status_code=status.HTTP_200_OK,
+    response_model=list[schemas.SpotNearby],
+)
+def get_nearby_spots(
+    lat: Annotated[float, Query(ge=-90, le=90)],
+    lon: Annotated[float, Query(ge=-180, le=180)],
+    db: DbDep,
+    current_user: CurrentUserDep,
+    k: Annotated[int, Query(ge=1, le=MAX_NEARBY_SPOTS)] = 10,
+    radius_km: Annotated[float | None, Query(gt=0)] = None,
+):
+    """Get the k spots closest to a point, ordered by great-circle distance."""
+    spatial.spot_index.ensure_loaded(
+        catalog.geometry_version(db), lambda: spatial.load_rows(db)
+    )
+    nearest = spatial.spot_index.nearest(lat, lon, k, radius_km)
+    if not nearest:
+        return []
+
+    spots = {
+        spot.id: spot
+        for spot in db.query(models.Spot).filter(
+            models.Spot.id.in_([spot_id for spot_id, _ in nearest])
+        )
+    }
+    return [
+        {
+            **schemas.SpotOut.model_validate(spots[spot_id]).model_dump(),
+            "distance_km": distance_km,
+        }
+        for spot_id, distance_km in nearest
+        if spot_id in spots
+    ]
+
+
+@router.post(
+    "/nearest",
+    status_code=status.HTTP_200_OK,
+    response_model=list[schemas.NearestSpots],
+)
+@query_budget.limit(queries=3)
+def get_nearest_spots(
+    point_set: schemas.PointSet, db: DbDep, current_user: CurrentUserDep
+):
+    """
+    Get the k spots closest to each of a set of points.
+
+    All points are ranked against the whole catalog at once, with array
+    operations over its coordinates instead of an index lookup per point.
+    """
+    # imports numpy, deferred to first use
+    from .. import distances
+
+    spots = distances.catalog_arrays.get(
+        catalog.geometry_version(db), lambda: distances.load_rows(db)
+    )
+    latitudes, longitudes = distances.coordinate_arrays(
+        (point.latitude, point.longitude) for point in point_set.points
+    )
+    nearest = distances.nearest(spots, latitudes, longitudes, point_set.k)
+    return ORJSONResponse(
+        [
+            {
+                "latitude": point.latitude,
+                "longitude": point.longitude,
+                "spot_ids": spot_ids,
+                "distances_km": distances_km,
+            }
+            for point, spot_ids, distances_km in zip(
+                point_set.points,
+                spots.ids[nearest.indices].tolist(),
+                nearest.distances_km.tolist(),
+                strict=True,
+            )
+        ]
+    )
+
+
+@router.get(
+    "/viewport", status_code=status.HTTP_200_OK, response_model=schemas.Viewport
+)
+def get_viewport_spots(
+    min_lat: Annotated[float, Query(ge=-90, le=90)],
+    min_lon: Annotated[float, Query(ge=-180, le=180)],
+    max_lat: Annotated[float, Query(ge=-90, le=90)],
+    max_lon: Annotated[float, Query(ge=-180, le=180)],
+    zoom: Annotated[int, Query(ge=0, le=22)],
+    db: DbDep,
+    current_user: CurrentUserDep,
+):
+    """
+    Get spots inside a map viewport.
+
+    At zoom levels up to clustering.CLUSTER_MAX_ZOOM spots are returned as
+    clusters (count and centroid), above it as individual spots.
+    A viewport with min_lon > max_lon crosses the antimeridian.
+    """
+    if min_lat > max_lat:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail=f"Spot with ID {id} not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_lat must not be greater than max_lat",
         )
+    bbox = (min_lat, min_lon, max_lat, max_lon)
+
+    if zoom > clustering.CLUSTER_MAX_ZOOM:
+        spots = (
+            db.query(models.Spot)
+            .filter(clustering.bbox_filter(bbox))
+            .order_by(models.Spot.id)
+            .limit(MAX_VIEWPORT_SPOTS)
+            .all()
+        )
+        return {"zoom": zoom, "spots": spots}
+
+    try:
+        clusters = clustering.viewport_clusters(db, bbox, zoom)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+        ) from e
+    return {
+        "zoom": zoom,
+        "clusters": [
+            {"latitude": lat, "longitude": lon, "count": count}
+            for lat, lon, count in clusters
+        ],
+    }
+
+
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {
+                media_type: {} for media_type in spot_export.MEDIA_TYPES.values()
+            }
+        }
+    },
+)
+def export_spots(
+    db: DbDep,
+    current_user: CurrentUserDep,
+    format: spot_export.ExportFormat = "geojson",
+    gzip: bool = False,
+):
+    """
+    Export the whole catalog as a GeoJSON FeatureCollection or NDJSON.
+
+    The response is streamed straight from a server-side cursor,
+    gzip-compressed on the fly when requested.
+    """
+    chunks = spot_export.ENCODERS[format](spot_export.export_batches(db))
+    headers = {"Content-Disposition": f'attachment; filename="spots.{format}"'}
+    if gzip:
+        chunks = spot_export.gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        chunks, media_type=spot_export.MEDIA_TYPES[format], headers=headers
+    )
+
+
+@router.get(
+    "/search", status_code=status.HTTP_200_OK, response_model=list[schemas.SpotOut]
+)
+@query_budget.limit(queries=4)
+def search_spots(
+    q: Annotated[str, Query(min_length=1, max_length=100)],
+    db: DbDep,
+    current_user: CurrentUserDep,
+    limit: Annotated[int, Query(ge=1, le=MAX_SEARCH_RESULTS)] = 10,
+):
+    """
+    Search spots by name, for autocomplete.
+
+    Spots whose name or one of its words starts with `q` come first,
+    followed by names similar to it, so small typos still match.
+    """
+    stmt = select(*SPOT_COLUMNS)
+    if settings.spot_search == "database":
+        rows = db.execute(search.trigram_search(stmt, q, limit)).all()
+    else:
+        search.name_index.ensure_loaded(
+            catalog.geometry_version(db), lambda: search.load_rows(db)
+        )
+        spot_ids = search.name_index.search(q, limit)
+        spots = {
+            spot.id: spot
+            for spot in db.execute(stmt.where(models.Spot.id.in_(spot_ids)))
+        }
+        rows = [spots[spot_id] for spot_id in spot_ids if spot_id in spots]
+    return Response(pagination.dump_rows(rows), media_type="application/json")
+
+
+@router.get(
+    "/top", status_code=status.HTTP_200_OK, response_model=list[schemas.SpotOut]
+)
+@query_budget.limit(queries=3)
+def get_top_spots(
+    db: DbDep,
+    current_user: CurrentUserDep,
+    country: CountryCode | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_TOP_SPOTS)] = 10,
+    if_none_match: IfNoneMatchDep = None,
+):
+    """
+    Get the spots most users have among theirs, optionally in one country.
+
+    Read from the favourite count index, so the cost depends on `limit` only.
+    Answers 304 when If-None-Match holds the current catalog ETag.
+    """
+    version = catalog.current_version(db)
+    etag = catalog.catalog_etag(version)
+    if catalog.etag_matches(if_none_match, etag):
+        return catalog.not_modified(etag)
+
+    def load_top() -> response_cache.CachedResponse:
+        stmt = select(*SPOT_COLUMNS)
+        if country:
+            stmt = stmt.where(models.Spot.country == country)
+        spots = db.execute(
+            stmt.order_by(models.Spot.favourite_count.desc(), models.Spot.id).limit(
+                limit
+            )
+        ).all()
+        return response_cache.spot_page(spots, etag, Response())
+
+    return response_cache.to_response(
+        response_cache.spot_cache.get_or_compute(
+            f"top:{version}:{country}:{limit}", load_top
+        )
+    )
+
+
+@router.get("/{id}", status_code=status.HTTP_200_OK, response_model=schemas.SpotOut)
+@query_budget.limit(queries=3)
+def get_one_spot(
+    id: int,
+    db: ReadDbDep,
+    current_user: CurrentUserDep,
+    if_none_match: IfNoneMatchDep = None,
+):
+    """Get a spot by ID, answering 304 when If-None-Match holds its ETag."""
+
+    def load_spot() -> response_cache.CachedResponse:
+        if spot := db.execute(
+            select(*models.Spot.__table__.c).where(models.Spot.id == id)
+        ).first():
+            return response_cache.spot(spot)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Spot with ID {id} not found",
+            )
+
+    entry = response_cache.spot_cache.get_or_compute(
+        f"spot:{catalog.current_version(db)}:{id}", load_spot
+    )
+    if catalog.etag_matches(if_none_match, entry.headers["ETag"]):
+        return catalog.not_modified(entry.headers["ETag"])
+    return response_cache.to_response(entry)
 
 
 @router.post("/", response_model=schemas.SpotOut)
@@ -40,6 +408,7 @@ def create_spot(spot_in: schemas.SpotIn, db: DbDep):
     new_spot = models.Spot(**spot_in.model_dump())
     try:
         db.add(new_spot)
+        version = catalog.bump_geometry(db)
         db.commit()
         db.refresh(new_spot)
     except IntegrityError as e:
@@ -48,50 +417,125 @@ def create_spot(spot_in: schemas.SpotIn, db: DbDep):
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Spot named {spot_in.name} already exists",
         ) from e
+    _spot_written(
+        new_spot.id,
+        None,
+        (new_spot.latitude, new_spot.longitude),
+        new_spot.name,
+        version,
+    )
 
     return new_spot
 
 
+@router.post(
+    "/import",
+    response_model=schemas.SpotImportReport,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                content_type: {"schema": {"type": "string"}}
+                for content_type in spot_import.CONTENT_TYPES
+            },
+        }
+    },
+)
+async def import_spots(
+    request: Request,
+    db: DbDep,
+    current_user: CurrentUserDep,
+    on_conflict: spot_import.OnConflict = "skip",
+):
+    """
+    Import spots from a streamed NDJSON or CSV body.
+
+    Rows are validated like in create_spot and written in batches, each
+    committed on its own. Spots whose name already exists are skipped or,
+    with on_conflict=update, overwritten. Returns a per-row error report.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in spot_import.CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Supported content types: {', '.join(spot_import.CONTENT_TYPES)}",
+        )
+    importer = spot_import.SpotImporter(spot_import.CONTENT_TYPES[content_type])
+
+    async def write(rows: list[dict]) -> None:
+        written, version = await run_in_threadpool(
+            spot_import.write_batch, db, rows, on_conflict
+        )
+        importer.written += len(written)
+        importer.skipped += len(rows) - len(written)
+        if on_conflict == "update" and not spatial.spot_index.loaded:
+            # previous positions of updated spots are unknown
+            clustering.tile_cache.clear()
+        for spot_id, latitude, longitude, name in written:
+            _spot_written(
+                spot_id,
+                spatial.spot_index.position(spot_id),
+                (latitude, longitude),
+                name,
+                version,
+            )
+
+    batch: list[dict] = []
+    async for line in spot_import.iter_lines(request.stream()):
+        if (row := importer.parse(line)) is not None:
+            batch.append(row)
+        if len(batch) >= spot_import.IMPORT_BATCH_SIZE:
+            await write(batch)
+            batch = []
+    if batch:
+        await write(batch)
+    return importer.report()
+
+
 @router.delete("/{id}")
+@query_budget.limit(queries=3)
 def delete_spot(id: int, db: DbDep, current_user: CurrentUserDep):
     """
     Delete a spot by ID.
     """
-    spot_query = db.query(models.Spot).filter(models.Spot.id == id)
-    spot = spot_query.first()
+    spot = db.execute(
+        delete(models.Spot)
+        .where(models.Spot.id == id)
+        .returning(models.Spot.latitude, models.Spot.longitude)
+    ).first()
     if not spot:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Spot with ID {id} not found in database",
         )
-    spot_query.delete(synchronize_session=False)
+    version = catalog.bump_geometry(db)
     db.commit()
+    _spot_written(id, (spot.latitude, spot.longitude), None, None, version)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.patch("/{id}", status_code=status.HTTP_200_OK, response_model=schemas.SpotOut)
+@query_budget.limit(queries=2)
 def update_spot(id: int, new_spot: schemas.SpotUpdate, db: DbDep):
-    """Update spot by ID."""
-    spot_query = db.query(models.Spot).filter(models.Spot.id == id)
-    spot = spot_query.first()
-
-    if not spot:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail=f"Spot with ID {id} not found"
-        )
-
-    # updating provided data and validating it against schemas
-    stored_spot_data = jsonable_encoder(spot)
-    stored_spot_model = schemas.SpotUpdate(**stored_spot_data)
-    update_data = new_spot.model_dump(exclude_unset=True)
-    updated_spot = stored_spot_model.model_copy(update=update_data)
-
-    for key, value in updated_spot.model_dump().items():
-        setattr(spot, key, value)
-
+    """Update the given fields of a spot by ID."""
+    values = new_spot.model_dump(exclude_unset=True)
+    # RETURNING only has the new row, the index still has the old position
+    old_position = spatial.spot_index.position(id)
     try:
+        spot = db.execute(
+            update(models.Spot)
+            .where(models.Spot.id == id)
+            .values(**values, version=models.Spot.version + 1)
+            .returning(*models.Spot.__table__.c)
+        ).first()
+        if not spot:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Spot with ID {id} not found",
+            )
+        version = catalog.bump_geometry(db)
         db.commit()
-        db.refresh(spot)
     except IntegrityError as e:
         db.rollback()
 
@@ -99,4 +543,10 @@ def update_spot(id: int, new_spot: schemas.SpotUpdate, db: DbDep):
             status_code=status.HTTP_409_CONFLICT,
             detail="Spot with this data already exists",
         ) from e
-    return spot
+    if old_position is None and values.keys() & {"latitude", "longitude"}:
+        # the index is not loaded, tiles of the previous position are unknown
+        clustering.tile_cache.clear()
+    _spot_written(
+        spot.id, old_position, (spot.latitude, spot.longitude), spot.name, version
+    )
+    return response_cache.to_response(response_cache.spot(spot))
@@ -1,21 +1,38 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import delete, literal, select, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm import Session
 
-from .. import models, oauth2, schemas, utils
-from ..database import get_db
+from .. import (
+    admission,
+    favourites,
+    models,
+    oauth2,
+    pagination,
+    query_budget,
+    replicas,
+    response_cache,
+    schemas,
+    utils,
+)
+from ..database import dialect_insert, get_db
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 # common dependency
 DbDep = Annotated[Session, Depends(get_db)]
+ReadDbDep = Annotated[Session, Depends(replicas.get_read_db)]
 CurrentUserDep = Annotated[models.User, Depends(oauth2.get_current_user)]
 
+USER_COLUMNS = pagination.columns(schemas.UserOut, models.User)
+SPOT_COLUMNS = pagination.columns(schemas.SpotOut, models.Spot)
+
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.UserOut)
+@admission.route_class("auth")
 def create_user(user: schemas.UserCreate, db: DbDep):
     """
     Create a new user in the database.
@@ -45,16 +62,72 @@ def create_user(user: schemas.UserCreate, db: DbDep):
 
 
 @router.get("/spots", response_model=schemas.UserWithSpots)
-def get_user_spots(db: DbDep, user_auth: CurrentUserDep):
-    print(user_auth.id)
-    user_with_spots = (
-        db.query(models.User)
-        .options(selectinload(models.User.spots))
-        .filter(models.User.id == user_auth.id)
-        .first()
+@query_budget.limit(queries=3)
+def get_user_spots(db: ReadDbDep, user_auth: CurrentUserDep):
+    user = db.execute(select(*USER_COLUMNS).where(models.User.id == user_auth.id)).one()
+    spots = db.execute(
+        select(*SPOT_COLUMNS)
+        .join(models.UserSpots, models.UserSpots.spot_id == models.Spot.id)
+        .where(models.UserSpots.user_id == user_auth.id)
+    )
+    return ORJSONResponse(
+        {**user._asdict(), "spots": [spot._asdict() for spot in spots]}
+    )
+
+
+def _user_spot_rows(db: Session, user_id: int, *columns):
+    return db.execute(
+        select(*columns, models.Spot.latitude, models.Spot.longitude)
+        .join(models.UserSpots, models.UserSpots.spot_id == models.Spot.id)
+        .where(models.UserSpots.user_id == user_id)
+        .order_by(models.Spot.id)
+    ).all()
+
+
+@router.get("/spots/distances", response_model=schemas.DistanceMatrix)
+@query_budget.limit(queries=2)
+def get_user_spot_distances(db: DbDep, user_auth: CurrentUserDep):
+    """Get the great-circle distances in km between every two of the user's spots."""
+    # imports numpy, deferred to first use
+    from .. import distances
+
+    rows = _user_spot_rows(db, user_auth.id, models.Spot.id)
+    latitudes, longitudes = distances.coordinate_arrays(
+        (row.latitude, row.longitude) for row in rows
+    )
+    return ORJSONResponse(
+        {
+            "spot_ids": [row.id for row in rows],
+            "distances_km": distances.haversine_matrix(latitudes, longitudes).tolist(),
+        }
+    )
+
+
+@router.get("/spots/closest", response_model=list[schemas.SpotNearby])
+@query_budget.limit(queries=2)
+def get_closest_user_spots(
+    lat: Annotated[float, Query(ge=-90, le=90)],
+    lon: Annotated[float, Query(ge=-180, le=180)],
+    db: DbDep,
+    user_auth: CurrentUserDep,
+    limit: Annotated[int, Query(ge=1, le=schemas.MAX_NEAREST_SPOTS)] = 10,
+):
+    """Get the user's spots closest to a point, ordered by great-circle distance."""
+    # imports numpy, deferred to first use
+    from .. import distances
+
+    rows = _user_spot_rows(db, user_auth.id, *SPOT_COLUMNS)
+    latitudes, longitudes = distances.coordinate_arrays(
+        (row.latitude, row.longitude) for row in rows
+    )
+    return ORJSONResponse(
+        [
+            {**rows[i]._asdict(), "distance_km": distance_km}
+            for i, distance_km in distances.closest(
+                lat, lon, latitudes, longitudes, limit
+            )
+        ]
     )
-    print(user_with_spots)
-    return user_with_spots
 
 
 @router.get("/{id}", response_model=schemas.UserOut)
@@ -70,67 +143,97 @@ def get_one_user(id: int, db: DbDep):
 
 
 @router.get("/", response_model=list[schemas.UserOut])
-def get_all_active_users(db: DbDep):
+def get_all_active_users(
+    response: Response,
+    db: ReadDbDep,
+    limit: Annotated[
+        int, Query(ge=1, le=pagination.MAX_PAGE_SIZE)
+    ] = pagination.DEFAULT_PAGE_SIZE,
+    after: str | None = None,
+    stream: bool = False,
+):
     """
-    Get all active users.
+    Get active users ordered by ID, one page at a time.
+
+    Pass the X-Next-Cursor response header as `after` to get the next page.
+    With `stream` set, all users after the cursor are streamed instead.
     """
-    if users := db.query(models.User).filter(models.User.active == True).all():
-        return users
-    else:
+    stmt = select(*USER_COLUMNS).where(models.User.active.is_(True))
+    if stream:
+        rows = db.execute(
+            pagination.keyset(stmt, models.User.id, after).execution_options(
+                yield_per=pagination.STREAM_BATCH_SIZE
+            )
+        )
+        return StreamingResponse(
+            pagination.stream_json_array(rows),
+            media_type="application/json",
+        )
+    users = pagination.paginate(db, stmt, models.User.id, limit, after, response)
+    # an empty page past the last cursor is not an error
+    if not users and after is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="No users found in database"
         )
+    return pagination.json_page(users, response)
 
 
 @router.delete("/{id}")
+@query_budget.limit(queries=3)
 def delete_user(id: int, db: DbDep):
     """
     Delete a user by ID.
     """
-    user_query = db.query(models.User).filter(models.User.id == id)
-    user = user_query.first()
-    if not user:
+    # user_spots rows go with the user, the counters must go down with them
+    favourites.forget_user(db, id)
+    if not db.scalar(
+        delete(models.User).where(models.User.id == id).returning(models.User.id)
+    ):
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {id} not found in database",
         )
-    user_query.delete(synchronize_session=False)
     db.commit()
+    oauth2.invalidate_user(id)
+    response_cache.spot_cache.invalidate()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.patch("/{id}", status_code=status.HTTP_200_OK, response_model=schemas.UserOut)
+@query_budget.limit(queries=1)
 def update_user(id: int, new_user: schemas.UserUpdate, db: DbDep):
-    user_query = db.query(models.User).filter(models.User.id == id)
-    user = user_query.first()
-
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"User with ID {id} not found in database",
-        )
-    stored_user_data = jsonable_encoder(user)
-    stored_user_model = schemas.UserUpdate(**stored_user_data)
-    update_data = new_user.model_dump(exclude_unset=True)
-    updated_user = stored_user_model.model_copy(update=update_data)
-
-    for key, value in updated_user.model_dump().items():
-        setattr(user, key, value)
-
+    """Update the given fields of a user by ID."""
+    stmt = (
+        update(models.User)
+        .where(models.User.id == id)
+        .values(**new_user.model_dump(exclude_unset=True))
+        .returning(*USER_COLUMNS)
+        if new_user.model_fields_set
+        # nothing to change, an UPDATE needs at least one column
+        else select(*USER_COLUMNS).where(models.User.id == id)
+    )
     try:
+        user = db.execute(stmt).first()
         db.commit()
-        db.refresh(user)
     except IntegrityError as e:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="User with this data already exists",
         ) from e
-    return user
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with ID {id} not found in database",
+        )
+    oauth2.invalidate_user(id)
+    return ORJSONResponse(user._asdict())
 
 
 # spots
 @router.post("/add_spot/{id}")
+@query_budget.limit(queries=4)
 def add_spot_to_user(id: int, db: DbDep, user_auth: CurrentUserDep):
     """
     Adds a spot to the user's list of spots.
@@ -153,25 +256,16 @@ def add_spot_to_user(id: int, db: DbDep, user_auth: CurrentUserDep):
     - HTTPException: 409 if the user is already associated with the spot.
     """
 
-    spot = db.query(models.Spot).filter(models.Spot.id == id).first()
-    if not spot:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Spot with id {id} do not exist",
-        )
-    if (
-        db.query(models.User)
-        .join(models.UserSpots)
-        .join(models.Spot)
-        .filter(models.User.id == user_auth.id, models.Spot.id == id)
-        .first()
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"User with id {user_auth.id} is already added to spot with id {id}",
-        )
+    # the counter update doubles as the existence check; an existing
+    # favourite fails on the primary key, rolling the update back
     try:
-        user_auth.spots.append(spot)
+        if not favourites.adjust(db, [id], 1):
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Spot with id {id} do not exist",
+            )
+        db.add(models.UserSpots(user_id=user_auth.id, spot_id=id))
         db.commit()
     except IntegrityError as e:
         db.rollback()
@@ -179,4 +273,75 @@ def add_spot_to_user(id: int, db: DbDep, user_auth: CurrentUserDep):
             status_code=status.HTTP_409_CONFLICT,
             detail=f"User with id {user_auth.id} is already added to spot with id {id}",
         ) from e
+    response_cache.spot_cache.invalidate()
     return Response(status_code=status.HTTP_201_CREATED)
+
+
+@router.post("/add_spots", response_model=schemas.FavouritesAdded)
+@query_budget.limit(queries=5)
+def add_spots_to_user(
+    batch: schemas.FavouriteSpots, db: DbDep, user_auth: CurrentUserDep
+):
+    """
+    Add a list of spots to the user's spots with a single insert.
+
+    Returns the ids added, those the user already had and those of spots
+    that do not exist.
+    """
+    spot_ids = list(dict.fromkeys(batch.spot_ids))
+    added = set(
+        db.scalars(
+            dialect_insert(db)(models.UserSpots)
+            .from_select(
+                ["user_id", "spot_id"],
+                select(literal(user_auth.id), models.Spot.id).where(
+                    models.Spot.id.in_(spot_ids)
+                ),
+            )
+            .on_conflict_do_nothing()
+            .returning(models.UserSpots.spot_id)
+        )
+    )
+    favourites.adjust(db, added, 1)
+    db.commit()
+    if added:
+        response_cache.spot_cache.invalidate()
+    # only ids that were not added need telling apart
+    rest = [spot_id for spot_id in spot_ids if spot_id not in added]
+    existing = (
+        set(db.scalars(select(models.Spot.id).where(models.Spot.id.in_(rest))))
+        if rest
+        else set()
+    )
+    return {
+        "added": [spot_id for spot_id in spot_ids if spot_id in added],
+        "already_present": [spot_id for spot_id in rest if spot_id in existing],
+        "missing": [spot_id for spot_id in rest if spot_id not in existing],
+    }
+
+
+@router.post("/remove_spots", response_model=schemas.FavouritesRemoved)
+@query_budget.limit(queries=4)
+def remove_spots_from_user(
+    batch: schemas.FavouriteSpots, db: DbDep, user_auth: CurrentUserDep
+):
+    """Remove a list of spots from the user's spots with a single delete."""
+    spot_ids = list(dict.fromkeys(batch.spot_ids))
+    removed = set(
+        db.scalars(
+            delete(models.UserSpots)
+            .where(
+                models.UserSpots.user_id == user_auth.id,
+                models.UserSpots.spot_id.in_(spot_ids),
+            )
+            .returning(models.UserSpots.spot_id)
+        )
+    )
+    favourites.adjust(db, removed, -1)
+    db.commit()
+    if removed:
+        response_cache.spot_cache.invalidate()
+    return {
+        "removed": [spot_id for spot_id in spot_ids if spot_id in removed],
+        "not_present": [spot_id for spot_id in spot_ids if spot_id not in removed],
+    }
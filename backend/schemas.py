@@ -1,4 +1,5 @@
 from pydantic import (
+    AwareDatetime,
     BaseModel,
     EmailStr,
     ConfigDict,
@@ -6,13 +7,18 @@ from pydantic import (
     Field,
 )
 from pydantic_extra_types.coordinate import Longitude, Latitude
-from pydantic_extra_types.country import CountryShortName
 
 from datetime import datetime
 from typing import Annotated
 
+from .countries import CountryCode
+
 MIN_PASSWORD_LENGTH = 5
 MIN_NAME_LENGTH = 2
+MAX_FAVOURITES_BATCH = 1000
+MAX_READINGS_BATCH = 1000
+MAX_DISTANCE_POINTS = 1000
+MAX_NEAREST_SPOTS = 100
 
 
 class UserBase(BaseModel):
@@ -52,7 +58,7 @@ class SpotIn(BaseModel):
     latitude: Latitude  # first - szerokosc
     longitude: Longitude  # second - dlugosc
     name: str = Field(..., min_length=2)
-    country: CountryShortName
+    country: CountryCode
 
     # todo: validate latitude and longitude to 14 places after decimal
 
@@ -63,16 +69,148 @@ class Spot(SpotIn):
 
 class SpotOut(Spot):
     model_config = ConfigDict(from_attributes=True)
-    pass
+    favourite_count: int = 0
+
+
+class SpotNearby(SpotOut):
+    distance_km: float
+
+
+class Point(BaseModel):
+    latitude: Latitude
+    longitude: Longitude
+
+
+class PointSet(BaseModel):
+    points: list[Point] = Field(..., min_length=1, max_length=MAX_DISTANCE_POINTS)
+    k: int = Field(1, ge=1, le=MAX_NEAREST_SPOTS)
+
+
+class NearestSpots(Point):
+    # closest first
+    spot_ids: list[int]
+    distances_km: list[float]
+
+
+class DistanceMatrix(BaseModel):
+    spot_ids: list[int]
+    # distances_km[i][j] is between spot_ids[i] and spot_ids[j]
+    distances_km: list[list[float]]
+
+
+class SpotCluster(BaseModel):
+    latitude: float
+    longitude: float
+    count: int
+
+
+class Viewport(BaseModel):
+    zoom: int
+    clusters: list[SpotCluster] = []
+    spots: list[SpotOut] = []
+
+
+class SpotImportError(BaseModel):
+    line: int
+    detail: str
+
+
+class SpotImportReport(BaseModel):
+    received: int
+    written: int
+    # rows of existing spots left untouched with on_conflict=skip
+    skipped: int
+    failed: int
+    errors: list[SpotImportError]
 
 
 class SpotUpdate(BaseModel):
     latitude: Latitude | None = None  # first - szerokosc
     longitude: Longitude | None = None  # second - dlugosc
     name: str | None = Field(None, min_length=2)
-    country: CountryShortName | None = None
+    country: CountryCode | None = None
+
+
+class FavouriteSpots(BaseModel):
+    spot_ids: list[int] = Field(..., min_length=1, max_length=MAX_FAVOURITES_BATCH)
+
+
+class FavouritesAdded(BaseModel):
+    added: list[int]
+    already_present: list[int]
+    # ids of spots that do not exist
+    missing: list[int]
+
+
+class FavouritesRemoved(BaseModel):
+    removed: list[int]
+    # ids that were not among the user's spots
+    not_present: list[int]
+
+
+class Reading(BaseModel):
+    spot_id: int
+    observed_at: AwareDatetime
+    # knots
+    wind_speed: float = Field(..., ge=0)
+    gust: float | None = Field(None, ge=0)
+    # degrees the wind comes from
+    direction: int = Field(..., ge=0, lt=360)
+
+
+class ReadingBatch(BaseModel):
+    readings: list[Reading] = Field(..., min_length=1, max_length=MAX_READINGS_BATCH)
+
+
+class ReadingsAccepted(BaseModel):
+    accepted: int
+    # readings of a spot at a time already stored
+    duplicates: int
+    unknown_spots: list[int]
+
+
+class Conditions(BaseModel):
+    bucket_start: datetime
+    readings: int
+    wind_speed_avg: float
+    wind_speed_max: float
+    gust_max: float | None
+    direction: int
+
+
+class SpotConditions(SpotOut):
+    wind_speed_avg: float
+    gust_max: float | None
+    direction: int
 
 
 # think if it shoudn't be an empty list instead + change output in routes
 class UserWithSpots(UserOut):
     spots: list[SpotOut] | None
+
+
+class Histogram(BaseModel):
+    # cumulative counts keyed by bucket upper bound
+    buckets: dict[str, int]
+    count: int
+    sum: float
+
+
+class PoolStats(BaseModel):
+    pool_size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    checkout_timeouts: int
+    connects: int
+    closes: int
+    invalidations: int
+    checkout_wait_ms: Histogram
+
+
+class CacheStats(BaseModel):
+    size: int
+    hits: int
+    misses: int
+    hit_rate: float
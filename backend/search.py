@@ -0,0 +1,207 @@
+"""Spot search by name: prefix autocomplete with typo-tolerant fallback.
+
+Names are normalised like country names (casefolded, accents dropped).
+Prefix matches come first: spots whose name starts with the query, then
+spots with a later word starting with it, both in alphabetical order. The
+rest are ranked by trigram similarity, computed like pg_trgm does.
+
+By default the process-local NameIndex answers searches; like the spatial
+index it follows this process's spot writes and is rebuilt once the geometry
+version shows writes of other workers. With settings.spot_search set to
+"database" the pg_trgm index created by migration is queried instead, on
+names normalised the same way in SQL.
+"""
+
+import bisect
+import re
+import threading
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterable
+
+from sqlalchemy import Select, case, func, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .countries import normalize
+
+# pg_trgm's default similarity threshold
+MIN_SIMILARITY = 0.3
+
+_word = re.compile(r"\w+")
+
+
+def trigrams(normalized: str) -> frozenset[str]:
+    """Trigrams of each word padded with two spaces in front, one behind."""
+    grams = set()
+    for word in _word.findall(normalized):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def _word_starts(normalized: str) -> list[str]:
+    """Suffixes of the name starting at its second and later words."""
+    return [normalized[m.start() :] for m in _word.finditer(normalized)][1:]
+
+
+class NameIndex:
+    """
+    Sorted name and word lists for prefix lookups by binary search, plus
+    trigram posting sets for similarity search.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._names: dict[int, str] = {}
+            self._sorted_names: list[tuple[str, int]] = []
+            self._sorted_words: list[tuple[str, int]] = []
+            self._trigrams: dict[int, frozenset[str]] = {}
+            self._postings: defaultdict[str, set[int]] = defaultdict(set)
+            self.loaded = False
+            # geometry version the index was loaded at
+            self.version: int | None = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def ensure_loaded(
+        self, version: int, load_rows: Callable[[], Iterable[tuple[int, str]]]
+    ) -> None:
+        """Build the index, again once the geometry version moved on."""
+        with self._lock:
+            if not self.loaded or self.version != version:
+                self.rebuild(load_rows())
+                self.version = version
+
+    def written(self, version: int) -> None:
+        """Record that a write of this process committed the given version."""
+        with self._lock:
+            if self.version == version - 1:
+                self.version = version
+
+    def rebuild(self, rows: Iterable[tuple[int, str]]) -> None:
+        with self._lock:
+            self.clear()
+            for spot_id, name in rows:
+                normalized = normalize(name)
+                self._names[spot_id] = normalized
+                self._sorted_names.append((normalized, spot_id))
+                self._sorted_words.extend(
+                    (word, spot_id) for word in _word_starts(normalized)
+                )
+                self._index_trigrams(spot_id, normalized)
+            self._sorted_names.sort()
+            self._sorted_words.sort()
+            self.loaded = True
+
+    def add(self, spot_id: int, name: str) -> None:
+        """Insert a spot or rename it."""
+        with self._lock:
+            if not self.loaded:
+                return
+            self._discard(spot_id)
+            normalized = normalize(name)
+            self._names[spot_id] = normalized
+            bisect.insort(self._sorted_names, (normalized, spot_id))
+            for word in _word_starts(normalized):
+                bisect.insort(self._sorted_words, (word, spot_id))
+            self._index_trigrams(spot_id, normalized)
+
+    def remove(self, spot_id: int) -> None:
+        with self._lock:
+            self._discard(spot_id)
+
+    def _index_trigrams(self, spot_id: int, normalized: str) -> None:
+        grams = trigrams(normalized)
+        self._trigrams[spot_id] = grams
+        for gram in grams:
+            self._postings[gram].add(spot_id)
+
+    def _discard(self, spot_id: int) -> None:
+        if (normalized := self._names.pop(spot_id, None)) is None:
+            return
+        self._sorted_names.pop(
+            bisect.bisect_left(self._sorted_names, (normalized, spot_id))
+        )
+        for word in _word_starts(normalized):
+            self._sorted_words.pop(
+                bisect.bisect_left(self._sorted_words, (word, spot_id))
+            )
+        for gram in self._trigrams.pop(spot_id):
+            postings = self._postings[gram]
+            postings.discard(spot_id)
+            if not postings:
+                del self._postings[gram]
+
+    def search(self, query: str, limit: int) -> list[int]:
+        """Return up to `limit` spot ids, best match first."""
+        query = normalize(query)
+        if not query:
+            return []
+        found: dict[int, None] = {}
+        with self._lock:
+            for entries in (self._sorted_names, self._sorted_words):
+                index = bisect.bisect_left(entries, (query,))
+                while len(found) < limit and index < len(entries):
+                    name, spot_id = entries[index]
+                    if not name.startswith(query):
+                        break
+                    found.setdefault(spot_id)
+                    index += 1
+            if len(found) < limit:
+                found.update(
+                    dict.fromkeys(self._similar(query, limit - len(found), found))
+                )
+        return list(found)
+
+    def _similar(self, query: str, limit: int, exclude: dict[int, None]) -> list[int]:
+        query_grams = trigrams(query)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self._postings.get(gram, ()))
+        scored = []
+        for spot_id, count in shared.items():
+            if spot_id in exclude:
+                continue
+            score = count / (len(query_grams) + len(self._trigrams[spot_id]) - count)
+            if score >= MIN_SIMILARITY:
+                scored.append((-score, spot_id))
+        scored.sort()
+        return [spot_id for _, spot_id in scored[:limit]]
+
+
+def load_rows(db: Session) -> list[tuple[int, str]]:
+    return [tuple(row) for row in db.execute(select(models.Spot.id, models.Spot.name))]
+
+
+def trigram_search(stmt: Select, query: str, limit: int) -> Select:
+    """Filter and rank spots with pg_trgm, see the ix_spots_name_trgm index.
+
+    Names are normalised by the spot_name_key SQL function, so the matches
+    are those of NameIndex; ties are broken by name instead of spot id.
+    """
+    name = func.spot_name_key(models.Spot.name)
+    query = normalize(query)
+    if not query:
+        return stmt.limit(0)
+    prefix = name.startswith(query, autoescape=True)
+    word_prefix = name.regexp_match(r"\m" + re.escape(query))
+    matched = or_(prefix, word_prefix)
+    return (
+        stmt.where(or_(matched, name.op("%")(query)))
+        .order_by(
+            prefix.desc(),
+            word_prefix.desc(),
+            case((matched, 0.0), else_=func.similarity(name, query)).desc(),
+            name,
+            models.Spot.id,
+        )
+        .limit(limit)
+    )
+
+
+name_index = NameIndex()
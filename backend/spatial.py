@@ -0,0 +1,254 @@
+"""Process-local nearest-neighbour index over spot coordinates.
+
+Spots are stored in a k-d tree over unit-sphere (x, y, z) coordinates, so the
+euclidean chord distance orders points exactly like the great-circle distance
+and there are no special cases around the poles or the antimeridian.
+"""
+
+import heapq
+import math
+import threading
+from collections.abc import Callable, Iterable
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_xyz(latitude: float, longitude: float) -> tuple[float, float, float]:
+    phi, lam = math.radians(latitude), math.radians(longitude)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi))
+
+
+def chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km: float) -> float:
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lam = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lam / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class _Node:
+    __slots__ = (
+        "axis",
+        "deleted",
+        "latitude",
+        "left",
+        "longitude",
+        "right",
+        "spot_id",
+        "xyz",
+    )
+
+    def __init__(self, spot_id: int, latitude: float, longitude: float, axis: int):
+        self.spot_id = spot_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.xyz = to_xyz(latitude, longitude)
+        self.axis = axis
+        self.left: _Node | None = None
+        self.right: _Node | None = None
+        self.deleted = False
+
+
+class SpotIndex:
+    """
+    K-d tree supporting incremental inserts and removals.
+
+    Removed nodes stay in the tree as tombstones and inserts are appended
+    at the leaves; the tree is rebuilt from live nodes once either grows
+    larger than the number of live spots.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._root: _Node | None = None
+            self._nodes: dict[int, _Node] = {}
+            self._tombstones = 0
+            self._inserts = 0
+            self.loaded = False
+            # geometry version the tree was loaded at
+            self.version: int | None = None
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def ensure_loaded(
+        self, version: int, load_rows: Callable[[], Iterable[tuple[int, float, float]]]
+    ) -> None:
+        """Build the tree, again once the geometry version moved on.
+
+        Writes made by this process are applied right away, those of other
+        workers only show up as a new geometry version.
+        """
+        # lock is held while loading so writes committed meanwhile
+        # are applied on top of the fresh tree, not lost
+        with self._lock:
+            if not self.loaded or self.version != version:
+                self.rebuild(load_rows())
+                self.version = version
+
+    def written(self, version: int) -> None:
+        """Record that a write of this process committed the given version.
+
+        The writes are applied incrementally, so the tree keeps up unless
+        another worker wrote since it was loaded.
+        """
+        with self._lock:
+            if self.version == version - 1:
+                self.version = version
+
+    def rebuild(self, rows: Iterable[tuple[int, float, float]]) -> None:
+        with self._lock:
+            nodes = [_Node(spot_id, lat, lon, 0) for spot_id, lat, lon in rows]
+            self._nodes = {node.spot_id: node for node in nodes}
+            self._root = self._build(nodes, 0)
+            self._tombstones = 0
+            self._inserts = 0
+            self.loaded = True
+
+    def _build(self, nodes: list[_Node], axis: int) -> _Node | None:
+        if not nodes:
+            return None
+        nodes.sort(key=lambda node: node.xyz[axis])
+        median = len(nodes) // 2
+        # equal coordinates must end up on the right, like in _insert
+        while median > 0 and nodes[median - 1].xyz[axis] == nodes[median].xyz[axis]:
+            median -= 1
+        node = nodes[median]
+        node.axis = axis
+        next_axis = (axis + 1) % 3
+        node.left = self._build(nodes[:median], next_axis)
+        node.right = self._build(nodes[median + 1 :], next_axis)
+        return node
+
+    def position(self, spot_id: int) -> tuple[float, float] | None:
+        if node := self._nodes.get(spot_id):
+            return node.latitude, node.longitude
+        return None
+
+    def add(self, spot_id: int, latitude: float, longitude: float) -> None:
+        """Insert a spot or move it to new coordinates."""
+        with self._lock:
+            if not self.loaded:
+                return
+            self._discard(spot_id)
+            node = _Node(spot_id, latitude, longitude, 0)
+            self._nodes[spot_id] = node
+            self._insert(node)
+            self._inserts += 1
+            self._maybe_rebuild()
+
+    def remove(self, spot_id: int) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            self._discard(spot_id)
+            self._maybe_rebuild()
+
+    def _discard(self, spot_id: int) -> None:
+        if node := self._nodes.pop(spot_id, None):
+            node.deleted = True
+            self._tombstones += 1
+
+    def _insert(self, node: _Node) -> None:
+        if self._root is None:
+            self._root = node
+            return
+        parent = self._root
+        while True:
+            axis = parent.axis
+            if node.xyz[axis] < parent.xyz[axis]:
+                if parent.left is None:
+                    parent.left = node
+                    break
+                parent = parent.left
+            else:
+                if parent.right is None:
+                    parent.right = node
+                    break
+                parent = parent.right
+        node.axis = (parent.axis + 1) % 3
+
+    def _maybe_rebuild(self) -> None:
+        if max(self._tombstones, self._inserts) > max(len(self._nodes), 64):
+            self.rebuild(
+                (node.spot_id, node.latitude, node.longitude)
+                for node in self._nodes.values()
+            )
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        radius_km: float | None = None,
+    ) -> list[tuple[int, float]]:
+        """Return up to k (spot_id, distance_km) pairs, closest first."""
+        query = to_xyz(latitude, longitude)
+        bound = math.inf if radius_km is None else km_to_chord(radius_km) ** 2
+        heap: list[tuple[float, int]] = []  # max-heap on negated squared chord
+
+        with self._lock:
+            stack: list[tuple[_Node | None, float]] = [(self._root, 0.0)]
+            while stack:
+                node, plane_d2 = stack.pop()
+                if node is None or plane_d2 > bound:
+                    continue
+                xyz = node.xyz
+                if not node.deleted:
+                    d2 = (
+                        (query[0] - xyz[0]) ** 2
+                        + (query[1] - xyz[1]) ** 2
+                        + (query[2] - xyz[2]) ** 2
+                    )
+                    if d2 <= bound:
+                        if len(heap) < k:
+                            heapq.heappush(heap, (-d2, node.spot_id))
+                        else:
+                            heapq.heapreplace(heap, (-d2, node.spot_id))
+                        if len(heap) == k:
+                            bound = -heap[0][0]
+                diff = query[node.axis] - xyz[node.axis]
+                if diff < 0:
+                    near, far = node.left, node.right
+                else:
+                    near, far = node.right, node.left
+                # far side pushed first so the near side is explored first
+                stack.append((far, diff * diff))
+                stack.append((near, 0.0))
+
+        return [
+            (spot_id, chord_to_km(math.sqrt(-neg_d2)))
+            for neg_d2, spot_id in sorted(heap, reverse=True)
+        ]
+
+
+def load_rows(db: Session) -> list[tuple[int, float, float]]:
+    return [
+        (spot_id, lat, lon)
+        for spot_id, lat, lon in db.query(
+            models.Spot.id, models.Spot.latitude, models.Spot.longitude
+        )
+    ]
+
+
+spot_index = SpotIndex()
@@ -0,0 +1,90 @@
+"""Streaming export of the spots catalog as GeoJSON or NDJSON.
+
+Rows come as plain tuples from a server-side cursor and are encoded batch by
+batch, so memory use does not depend on the size of the catalog.
+"""
+
+import json
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Literal
+
+from sqlalchemy import Row, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+EXPORT_BATCH_SIZE = 1000
+
+ExportFormat = Literal["geojson", "ndjson"]
+
+MEDIA_TYPES: dict[ExportFormat, str] = {
+    "geojson": "application/geo+json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_batches(db: Session) -> Iterator[list[Row]]:
+    result = db.execute(
+        select(
+            models.Spot.id,
+            models.Spot.latitude,
+            models.Spot.longitude,
+            models.Spot.name,
+            models.Spot.country,
+        )
+        .order_by(models.Spot.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    return result.partitions()
+
+
+def _dumps(obj: dict) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def encode_ndjson(batches: Iterable[list[Row]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield b"".join(
+            _dumps(
+                {
+                    "id": spot_id,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "name": name,
+                    "country": country,
+                }
+            )
+            + b"\n"
+            for spot_id, latitude, longitude, name, country in batch
+        )
+
+
+def encode_geojson(batches: Iterable[list[Row]]) -> Iterator[bytes]:
+    yield b'{"type":"FeatureCollection","features":['
+    separator = b""
+    for batch in batches:
+        yield separator + b",".join(
+            _dumps(
+                {
+                    "type": "Feature",
+                    "id": spot_id,
+                    "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+                    "properties": {"name": name, "country": country},
+                }
+            )
+            for spot_id, latitude, longitude, name, country in batch
+        )
+        separator = b","
+    yield b"]}"
+
+
+ENCODERS = {"geojson": encode_geojson, "ndjson": encode_ndjson}
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
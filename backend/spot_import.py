@@ -0,0 +1,213 @@
+"""Bulk spot import from NDJSON or CSV streams.
+
+Rows are parsed and validated through schemas.SpotIn one line at a time and
+written in batches: COPY into a temporary table followed by a single
+INSERT ... SELECT ... ON CONFLICT (name) on PostgreSQL, a multi-row
+INSERT ... ON CONFLICT (name) elsewhere.
+"""
+
+import csv
+import io
+import json
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Literal
+
+from pydantic import ValidationError
+from sqlalchemy import Row, func, text
+from sqlalchemy.orm import Session
+
+from . import catalog, database, models, schemas
+
+IMPORT_BATCH_SIZE = 1000
+# errors beyond this are counted but not listed in the report
+MAX_REPORTED_ERRORS = 1000
+SPOT_COLUMNS = ("latitude", "longitude", "name", "country")
+
+ImportFormat = Literal["ndjson", "csv"]
+OnConflict = Literal["skip", "update"]
+
+CONTENT_TYPES: dict[str, ImportFormat] = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    pending = b""
+    async for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+class SpotImporter:
+    """
+    Parses and validates import lines, accumulating the import report.
+
+    CSV input needs a header row naming the columns and one record per line.
+    """
+
+    def __init__(self, import_format: ImportFormat) -> None:
+        self.format = import_format
+        self.header: list[str] | None = None
+        self.line = 0
+        self.names: set[str] = set()
+        self.received = 0
+        self.written = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors: list[schemas.SpotImportError] = []
+
+    def fail(self, detail: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(schemas.SpotImportError(line=self.line, detail=detail))
+
+    def parse(self, raw: bytes) -> dict | None:
+        """Return the validated spot of a line, None for errors and non-data lines."""
+        self.line += 1
+        try:
+            line = raw.decode().rstrip("\r")
+        except UnicodeDecodeError:
+            self.received += 1
+            self.fail("Line is not valid UTF-8")
+            return None
+        if not line.strip():
+            return None
+
+        if self.format == "csv":
+            values = next(csv.reader([line]))
+            if self.header is None:
+                self.header = [value.strip() for value in values]
+                return None
+            self.received += 1
+            if len(values) != len(self.header):
+                self.fail(f"Expected {len(self.header)} fields, got {len(values)}")
+                return None
+            data = dict(zip(self.header, values, strict=True))
+        else:
+            self.received += 1
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                self.fail(f"Invalid JSON: {e.msg}")
+                return None
+
+        try:
+            spot = schemas.SpotIn.model_validate(data)
+        except ValidationError as e:
+            self.fail(
+                "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                    for error in e.errors()
+                )
+            )
+            return None
+        if spot.name in self.names:
+            self.fail(f"Spot named {spot.name} appears earlier in the import")
+            return None
+        self.names.add(spot.name)
+        return spot.model_dump()
+
+    def report(self) -> schemas.SpotImportReport:
+        return schemas.SpotImportReport(
+            received=self.received,
+            written=self.written,
+            skipped=self.skipped,
+            failed=self.failed,
+            errors=self.errors,
+        )
+
+
+def write_batch(
+    db: Session, rows: list[dict], on_conflict: OnConflict
+) -> tuple[list[Row], int | None]:
+    """Write and commit a batch.
+
+    Returns id, position and name of the written rows and the geometry
+    version committed, None when nothing was written.
+    """
+    version = None
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            written = _copy_batch(db, rows, on_conflict)
+        else:
+            written = _insert_batch(db, rows, on_conflict)
+        if written:
+            version = catalog.bump_geometry(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return written, version
+
+
+def _insert_batch(db: Session, rows: list[dict], on_conflict: OnConflict) -> list[Row]:
+    stmt = database.dialect_insert(db)(models.Spot)
+    if on_conflict == "update":
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.Spot.name],
+            set_={
+                **{
+                    column: stmt.excluded[column]
+                    for column in SPOT_COLUMNS
+                    if column != "name"
+                },
+                "version": models.Spot.version + 1,
+                "updated_at": func.now(),
+            },
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[models.Spot.name])
+    stmt = stmt.returning(
+        models.Spot.id, models.Spot.latitude, models.Spot.longitude, models.Spot.name
+    )
+    return db.execute(stmt, rows).all()
+
+
+def _copy_batch(db: Session, rows: list[dict], on_conflict: OnConflict) -> list[Row]:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [row[column] for column in SPOT_COLUMNS] for row in rows
+    )
+    buffer.seek(0)
+
+    # kept per connection and emptied on commit
+    db.execute(
+        text(
+            "CREATE TEMP TABLE IF NOT EXISTS spots_import "
+            "(latitude double precision, longitude double precision, "
+            "name varchar, country varchar) ON COMMIT DELETE ROWS"
+        )
+    )
+    with db.connection().connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY spots_import ({', '.join(SPOT_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+    if on_conflict == "update":
+        conflict = "DO UPDATE SET " + ", ".join(
+            [
+                *(
+                    f"{column} = EXCLUDED.{column}"
+                    for column in SPOT_COLUMNS
+                    if column != "name"
+                ),
+                "version = spots.version + 1",
+                "updated_at = now()",
+            ]
+        )
+    else:
+        conflict = "DO NOTHING"
+    columns = ", ".join(SPOT_COLUMNS)
+    return db.execute(
+        text(
+            f"INSERT INTO spots ({columns}) SELECT {columns} FROM spots_import "
+            f"ON CONFLICT (name) {conflict} RETURNING id, latitude, longitude, name"
+        )
+    ).all()
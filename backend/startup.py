@@ -0,0 +1,129 @@
+"""Startup warm-up and import time report.
+
+Importing the app only defines it: engines, password hashing, JWT handling
+and the country table are set up on first use. warm_up does all of that
+ahead of time when settings.startup_warmup is on. The import time report
+catches regressions in how long a worker takes to import the app:
+
+    python -m backend.startup --threshold-ms 2000
+
+It runs `python -X importtime -c "import backend.main"` in a subprocess and
+prints the slowest imports as JSON. It exits with status 1 when the import
+takes longer than the threshold, or when a module that should be deferred is
+imported eagerly.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from contextlib import ExitStack
+from typing import NamedTuple
+
+# third-party modules the app must not import until first use
+DEFERRED_MODULES = ("jose", "passlib", "pycountry", "psycopg2", "asyncpg", "numpy")
+
+
+def _timed(steps: dict[str, float], name: str, step: Callable[[], object]) -> None:
+    start = time.perf_counter()
+    step()
+    steps[name] = round((time.perf_counter() - start) * 1000, 3)
+
+
+def warm_up() -> dict[str, float]:
+    """Prepare everything set up lazily, return milliseconds per step."""
+    from . import catalog, countries, database, search, spatial, utils
+    from .config import settings
+
+    def open_pool() -> None:
+        engine = database.get_engine()
+        # held at once, so the pool ends up with pool_size open connections
+        with ExitStack() as stack:
+            for _ in range(settings.db_pool_size):
+                stack.enter_context(engine.connect())
+        database.get_async_engine()
+
+    def load_spot_index() -> None:
+        with database.SessionLocal() as db:
+            spatial.spot_index.ensure_loaded(
+                catalog.geometry_version(db), lambda: spatial.load_rows(db)
+            )
+
+    def load_name_index() -> None:
+        if settings.spot_search == "memory":
+            with database.SessionLocal() as db:
+                search.name_index.ensure_loaded(
+                    catalog.geometry_version(db), lambda: search.load_rows(db)
+                )
+
+    def load_auth() -> None:
+        import jose.jwt  # noqa: F401
+
+        utils.crypt_context()
+        utils.hashing_pool.start()
+
+    steps: dict[str, float] = {}
+    _timed(steps, "pool", open_pool)
+    _timed(steps, "spot_index", load_spot_index)
+    _timed(steps, "name_index", load_name_index)
+    _timed(steps, "auth", load_auth)
+    _timed(steps, "countries", countries.table)
+    return steps
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output: str) -> list[ImportTime]:
+    """Parse the stderr of `python -X importtime`."""
+    times = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line.removeprefix("import time:").split("|")
+        times.append(ImportTime(module.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def import_report(module: str = "backend.main", top: int = 15) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = parse_importtime(result.stderr)
+    total = next(t.cumulative_us for t in times if t.module == module)
+    imported = {t.module.split(".")[0] for t in times}
+    return {
+        "module": module,
+        "total_ms": total / 1000,
+        "eager_deferred_modules": [m for m in DEFERRED_MODULES if m in imported],
+        "slowest": [
+            {"module": t.module, "self_ms": t.self_us / 1000}
+            for t in sorted(times, key=lambda t: t.self_us, reverse=True)[:top]
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--threshold-ms", type=float)
+    args = parser.parse_args()
+
+    report = import_report(args.module, args.top)
+    print(json.dumps(report, indent=2))
+    too_slow = args.threshold_ms is not None and report["total_ms"] > args.threshold_ms
+    if too_slow or report["eager_deferred_modules"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,22 @@
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from ..main import app
-from ..database import get_db, Base
+from ..main import app, include_routers
+from ..database import get_async_db, get_db, Base
+from .. import (
+    admission,
+    clustering,
+    distances,
+    oauth2,
+    response_cache,
+    search,
+    spatial,
+    utils,
+)
+from ..config import settings
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 import pytest
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -19,6 +32,30 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_
 Base.metadata.create_all(bind=test_engine)
 
 
+@pytest.fixture(autouse=True)
+def inline_password_hashing(monkeypatch):
+    # the process pool itself is covered in test_auth
+    monkeypatch.setattr(utils, "hashing_pool", utils.HashingPool(0, 0))
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(monkeypatch):
+    monkeypatch.setattr(settings, "query_budget", "raise")
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # ids are reused once the tables are dropped between tests
+    admission.admission_control.clear()
+    spatial.spot_index.clear()
+    search.name_index.clear()
+    clustering.tile_cache.clear()
+    distances.catalog_arrays.clear()
+    oauth2.token_cache.clear()
+    oauth2.principal_cache.clear()
+    response_cache.spot_cache.invalidate()
+
+
 @pytest.fixture
 def session():
     Base.metadata.create_all(bind=test_engine)
@@ -42,6 +79,42 @@ def client(session):
     yield TestClient(app)
 
 
+@pytest.fixture
+def async_client(tmp_path):
+    """Client of an app serving reads from AsyncSession (aiosqlite).
+
+    Sync and async sessions share one SQLite file, so data written through
+    the sync routes is visible to the async ones.
+    """
+    database_file = tmp_path / "test.db"
+    sync_engine = create_engine(
+        f"sqlite:///{database_file}", connect_args={"check_same_thread": False}
+    )
+    # every TestClient request runs in a new event loop, so connections
+    # must not be pooled across requests
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{database_file}", poolclass=NullPool
+    )
+    Base.metadata.create_all(bind=sync_engine)
+    SyncSessionLocal = sessionmaker(autoflush=False, bind=sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def override_get_db():
+        with SyncSessionLocal() as db:
+            yield db
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    async_app = FastAPI()
+    include_routers(async_app, db_async=True)
+    async_app.dependency_overrides[get_db] = override_get_db
+    async_app.dependency_overrides[get_async_db] = override_get_async_db
+    yield TestClient(async_app)
+    sync_engine.dispose()
+
+
 # create test users in database
 @pytest.fixture()
 def create_test_users(client):
@@ -57,3 +130,50 @@ def create_test_users(client):
         created_user["password"] = user["password"]
         created_users.append(created_user)
     return created_users
+
+
+@pytest.fixture()
+def token(client, create_test_users):
+    user = create_test_users[0]
+    response = client.post(
+        "/login", data={"username": user["email"], "password": user["password"]}
+    )
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+
+@pytest.fixture()
+def authorized_client(client, token):
+    client.headers = {**client.headers, "Authorization": f"Bearer {token}"}
+    return client
+
+
+@pytest.fixture()
+def create_test_spots(client):
+    spots_data = [
+        {
+            "latitude": 36.0139,
+            "longitude": -5.6044,
+            "name": "Tarifa",
+            "country": "Spain",
+        },
+        {"latitude": 54.6081, "longitude": 18.8018, "name": "Hel", "country": "Poland"},
+        {
+            "latitude": 54.7586,
+            "longitude": 18.5110,
+            "name": "Jastarnia",
+            "country": "Poland",
+        },
+        {
+            "latitude": 27.3980,
+            "longitude": 33.6800,
+            "name": "El Gouna",
+            "country": "Egypt",
+        },
+    ]
+    created_spots = []
+    for spot in spots_data:
+        response = client.post("/spots/", json=spot)
+        assert response.status_code == 200
+        created_spots.append(response.json())
+    return created_spots
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+
+from .. import pool_metrics
+
+
+def test_pool_stats(authorized_client):
+    response = authorized_client.get("/admin/pool")
+    assert response.status_code == 200
+    primary = response.json()["primary"]
+    assert primary["pool_size"] == 5
+    assert "+Inf" in primary["checkout_wait_ms"]["buckets"]
+
+
+def test_pool_stats_unauthorized(client):
+    assert client.get("/admin/pool").status_code == 401
+
+
+def test_instrumented_pool(tmp_path):
+    metrics = pool_metrics.PoolMetrics()
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=pool_metrics.instrumented_pool_class(QueuePool, metrics),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01,
+    )
+    pool_metrics.listen(engine, metrics)
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        stats = metrics.snapshot(engine.pool)
+        assert stats["checked_out"] == 1
+
+    stats = metrics.snapshot(engine.pool)
+    assert stats["checkouts"] == 1
+    assert stats["checkout_timeouts"] == 1
+    assert stats["connects"] == 1
+    assert stats["checkout_wait_ms"]["count"] == 2
+    engine.dispose()
+    assert metrics.snapshot(engine.pool)["closes"] == 1
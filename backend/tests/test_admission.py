@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from .. import admission
+from ..config import settings
+
+
+def test_gate_queues_in_order_and_sheds():
+    async def scenario():
+        gate = admission.Gate("test", concurrency=1, queue_size=2)
+        assert await gate.enter(timeout=1) is None
+        first = asyncio.create_task(gate.enter(timeout=1))
+        second = asyncio.create_task(gate.enter(timeout=1))
+        await asyncio.sleep(0)
+        assert gate.waiting == 2
+        assert await gate.enter(timeout=1) == "queue_full"
+
+        gate.leave()
+        assert await first is None
+        assert not second.done()
+        # the slot stays taken, a later request times out behind second
+        assert await gate.enter(timeout=0.01) == "queue_timeout"
+        assert gate.waiting == 1
+        gate.leave()
+        assert await second is None
+        gate.leave()
+        assert (gate.active, gate.waiting) == (0, 0)
+
+        gate = admission.Gate("test", concurrency=1, queue_size=1)
+        await gate.enter(timeout=1)
+        assert await gate.enter(timeout=0.01) == "queue_timeout"
+        assert gate.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_token_buckets():
+    buckets = admission.TokenBuckets(rate=2, burst=2)
+    assert buckets.take("a", now=0) == 0
+    assert buckets.take("a", now=0) == 0
+    assert buckets.take("a", now=0) == 0.5
+    assert buckets.take("b", now=0) == 0
+    assert buckets.take("a", now=0.25) == 0.25
+    assert buckets.take("a", now=1) == 0
+
+
+def test_auth_routes_are_rate_limited(monkeypatch, client, create_test_users):
+    monkeypatch.setattr(settings, "admission_rate_limits", {"auth": (0.01, 2)})
+    # built with the default limits while creating the users
+    admission.admission_control.clear()
+    user = create_test_users[0]
+    credentials = {"username": user["email"], "password": user["password"]}
+    assert client.post("/login", data=credentials).status_code == 200
+    assert client.post("/login", data=credentials).status_code == 200
+
+    response = client.post("/login", data=credentials)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) == 100
+    response = client.post("/users/", json={"email": "x@email.com", "password": "x"})
+    assert response.status_code == 429
+    # other route classes are not limited
+    assert client.get("/").status_code == 200
+
+
+def test_saturated_class_sheds_without_slowing_others(monkeypatch):
+    monkeypatch.setattr(settings, "admission_limits", {"slow": (1, 1)})
+    release = asyncio.Event()
+
+    app = FastAPI()
+    app.add_middleware(admission.AdmissionMiddleware)
+
+    @app.get("/slow")
+    @admission.route_class("slow")
+    async def slow():
+        await release.wait()
+        return {}
+
+    @app.get("/fast")
+    async def fast():
+        return {}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            served = [asyncio.create_task(c.get("/slow")) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            shed = await c.get("/slow")
+            assert shed.status_code == 503
+            assert shed.headers["Retry-After"] == "1"
+            assert (await c.get("/fast")).status_code == 200
+
+            release.set()
+            assert [r.status_code for r in await asyncio.gather(*served)] == [200, 200]
+        gate = admission.admission_control.gates["slow"]
+        assert (gate.active, gate.waiting) == (0, 0)
+
+    asyncio.run(scenario())
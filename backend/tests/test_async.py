@@ -0,0 +1,88 @@
+import pytest
+
+USERS = [
+    {"email": "test1@email.com", "name": "Tester", "password": "testpassword"},
+    {"email": "test2@email.com", "name": "Tester2", "password": "testpass"},
+]
+SPOTS = [
+    {"latitude": 36.0139, "longitude": -5.6044, "name": "Tarifa", "country": "Spain"},
+    {"latitude": 54.6081, "longitude": 18.8018, "name": "Hel", "country": "Poland"},
+]
+
+
+@pytest.fixture
+def seeded_async_client(async_client):
+    for user in USERS:
+        assert async_client.post("/users/", json=user).status_code == 201
+    for spot in SPOTS:
+        assert async_client.post("/spots/", json=spot).status_code == 200
+    response = async_client.post(
+        "/login", data={"username": USERS[0]["email"], "password": USERS[0]["password"]}
+    )
+    token = response.json()["access_token"]
+    async_client.headers = {
+        **async_client.headers,
+        "Authorization": f"Bearer {token}",
+    }
+    return async_client
+
+
+def test_async_get_spots(seeded_async_client):
+    first_page = seeded_async_client.get("/spots/", params={"limit": 1})
+    assert first_page.status_code == 200
+    assert [spot["name"] for spot in first_page.json()] == ["Tarifa"]
+
+    last_page = seeded_async_client.get(
+        "/spots/", params={"after": first_page.headers["X-Next-Cursor"]}
+    )
+    assert [spot["name"] for spot in last_page.json()] == ["Hel"]
+
+
+def test_async_stream_spots(seeded_async_client):
+    response = seeded_async_client.get("/spots/", params={"stream": True})
+    assert [spot["name"] for spot in response.json()] == ["Tarifa", "Hel"]
+
+
+def test_async_get_one_spot(seeded_async_client):
+    spot_id = seeded_async_client.get("/spots/").json()[1]["id"]
+    assert seeded_async_client.get(f"/spots/{spot_id}").json()["name"] == "Hel"
+    assert seeded_async_client.get("/spots/9999").status_code == 404
+
+
+def test_async_routes_leave_static_paths_to_sync_router(seeded_async_client):
+    response = seeded_async_client.get("/spots/nearby", params={"lat": 54, "lon": 18})
+    assert response.status_code == 200
+    assert response.json()[0]["name"] == "Hel"
+
+
+def test_async_get_users(seeded_async_client):
+    response = seeded_async_client.get("/users/")
+    assert [user["email"] for user in response.json()] == [
+        user["email"] for user in USERS
+    ]
+
+
+def test_async_user_spots(seeded_async_client):
+    spot_id = seeded_async_client.get("/spots/").json()[0]["id"]
+    seeded_async_client.post(f"/users/add_spot/{spot_id}")
+    response = seeded_async_client.get("/users/spots")
+    assert response.status_code == 200
+    assert [spot["id"] for spot in response.json()["spots"]] == [spot_id]
+
+
+def test_async_requires_token(async_client):
+    assert async_client.get("/spots/").status_code == 401
+
+
+def test_async_conditional_get(seeded_async_client):
+    etag = seeded_async_client.get("/spots/").headers["etag"]
+    response = seeded_async_client.get("/spots/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    spot_etag = seeded_async_client.get("/spots/1").headers["etag"]
+    seeded_async_client.patch("/spots/1", json={"country": "Portugal"})
+    response = seeded_async_client.get("/spots/1", headers={"If-None-Match": spot_etag})
+    assert response.status_code == 200
+    assert response.json()["country"] == "PT"
+    response = seeded_async_client.get("/spots/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from .. import models, utils
+
+
+def login(client, user):
+    return client.post(
+        "/login", data={"username": user["email"], "password": user["password"]}
+    )
+
+
+def test_login(client, create_test_users):
+    response = login(client, create_test_users[0])
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+
+@pytest.mark.parametrize(
+    "email, password",
+    [("test1@email.com", "wrongpassword"), ("nobody@email.com", "testpassword")],
+)
+def test_login_invalid_credentials(client, create_test_users, email, password):
+    response = login(client, {"email": email, "password": password})
+    assert response.status_code == 401
+
+
+def test_login_rehashes_outdated_cost(client, session, create_test_users, monkeypatch):
+    user = create_test_users[0]
+    stored_hash = session.get(models.User, user["id"]).password
+    monkeypatch.setattr(
+        utils,
+        "crypt_context",
+        lambda: CryptContext(
+            schemes=["bcrypt"],
+            bcrypt__rounds=4,
+            bcrypt__min_rounds=4,
+            bcrypt__max_rounds=4,
+        ),
+    )
+
+    assert login(client, user).status_code == 200
+    session.expire_all()
+    new_hash = session.get(models.User, user["id"]).password
+    assert new_hash != stored_hash
+    assert new_hash.startswith("$2b$04$")
+    assert login(client, user).status_code == 200
+
+
+def test_hashing_pool_runs_in_worker_process():
+    pool = utils.HashingPool(workers=1, queue_size=0)
+    try:
+        hashed = pool.run(utils._hash, "secret")
+        assert pool.run(utils._verify_and_update, "secret", hashed)[0]
+    finally:
+        pool.shutdown()
+
+
+def test_hashing_pool_rejects_when_saturated():
+    pool = utils.HashingPool(workers=1, queue_size=0)
+    busy = threading.Thread(target=pool.run, args=(time.sleep, 1))
+    busy.start()
+    time.sleep(0.1)
+    try:
+        with pytest.raises(HTTPException) as e:
+            pool.run(utils._hash, "secret")
+        assert e.value.status_code == 503
+    finally:
+        busy.join()
+        pool.shutdown()
+
+
+def test_current_user_is_cached(authorized_client, create_test_users):
+    assert authorized_client.get("/spots/").status_code == 200
+    assert authorized_client.get("/spots/").status_code == 200
+    stats = authorized_client.get("/admin/auth-cache").json()
+    assert stats["principals"]["hits"] >= 2
+    assert stats["tokens"]["size"] == 1
+
+
+def test_cached_user_can_be_modified(authorized_client, create_test_spots):
+    assert authorized_client.get("/spots/").status_code == 200
+    spot_id = create_test_spots[0]["id"]
+    response = authorized_client.post(f"/users/add_spot/{spot_id}")
+    assert response.status_code == 201
+    spots = authorized_client.get("/users/spots").json()["spots"]
+    assert [spot["id"] for spot in spots] == [spot_id]
+
+
+def test_deleted_user_loses_access(authorized_client, create_test_users):
+    assert authorized_client.get("/spots/").status_code == 200
+    authorized_client.delete(f"/users/{create_test_users[0]['id']}")
+    assert authorized_client.get("/spots/").status_code == 401
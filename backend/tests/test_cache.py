@@ -0,0 +1,48 @@
+import threading
+import time
+
+from ..response_cache import CachedResponse, ResponseCache, SqliteBackend
+
+
+def test_single_flight_computes_once():
+    cache = ResponseCache(SqliteBackend(":memory:"))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return CachedResponse(b"[]", {"ETag": '"catalog-1"'})
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_compute("spots:1", compute))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [CachedResponse(b"[]", {"ETag": '"catalog-1"'})] * 8
+    assert cache.stats()["misses"] == 1
+
+
+def test_sqlite_backend_is_shared_and_bounded(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    first, second = SqliteBackend(path, maxsize=2), SqliteBackend(path, maxsize=2)
+
+    first.set("a", CachedResponse(b"1", {}))
+    assert second.get("a") == CachedResponse(b"1", {})
+    second.set("b", CachedResponse(b"2", {"X-Next-Cursor": "c"}))
+    first.get("a")
+    first.set("c", CachedResponse(b"3", {}))
+
+    assert len(second) == 2
+    assert second.get("b") is None
+    assert second.get("a") is not None
+
+    first.clear()
+    assert second.get("c") is None
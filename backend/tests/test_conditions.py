@@ -0,0 +1,168 @@
+import asyncio
+import random
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from .. import conditions, models
+from ..config import settings
+
+
+class FakeCollector:
+    """Stands in for a weather station collector pushing readings."""
+
+    def __init__(self, client, spot_ids: list[int], seed: int = 0) -> None:
+        self.client = client
+        self.spot_ids = spot_ids
+        self.rng = random.Random(seed)
+
+    def readings(self, start: datetime, count: int, step: timedelta) -> list[dict]:
+        return [
+            {
+                "spot_id": spot_id,
+                "observed_at": (start + i * step).isoformat(),
+                "wind_speed": round(self.rng.uniform(5, 30), 1),
+                "gust": round(self.rng.uniform(30, 40), 1),
+                "direction": self.rng.randrange(360),
+            }
+            for spot_id in self.spot_ids
+            for i in range(count)
+        ]
+
+    def push(self, readings: list[dict]) -> dict:
+        response = self.client.post("/conditions/", json={"readings": readings})
+        assert response.status_code == 201
+        return response.json()
+
+
+@pytest.fixture
+def collector(monkeypatch, authorized_client, create_test_spots):
+    monkeypatch.setattr(settings, "conditions_commit_delay_ms", 0)
+    return FakeCollector(authorized_client, [spot["id"] for spot in create_test_spots])
+
+
+def test_ingest_and_roll_up(collector, authorized_client, create_test_spots):
+    hour = conditions.bucket_start(datetime.now(UTC), "hour")
+    readings = collector.readings(hour - timedelta(hours=2), 6, timedelta(minutes=30))
+    assert collector.push(readings) == {
+        "accepted": len(readings),
+        "duplicates": 0,
+        "unknown_spots": [],
+    }
+    # sent again by a retrying collector
+    assert collector.push([*readings[:3], {**readings[0], "spot_id": 9999}]) == {
+        "accepted": 0,
+        "duplicates": 3,
+        "unknown_spots": [9999],
+    }
+
+    tarifa = create_test_spots[0]["id"]
+    response = authorized_client.get(f"/conditions/{tarifa}", params={"hours": 3})
+    buckets = response.json()
+    assert [bucket["readings"] for bucket in buckets] == [2, 2, 2]
+    first = [r for r in readings if r["spot_id"] == tarifa][:2]
+    assert buckets[0]["wind_speed_avg"] == pytest.approx(
+        (first[0]["wind_speed"] + first[1]["wind_speed"]) / 2
+    )
+    assert buckets[0]["wind_speed_max"] == max(r["wind_speed"] for r in first)
+    assert buckets[0]["gust_max"] == max(r["gust"] for r in first)
+
+    daily = authorized_client.get(
+        f"/conditions/{tarifa}", params={"hours": 48, "resolution": "day"}
+    ).json()
+    assert sum(bucket["readings"] for bucket in daily) == 6
+    assert authorized_client.get("/conditions/9999").status_code == 404
+
+
+def test_windiest_spots(collector, authorized_client, create_test_spots):
+    now = datetime.now(UTC)
+    readings = [
+        {"spot_id": spot["id"], "observed_at": now.isoformat(), "direction": 270}
+        | {"wind_speed": speed, "gust": None}
+        for spot, speed in zip(create_test_spots, [12, 25, 18, 3], strict=True)
+    ]
+    # old wind does not count
+    readings.append(
+        {
+            **readings[3],
+            "observed_at": (now - timedelta(hours=5)).isoformat(),
+            "wind_speed": 40,
+        }
+    )
+    collector.push(readings)
+
+    spots = authorized_client.get("/conditions/windiest", params={"limit": 3}).json()
+    assert [(spot["name"], spot["wind_speed_avg"]) for spot in spots] == [
+        ("Hel", 25),
+        ("Jastarnia", 18),
+        ("Tarifa", 12),
+    ]
+    assert spots[0]["direction"] == 270
+    assert spots[0]["gust_max"] is None
+
+
+def test_retention(collector, session):
+    now = datetime.now(UTC)
+    old = now - timedelta(days=settings.conditions_raw_retention_days + 1)
+    collector.push(collector.readings(old, 2, timedelta(hours=1)))
+    collector.push(collector.readings(now, 1, timedelta(hours=1)))
+
+    conditions.prune(session, now)
+    session.commit()
+    assert session.scalar(
+        select(func.min(models.SpotCondition.observed_at))
+    ) > old.replace(tzinfo=None)
+    resolutions = session.scalars(
+        select(models.SpotConditionRollup.resolution).distinct()
+    )
+    # hourly rollups outlive the raw readings
+    assert set(resolutions) == {"hour", "day"}
+
+
+def test_group_commit_merges_concurrent_batches(monkeypatch):
+    monkeypatch.setattr(settings, "conditions_commit_delay_ms", 50)
+    writes = []
+
+    def write(db, rows):
+        writes.append(list(rows))
+        return conditions.Written({(row, None) for row in rows}, set())
+
+    group_commit = conditions.GroupCommit(write)
+
+    async def submit_all():
+        return await asyncio.gather(
+            *(group_commit.submit(None, [i, i + 10]) for i in range(3))
+        )
+
+    results = asyncio.run(submit_all())
+    assert writes == [[0, 10, 1, 11, 2, 12]]
+    assert all(result is results[0] for result in results)
+
+    monkeypatch.setattr(settings, "conditions_commit_max_rows", 4)
+    writes.clear()
+    asyncio.run(submit_all())
+    # the second batch fills the first group, the third starts another
+    assert writes == [[0, 10, 1, 11], [2, 12]]
+
+
+def test_group_commit_failure_reaches_every_request(monkeypatch):
+    monkeypatch.setattr(settings, "conditions_commit_delay_ms", 50)
+    calls = []
+
+    def write(db, rows):
+        calls.append(rows)
+        raise RuntimeError("database is gone")
+
+    group_commit = conditions.GroupCommit(write)
+
+    async def submit_all():
+        return await asyncio.gather(
+            *(group_commit.submit(None, [i]) for i in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(submit_all())
+    assert len(calls) == 1
+    assert [str(result) for result in results] == ["database is gone"] * 3
+    assert all(isinstance(result, RuntimeError) for result in results)
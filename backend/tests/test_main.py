@@ -1,3 +1,129 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from .. import database, models, query_budget, search, spatial, startup
+from ..config import settings
+from ..database import Base
+from ..main import app
+from ..routers import users
+
+
 def test_root(client):
     response = client.get("/")
     assert response.status_code == 200
+
+
+def test_fast_path_routes_keep_response_schema(client):
+    paths = client.get("/openapi.json").json()["paths"]
+
+    def schema(path: str) -> dict:
+        response = paths[path]["get"]["responses"]["200"]
+        return response["content"]["application/json"]["schema"]
+
+    assert schema("/spots/")["items"] == {"$ref": "#/components/schemas/SpotOut"}
+    assert schema("/users/")["items"] == {"$ref": "#/components/schemas/UserOut"}
+    assert schema("/users/spots") == {"$ref": "#/components/schemas/UserWithSpots"}
+
+
+def test_import_defers_heavy_modules():
+    report = startup.import_report()
+    assert report["eager_deferred_modules"] == []
+    assert report["total_ms"] > 0
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   jose.exceptions\n"
+        "import time:      2000 |       2120 | jose\n"
+    )
+    assert startup.parse_importtime(output) == [
+        startup.ImportTime("jose.exceptions", 120, 120),
+        startup.ImportTime("jose", 2000, 2120),
+    ]
+
+
+def test_lifespan_warm_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(database.settings, "pg_dsn", f"sqlite:///{tmp_path}/app.db")
+    monkeypatch.setattr(database.settings, "startup_warmup", True)
+    database.get_engine.cache_clear()
+    try:
+        Base.metadata.create_all(database.get_engine())
+        with TestClient(app):
+            assert set(app.state.warmup_ms) == {
+                "pool",
+                "spot_index",
+                "name_index",
+                "auth",
+                "countries",
+            }
+            assert spatial.spot_index.loaded
+            assert search.name_index.loaded
+            assert database.engine.pool.checkedin() == database.settings.db_pool_size
+    finally:
+        database.get_engine.cache_clear()
+
+
+def test_metrics_per_route(authorized_client, create_test_spots):
+    labels = {"method": "GET", "route": "/spots/{id}"}
+
+    def sample(name: str, **extra) -> float:
+        return REGISTRY.get_sample_value(name, {**labels, **extra}) or 0
+
+    requests = sample("http_request_duration_seconds_count", status="200")
+    queries = sample("http_request_db_queries_sum")
+    spot_id = create_test_spots[0]["id"]
+    assert authorized_client.get(f"/spots/{spot_id}").status_code == 200
+
+    assert sample("http_request_duration_seconds_count", status="200") == requests + 1
+    assert sample("http_request_db_queries_sum") > queries
+    assert sample("http_response_size_bytes_sum", status="200") > 0
+
+
+def test_metrics_endpoint(client):
+    client.get("/no-such-route")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="<unmatched>",status="404"' in response.text
+    assert "http_requests_in_flight" in response.text
+
+
+def test_route_over_query_budget_fails(monkeypatch, authorized_client):
+    monkeypatch.setattr(
+        users.get_user_spots, "__query_budget__", query_budget.Budget(queries=1)
+    )
+    with pytest.raises(query_budget.QueryBudgetExceeded, match="GET /users/spots"):
+        authorized_client.get("/users/spots")
+
+    # the client gets an error, not the response of the route
+    client = TestClient(
+        app, raise_server_exceptions=False, headers=authorized_client.headers
+    )
+    response = client.get("/users/spots")
+    assert response.status_code == 500
+    assert "spots" not in response.text
+
+
+def test_query_budget_warns(monkeypatch, caplog, authorized_client):
+    monkeypatch.setattr(settings, "query_budget", "warn")
+    monkeypatch.setattr(
+        users.get_user_spots, "__query_budget__", query_budget.Budget(queries=1)
+    )
+    assert authorized_client.get("/users/spots").status_code == 200
+    assert "budget is 1" in caplog.text
+
+
+def test_query_budget_detects_repeated_statements(session):
+    with (
+        pytest.raises(query_budget.QueryBudgetExceeded, match="ran 4 times"),
+        query_budget.budget(),
+    ):
+        for id in range(4):
+            session.get(models.Spot, id)
+
+    with query_budget.budget(queries=4, repeats=4) as log:
+        for id in range(4):
+            session.get(models.Spot, id)
+    assert log.count == 4
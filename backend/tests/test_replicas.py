@@ -0,0 +1,154 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from .. import pool_metrics, replicas
+from ..config import settings
+from ..database import Base, get_db
+from ..main import app
+
+
+@pytest.fixture
+def primary_and_replica(client, tmp_path, monkeypatch):
+    """
+    Two SQLite files; `replicate` copies the primary over the replica.
+
+    Requests `client` so its database override is replaced by the primary.
+    """
+    primary_file, replica_file = tmp_path / "primary.db", tmp_path / "replica.db"
+    primary_engine = create_engine(
+        f"sqlite:///{primary_file}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=primary_engine)
+    PrimarySession = sessionmaker(autoflush=False, bind=primary_engine)
+
+    def override_get_db():
+        with PrimarySession() as db:
+            yield db
+
+    def replicate():
+        with sqlite3.connect(primary_file) as source, sqlite3.connect(
+            replica_file
+        ) as target:
+            source.backup(target)
+
+    replicate()
+    replica = replicas.Replica(
+        create_engine(f"sqlite:///{replica_file}", poolclass=NullPool),
+        pool_metrics.PoolMetrics(),
+    )
+    replica_set = replicas.ReplicaSet([replica], retry_seconds=30)
+    monkeypatch.setattr(settings, "db_replica_dsns", [f"sqlite:///{replica_file}"])
+    monkeypatch.setattr(replicas, "get_replica_set", lambda: replica_set)
+    app.dependency_overrides[get_db] = override_get_db
+    yield replicate, replica_set
+    primary_engine.dispose()
+
+
+def test_reads_go_to_replica(primary_and_replica, client, create_test_spots, token):
+    replicate, _ = primary_and_replica
+    replicate()
+    client.headers = {**client.headers, "Authorization": f"Bearer {token}"}
+    # written to the primary only, as if replication lagged behind
+    client.post(
+        "/spots/",
+        json={"latitude": 1, "longitude": 1, "name": "Lagging", "country": "Spain"},
+    )
+
+    response = client.get("/spots/")
+    assert "Lagging" in [spot["name"] for spot in response.json()]
+    assert replicas.STICKY_COOKIE in client.cookies
+
+    client.cookies.clear()
+    names = [spot["name"] for spot in client.get("/spots/").json()]
+    assert names == [spot["name"] for spot in create_test_spots]
+
+    replicate()
+    response = client.get("/spots/")
+    assert "Lagging" in [spot["name"] for spot in response.json()]
+
+
+def test_failing_replica_falls_back_to_primary(
+    primary_and_replica, client, create_test_spots, token
+):
+    replicate, replica_set = primary_and_replica
+    replicate()
+    client.cookies.clear()
+    client.headers = {**client.headers, "Authorization": f"Bearer {token}"}
+    # connects fine, but fails the first statement of the request
+    replica = replica_set.replicas[0]
+    with sqlite3.connect(replica.engine.url.database) as connection:
+        connection.execute("DROP TABLE catalog_version")
+
+    response = client.get("/spots/")
+    assert response.status_code == 200
+    assert [spot["name"] for spot in response.json()] == [
+        spot["name"] for spot in create_test_spots
+    ]
+    assert replica.down_until > 0
+
+
+def test_stickiness_expires(primary_and_replica, client, create_test_users):
+    replicate, _ = primary_and_replica
+    replicate()
+    client.post("/users/", json={"email": "new@email.com", "password": "secret"})
+    client.cookies.set(replicas.STICKY_COOKIE, "0")
+    response = client.get("/users/")
+    assert [user["email"] for user in response.json()] == [
+        user["email"] for user in create_test_users
+    ]
+
+
+def test_failed_writes_are_not_sticky(primary_and_replica, client, create_test_users):
+    client.cookies.clear()
+    # already exists
+    user = create_test_users[0]
+    response = client.post(
+        "/users/",
+        json={"email": user["email"], "name": "Again", "password": "secret"},
+    )
+    assert response.status_code == 409
+    assert replicas.STICKY_COOKIE not in client.cookies
+
+    response = client.post("/users/", json={"email": "not an email"})
+    assert response.status_code == 422
+    assert replicas.STICKY_COOKIE not in client.cookies
+
+
+def test_replica_failover(tmp_path):
+    def sqlite_replica(path):
+        return replicas.Replica(
+            create_engine(f"sqlite:///{path}", poolclass=NullPool),
+            pool_metrics.PoolMetrics(),
+        )
+
+    broken = sqlite_replica(tmp_path / "missing" / "replica.db")
+    healthy = [sqlite_replica(tmp_path / f"replica-{i}.db") for i in range(2)]
+    replica_set = replicas.ReplicaSet([broken, *healthy], retry_seconds=30)
+
+    def read_bind():
+        sessions = replicas.get_read_db("primary")
+        db = next(sessions)
+        sessions.close()
+        return db if db == "primary" else db.get_bind().engine
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(replicas, "get_replica_set", lambda: replica_set)
+        binds = [read_bind() for _ in range(6)]
+        # the broken replica is skipped and its turns go to the next one
+        assert binds == [
+            healthy[0].engine,
+            healthy[0].engine,
+            healthy[1].engine,
+            healthy[0].engine,
+            healthy[0].engine,
+            healthy[1].engine,
+        ]
+        assert broken.down_until > 0
+
+        for replica in healthy:
+            replica_set.mark_down(replica)
+        assert read_bind() == "primary"
@@ -0,0 +1,643 @@
+import json
+import random
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql
+
+from .. import (
+    catalog,
+    clustering,
+    countries,
+    distances,
+    favourites,
+    models,
+    response_cache,
+    search,
+    spatial,
+)
+from ..search import NameIndex
+from ..spatial import SpotIndex, haversine_km
+
+
+def test_get_spots(authorized_client, create_test_spots):
+    response = authorized_client.get("/spots/")
+    assert response.status_code == 200
+    assert [spot["name"] for spot in response.json()] == [
+        spot["name"] for spot in create_test_spots
+    ]
+
+
+def test_get_spots_unauthorized(client, create_test_spots):
+    response = client.get("/spots/")
+    assert response.status_code == 401
+
+
+def test_nearby_spots(authorized_client, create_test_spots):
+    # Władysławowo, at the base of the Hel peninsula
+    response = authorized_client.get(
+        "/spots/nearby", params={"lat": 54.79, "lon": 18.40, "k": 2}
+    )
+    assert response.status_code == 200
+    nearby = response.json()
+    assert [spot["name"] for spot in nearby] == ["Jastarnia", "Hel"]
+    assert nearby[0]["distance_km"] < nearby[1]["distance_km"]
+
+
+def test_nearby_spots_radius(authorized_client, create_test_spots):
+    response = authorized_client.get(
+        "/spots/nearby", params={"lat": 36.0, "lon": -5.6, "radius_km": 50}
+    )
+    assert [spot["name"] for spot in response.json()] == ["Tarifa"]
+
+
+def test_nearby_spots_follow_writes(authorized_client, create_test_spots):
+    tarifa, hel = create_test_spots[0], create_test_spots[1]
+    params = {"lat": 36.0, "lon": -5.6, "k": 1}
+    assert authorized_client.get("/spots/nearby", params=params).json()[0]["id"] == (
+        tarifa["id"]
+    )
+
+    authorized_client.patch(
+        f"/spots/{hel['id']}", json={"latitude": 36.01, "longitude": -5.6}
+    )
+    assert authorized_client.get("/spots/nearby", params=params).json()[0]["id"] == (
+        hel["id"]
+    )
+
+    authorized_client.delete(f"/spots/{hel['id']}")
+    assert authorized_client.get("/spots/nearby", params=params).json()[0]["id"] == (
+        tarifa["id"]
+    )
+
+
+def test_nearby_spots_follow_other_workers(
+    authorized_client, create_test_spots, session
+):
+    params = {"lat": 36.0, "lon": -5.6, "k": 1}
+    assert authorized_client.get("/spots/nearby", params=params).json()[0]["name"] == (
+        "Tarifa"
+    )
+
+    # written by another worker: only the geometry version tells
+    session.add(
+        models.Spot(latitude=36.0, longitude=-5.6, name="Valdevaqueros", country="ES")
+    )
+    catalog.bump_geometry(session)
+    session.commit()
+    assert authorized_client.get("/spots/nearby", params=params).json()[0]["name"] == (
+        "Valdevaqueros"
+    )
+
+
+def test_nearby_spots_rebuild_only_for_other_workers(
+    authorized_client, create_test_spots, session, monkeypatch
+):
+    loads = []
+    load_rows = spatial.load_rows
+    monkeypatch.setattr(
+        spatial, "load_rows", lambda db: loads.append(1) or load_rows(db)
+    )
+    params = {"lat": 36.0, "lon": -5.6, "k": 1}
+    authorized_client.get("/spots/nearby", params=params)
+    hel = create_test_spots[1]
+    authorized_client.patch(f"/spots/{hel['id']}", json={"latitude": 36.0})
+    authorized_client.delete(f"/spots/{create_test_spots[3]['id']}")
+    authorized_client.get("/spots/nearby", params=params)
+    assert len(loads) == 1
+
+    # another worker wrote in between, so the own write does not catch up
+    catalog.bump_geometry(session)
+    session.commit()
+    authorized_client.patch(f"/spots/{hel['id']}", json={"latitude": 36.1})
+    authorized_client.get("/spots/nearby", params=params)
+    assert len(loads) == 2
+
+
+def test_spot_index_matches_brute_force():
+    rng = random.Random(42)
+    points = {
+        spot_id: (rng.uniform(-90, 90), rng.uniform(-180, 180))
+        for spot_id in range(2000)
+    }
+    index = SpotIndex()
+    index.rebuild((spot_id, lat, lon) for spot_id, (lat, lon) in points.items())
+    for spot_id in range(0, 2000, 3):
+        index.remove(spot_id)
+        del points[spot_id]
+    for spot_id in range(2000, 2500):
+        points[spot_id] = (rng.uniform(-90, 90), rng.uniform(-180, 180))
+        index.add(spot_id, *points[spot_id])
+
+    for _ in range(50):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        expected = sorted(
+            points, key=lambda spot_id: haversine_km(lat, lon, *points[spot_id])
+        )[:5]
+        assert [spot_id for spot_id, _ in index.nearest(lat, lon, 5)] == expected
+
+
+def test_nearest_spots(authorized_client, create_test_spots):
+    points = [
+        {"latitude": 54.79, "longitude": 18.40},
+        {"latitude": 36.0, "longitude": -5.6},
+    ]
+    response = authorized_client.post("/spots/nearest", json={"points": points, "k": 2})
+    assert response.status_code == 200
+    first, second = response.json()
+    names = {spot["id"]: spot["name"] for spot in create_test_spots}
+    assert [names[spot_id] for spot_id in first["spot_ids"]] == ["Jastarnia", "Hel"]
+    assert [names[spot_id] for spot_id in second["spot_ids"]] == ["Tarifa", "Jastarnia"]
+    assert second["distances_km"][0] == pytest.approx(
+        haversine_km(36.0, -5.6, 36.0139, -5.6044)
+    )
+
+    # the catalog arrays are reloaded once a spot moves
+    hel = create_test_spots[1]
+    authorized_client.patch(
+        f"/spots/{hel['id']}", json={"latitude": 36.0, "longitude": -5.6}
+    )
+    response = authorized_client.post("/spots/nearest", json={"points": points[1:]})
+    assert names[response.json()[0]["spot_ids"][0]] == "Hel"
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(7)
+    rows = [
+        (spot_id, rng.uniform(-90, 90), rng.uniform(-180, 180))
+        for spot_id in range(3000)
+    ]
+    spots = distances.SpotArrays(rows)
+    queries = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(40)]
+    latitudes, longitudes = (np.array(column) for column in zip(*queries))
+    # small blocks, so queries are split across several
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(distances, "BLOCK_ELEMENTS", 10_000)
+        nearest = distances.nearest(spots, latitudes, longitudes, 5)
+
+    for (lat, lon), indices, distances_km in zip(
+        queries, nearest.indices, nearest.distances_km, strict=True
+    ):
+        expected = sorted(rows, key=lambda row: haversine_km(lat, lon, *row[1:]))[:5]
+        assert spots.ids[indices].tolist() == [row[0] for row in expected]
+        assert distances_km == pytest.approx(
+            [haversine_km(lat, lon, *row[1:]) for row in expected]
+        )
+
+
+def test_viewport_clusters(authorized_client, create_test_spots):
+    params = {"min_lat": 20, "min_lon": -20, "max_lat": 60, "max_lon": 40, "zoom": 3}
+    response = authorized_client.get("/spots/viewport", params=params)
+    assert response.status_code == 200
+    viewport = response.json()
+    assert viewport["spots"] == []
+    assert sorted(cluster["count"] for cluster in viewport["clusters"]) == [1, 1, 2]
+
+    # moving a spot away invalidates the cached tiles it touched
+    hel = create_test_spots[1]
+    authorized_client.patch(f"/spots/{hel['id']}", json={"latitude": -33.9})
+    viewport = authorized_client.get("/spots/viewport", params=params).json()
+    assert sorted(cluster["count"] for cluster in viewport["clusters"]) == [1, 1, 1]
+
+
+def test_viewport_clusters_follow_catalog_version(
+    authorized_client, create_test_spots, session
+):
+    params = {"min_lat": 20, "min_lon": -20, "max_lat": 60, "max_lon": 40, "zoom": 3}
+    viewport = authorized_client.get("/spots/viewport", params=params).json()
+    assert sorted(cluster["count"] for cluster in viewport["clusters"]) == [1, 1, 2]
+
+    # moved by another worker, so no tile was invalidated here
+    session.execute(
+        update(models.Spot)
+        .where(models.Spot.id == create_test_spots[1]["id"])
+        .values(latitude=-33.9)
+    )
+    catalog.bump_geometry(session)
+    session.commit()
+    viewport = authorized_client.get("/spots/viewport", params=params).json()
+    assert sorted(cluster["count"] for cluster in viewport["clusters"]) == [1, 1, 1]
+
+
+def test_viewport_clusters_keep_tiles_of_other_spots(
+    authorized_client, create_test_spots, monkeypatch
+):
+    loaded = []
+    load_tiles = clustering._load_tiles
+    monkeypatch.setattr(
+        clustering,
+        "_load_tiles",
+        lambda db, zoom, tiles: loaded.extend(tiles) or load_tiles(db, zoom, tiles),
+    )
+    params = {"min_lat": 20, "min_lon": -20, "max_lat": 60, "max_lon": 40, "zoom": 3}
+    authorized_client.get("/spots/viewport", params=params)
+    # the spot index knows the previous position of a moved spot
+    authorized_client.get("/spots/nearby", params={"lat": 0, "lon": 0})
+    hel = create_test_spots[1]
+    authorized_client.patch(f"/spots/{hel['id']}", json={"latitude": 54.7})
+
+    loaded.clear()
+    viewport = authorized_client.get("/spots/viewport", params=params).json()
+    assert sorted(cluster["count"] for cluster in viewport["clusters"]) == [1, 1, 2]
+    assert loaded == [(3, *clustering.tile_xy(54.7, hel["longitude"], 3))]
+
+
+def test_viewport_spots(authorized_client, create_test_spots):
+    params = {"min_lat": 54, "min_lon": 18, "max_lat": 55, "max_lon": 19, "zoom": 12}
+    response = authorized_client.get("/spots/viewport", params=params)
+    assert response.status_code == 200
+    viewport = response.json()
+    assert viewport["clusters"] == []
+    assert [spot["name"] for spot in viewport["spots"]] == ["Hel", "Jastarnia"]
+
+
+def test_viewport_across_antimeridian(authorized_client, create_test_spots):
+    params = {"min_lat": -10, "min_lon": 170, "max_lat": 10, "max_lon": -170}
+    response = authorized_client.get("/spots/viewport", params={**params, "zoom": 4})
+    assert response.status_code == 200
+    assert response.json()["clusters"] == []
+
+
+def test_get_spots_pages(authorized_client, create_test_spots):
+    names = []
+    params = {"limit": 3}
+    while True:
+        response = authorized_client.get("/spots/", params=params)
+        assert response.status_code == 200
+        names += [spot["name"] for spot in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["after"] = response.headers["X-Next-Cursor"]
+    assert names == [spot["name"] for spot in create_test_spots]
+
+
+def test_get_spots_invalid_cursor(authorized_client, create_test_spots):
+    response = authorized_client.get("/spots/", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_get_spots_stream(authorized_client, create_test_spots):
+    response = authorized_client.get("/spots/", params={"stream": True})
+    assert response.status_code == 200
+    assert response.json() == create_test_spots
+
+
+def test_import_ndjson(authorized_client, create_test_spots):
+    lines = [
+        (
+            '{"latitude": 41.12, "longitude": 1.25, "name": "Tarragona", '
+            '"country": "Spain"}'
+        ),
+        '{"latitude": 36.0, "longitude": -5.6, "name": "Tarifa", "country": "Spain"}',
+        '{"latitude": 100, "longitude": 1.0, "name": "Nowhere", "country": "Spain"}',
+        "not json",
+        "",
+        '{"latitude": 41.1, "longitude": 1.2, "name": "Tarragona", "country": "Spain"}',
+    ]
+    response = authorized_client.post(
+        "/spots/import",
+        content="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["received"] == 5
+    assert report["written"] == 1
+    assert report["skipped"] == 1
+    assert report["failed"] == 3
+    assert [error["line"] for error in report["errors"]] == [3, 4, 6]
+
+    nearby = authorized_client.get(
+        "/spots/nearby", params={"lat": 41, "lon": 1, "k": 1}
+    )
+    assert nearby.json()[0]["name"] == "Tarragona"
+
+
+def test_import_csv_update(authorized_client, create_test_spots):
+    body = (
+        "name,latitude,longitude,country\n"
+        "Tarifa,36.5,-5.5,Spain\n"
+        "Leba,54.76,17.55,Poland\n"
+    )
+    response = authorized_client.post(
+        "/spots/import",
+        params={"on_conflict": "update"},
+        content=body,
+        headers={"Content-Type": "text/csv"},
+    )
+    assert response.json() == {
+        "received": 2,
+        "written": 2,
+        "skipped": 0,
+        "failed": 0,
+        "errors": [],
+    }
+    tarifa = authorized_client.get(f"/spots/{create_test_spots[0]['id']}").json()
+    assert tarifa["latitude"] == 36.5
+
+
+def test_import_unsupported_content_type(authorized_client):
+    response = authorized_client.post(
+        "/spots/import", content="{}", headers={"Content-Type": "application/xml"}
+    )
+    assert response.status_code == 415
+
+
+def test_export_geojson(authorized_client, create_test_spots):
+    response = authorized_client.get("/spots/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/geo+json"
+    collection = response.json()
+    assert collection["type"] == "FeatureCollection"
+    assert collection["features"][0] == {
+        "type": "Feature",
+        "id": create_test_spots[0]["id"],
+        "geometry": {"type": "Point", "coordinates": [-5.6044, 36.0139]},
+        "properties": {"name": "Tarifa", "country": "ES"},
+    }
+
+
+def test_export_ndjson_gzip(authorized_client, create_test_spots):
+    response = authorized_client.get(
+        "/spots/export", params={"format": "ndjson", "gzip": True}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    spots = [json.loads(line) for line in response.text.splitlines()]
+    # catalog data only, popularity is not exported
+    for spot in create_test_spots:
+        del spot["favourite_count"]
+    assert spots == create_test_spots
+
+
+def test_export_empty_catalog(authorized_client):
+    response = authorized_client.get("/spots/export")
+    assert response.json() == {"type": "FeatureCollection", "features": []}
+
+
+def test_get_spots_not_modified(authorized_client, create_test_spots):
+    response = authorized_client.get("/spots/")
+    etag = response.headers["etag"]
+    response = authorized_client.get("/spots/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+def test_spots_etag_changes_on_write(authorized_client, create_test_spots):
+    etag = authorized_client.get("/spots/").headers["etag"]
+    spot_id = create_test_spots[0]["id"]
+    spot_etag = authorized_client.get(f"/spots/{spot_id}").headers["etag"]
+
+    authorized_client.patch(f"/spots/{spot_id}", json={"name": "Tarifa Beach"})
+    response = authorized_client.get("/spots/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    response = authorized_client.get(
+        f"/spots/{spot_id}", headers={"If-None-Match": spot_etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["name"] == "Tarifa Beach"
+    assert response.headers["etag"] != spot_etag
+
+    etag = response.headers["etag"]
+    authorized_client.delete(f"/spots/{create_test_spots[1]['id']}")
+    response = authorized_client.get(
+        f"/spots/{spot_id}", headers={"If-None-Match": f'"other", W/{etag}'}
+    )
+    assert response.status_code == 304
+
+
+def test_import_bumps_spot_version(authorized_client, create_test_spots):
+    spot_id = create_test_spots[0]["id"]
+    etag = authorized_client.get(f"/spots/{spot_id}").headers["etag"]
+    authorized_client.post(
+        "/spots/import",
+        params={"on_conflict": "update"},
+        content=json.dumps({**create_test_spots[0], "latitude": 36.0}),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    response = authorized_client.get(
+        f"/spots/{spot_id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["latitude"] == 36.0
+
+
+def test_spot_reads_are_cached_until_write(
+    authorized_client, create_test_spots, monkeypatch
+):
+    monkeypatch.setattr(
+        response_cache,
+        "spot_cache",
+        response_cache.ResponseCache(response_cache.MemoryBackend()),
+    )
+    spot_id = create_test_spots[0]["id"]
+    authorized_client.get("/spots/", params={"limit": 2})
+    authorized_client.get(f"/spots/{spot_id}")
+    stats = response_cache.spot_cache.stats()
+    assert (stats["size"], stats["misses"]) == (2, 2)
+
+    page = authorized_client.get("/spots/", params={"limit": 2})
+    assert [spot["name"] for spot in page.json()] == ["Tarifa", "Hel"]
+    assert "x-next-cursor" in page.headers
+    assert authorized_client.get(f"/spots/{spot_id}").json() == create_test_spots[0]
+    assert response_cache.spot_cache.stats()["hits"] == 2
+
+    authorized_client.patch(f"/spots/{spot_id}", json={"name": "Tarifa Beach"})
+    assert response_cache.spot_cache.stats()["size"] == 0
+    response = authorized_client.get(f"/spots/{spot_id}")
+    assert response.json()["name"] == "Tarifa Beach"
+
+
+@pytest.mark.parametrize(
+    ("country", "status_code", "code"),
+    [
+        ("Poland", 200, "PL"),
+        ("  republic of  POLAND ", 200, "PL"),
+        ("pol", 200, "PL"),
+        ("Cote d'Ivoire", 200, "CI"),
+        ("Atlantis", 422, None),
+    ],
+)
+def test_spot_country_stored_as_code(client, country, status_code, code):
+    response = client.post(
+        "/spots/",
+        json={"latitude": 1.0, "longitude": 1.0, "name": "Spot", "country": country},
+    )
+    assert response.status_code == status_code
+    if code:
+        assert response.json()["country"] == code
+
+
+def test_country_table_file(tmp_path, monkeypatch):
+    path = tmp_path / "countries.json"
+    countries.write_table(path)
+    monkeypatch.setattr(countries.settings, "countries_file", str(path))
+    countries.table.cache_clear()
+    try:
+        assert countries.to_alpha2("Egypt") == "EG"
+    finally:
+        countries.table.cache_clear()
+
+
+def test_schemas_import_without_pycountry():
+    code = "import sys, backend.schemas; assert 'pycountry' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_update_spot_changes_given_fields(authorized_client, create_test_spots):
+    tarifa = create_test_spots[0]
+    etag = authorized_client.get(f"/spots/{tarifa['id']}").headers["ETag"]
+
+    response = authorized_client.patch(
+        f"/spots/{tarifa['id']}", json={"name": "Tarifa Beach"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {**tarifa, "name": "Tarifa Beach"}
+    assert response.headers["ETag"] not in (None, etag)
+    assert (
+        authorized_client.patch("/spots/9999", json={"name": "Nowhere"}).status_code
+        == 404
+    )
+    assert authorized_client.delete("/spots/9999").status_code == 404
+
+
+def test_search_spots(authorized_client, create_test_spots):
+    def search(q: str) -> list[str]:
+        response = authorized_client.get("/spots/search", params={"q": q})
+        assert response.status_code == 200
+        return [spot["name"] for spot in response.json()]
+
+    assert search("ta") == ["Tarifa"]
+    # a later word of the name
+    assert search("gou") == ["El Gouna"]
+    # typos
+    assert search("jastrania") == ["Jastarnia"]
+    assert search("tariffa") == ["Tarifa"]
+    assert search("xyz") == []
+
+    spot_id = create_test_spots[0]["id"]
+    authorized_client.patch(f"/spots/{spot_id}", json={"name": "Hel Peninsula"})
+    assert search("hel") == ["Hel", "Hel Peninsula"]
+    authorized_client.delete(f"/spots/{spot_id}")
+    assert search("hel") == ["Hel"]
+
+
+def test_search_follows_other_workers(authorized_client, create_test_spots, session):
+    def search(q: str) -> list[str]:
+        return [
+            spot["name"]
+            for spot in authorized_client.get("/spots/search", params={"q": q}).json()
+        ]
+
+    assert search("tarifa") == ["Tarifa"]
+    # renamed by another worker: only the geometry version tells
+    session.execute(
+        update(models.Spot)
+        .where(models.Spot.id == create_test_spots[0]["id"])
+        .values(name="Valdevaqueros")
+    )
+    catalog.bump_geometry(session)
+    session.commit()
+    assert search("tarifa") == []
+    assert search("valdev") == ["Valdevaqueros"]
+
+
+def test_search_applies_own_writes(authorized_client, create_test_spots, monkeypatch):
+    loads = []
+    load_rows = search.load_rows
+    monkeypatch.setattr(
+        search, "load_rows", lambda db: loads.append(1) or load_rows(db)
+    )
+    authorized_client.get("/spots/search", params={"q": "tarifa"})
+    authorized_client.patch(
+        f"/spots/{create_test_spots[0]['id']}", json={"name": "Valdevaqueros"}
+    )
+    response = authorized_client.get("/spots/search", params={"q": "valdev"})
+    assert [spot["name"] for spot in response.json()] == ["Valdevaqueros"]
+    assert len(loads) == 1
+
+
+def test_trigram_search_normalizes_like_name_index():
+    stmt = search.trigram_search(select(models.Spot.id), " Tárifa  BEACH", 5)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert "spot_name_key(spots.name) LIKE" in sql
+    assert "spot_name_key(spots.name) ~" in sql
+    assert set(params.values()) >= {"tarifa beach", r"\mtarifa\ beach"}
+    assert search.trigram_search(select(models.Spot.id), " ", 5)._limit == 0
+
+
+def test_name_index_ranks_prefixes_before_similar_names():
+    index = NameIndex()
+    index.rebuild(
+        [(1, "Tarifa Beach"), (2, "Tarifa"), (3, "Los Lances Tarifa"), (4, "Tarita")]
+    )
+    assert index.search("tarif", 10) == [2, 1, 3, 4]
+    assert index.search("TARIF", 2) == [2, 1]
+    index.remove(2)
+    index.add(5, "Tárifa Norte")
+    assert index.search("tarifa", 10) == [1, 5, 3, 4]
+
+
+def test_top_spots_follow_favourites(
+    client, authorized_client, create_test_users, create_test_spots
+):
+    hel, jastarnia = (spot["id"] for spot in create_test_spots[1:3])
+    authorized_client.post("/users/add_spots", json={"spot_ids": [hel, jastarnia]})
+    other = create_test_users[1]
+    token = client.post(
+        "/login", data={"username": other["email"], "password": other["password"]}
+    ).json()["access_token"]
+    client.post(f"/users/add_spot/{hel}", headers={"Authorization": f"Bearer {token}"})
+
+    def top(**params) -> list[tuple[str, int]]:
+        response = authorized_client.get("/spots/top", params=params)
+        assert response.status_code == 200
+        return [(spot["name"], spot["favourite_count"]) for spot in response.json()]
+
+    assert top(limit=3) == [("Hel", 2), ("Jastarnia", 1), ("Tarifa", 0)]
+    assert top(country="Poland") == [("Hel", 2), ("Jastarnia", 1)]
+    assert authorized_client.get(f"/spots/{hel}").json()["favourite_count"] == 2
+
+    authorized_client.post("/users/remove_spots", json={"spot_ids": [hel]})
+    authorized_client.delete(f"/users/{other['id']}")
+    assert top(country="PL") == [("Jastarnia", 1), ("Hel", 0)]
+    assert (
+        authorized_client.get("/spots/top", params={"country": "X"}).status_code == 422
+    )
+
+
+def test_favourites_keep_spot_indexes(session, authorized_client, create_test_spots):
+    spot_id = create_test_spots[0]["id"]
+    point = {"points": [{"latitude": 36.0, "longitude": -5.6}]}
+    authorized_client.get("/spots/nearby", params={"lat": 36.0, "lon": -5.6})
+    authorized_client.post("/spots/nearest", json=point)
+    geometry = catalog.geometry_version(session)
+    arrays = distances.catalog_arrays.get(geometry, list)
+    assert len(arrays) == len(create_test_spots)
+    etag = authorized_client.get("/spots/").headers["ETag"]
+
+    authorized_client.post(f"/users/add_spot/{spot_id}")
+    assert authorized_client.get("/spots/").headers["ETag"] != etag
+    assert catalog.geometry_version(session) == geometry
+    assert spatial.spot_index.version == geometry
+    authorized_client.post("/spots/nearest", json=point)
+    assert distances.catalog_arrays.get(geometry, list) is arrays
+
+
+def test_reconcile_favourite_counts(session, authorized_client, create_test_spots):
+    spot_id = create_test_spots[0]["id"]
+    authorized_client.post(f"/users/add_spot/{spot_id}")
+    session.execute(update(models.Spot).values(favourite_count=5))
+    session.commit()
+
+    assert favourites.reconcile(session) == len(create_test_spots)
+    counts = session.scalars(
+        select(models.Spot.favourite_count).order_by(models.Spot.id)
+    )
+    assert counts.all() == [1, 0, 0, 0]
+    assert favourites.reconcile(session) == 0
@@ -1,4 +1,5 @@
 from .. import schemas
+from ..spatial import haversine_km
 import pytest
 
 
@@ -39,3 +40,119 @@ def test_invalid_create_user(client, email, name, password, result):
         "/users/", json={"email": email, "name": name, "password": password}
     )
     assert response.status_code == result
+
+
+def test_get_users_pages(client, create_test_users):
+    first_page = client.get("/users/", params={"limit": 1})
+    assert [user["id"] for user in first_page.json()] == [create_test_users[0]["id"]]
+
+    last_page = client.get(
+        "/users/", params={"limit": 1, "after": first_page.headers["X-Next-Cursor"]}
+    )
+    assert [user["id"] for user in last_page.json()] == [create_test_users[1]["id"]]
+    assert "X-Next-Cursor" not in last_page.headers
+
+
+def test_get_users_stream(client, create_test_users):
+    response = client.get("/users/", params={"stream": True})
+    assert response.status_code == 200
+    assert [user["email"] for user in response.json()] == [
+        user["email"] for user in create_test_users
+    ]
+
+
+def test_get_user_spots(authorized_client, create_test_users, create_test_spots):
+    for spot in create_test_spots[:2]:
+        response = authorized_client.post(f"/users/add_spot/{spot['id']}")
+        assert response.status_code == 201
+    response = authorized_client.get("/users/spots")
+    assert response.status_code == 200
+    user = response.json()
+    assert user["email"] == create_test_users[0]["email"]
+    assert set(user) == {"id", "email", "name", "active", "created_at", "spots"}
+    assert sorted(user["spots"], key=lambda spot: spot["id"]) == [
+        {**spot, "favourite_count": 1} for spot in create_test_spots[:2]
+    ]
+
+
+def test_add_spot_to_user_conflicts(authorized_client, create_test_spots):
+    spot_id = create_test_spots[0]["id"]
+    assert authorized_client.post(f"/users/add_spot/{spot_id}").status_code == 201
+    assert authorized_client.post(f"/users/add_spot/{spot_id}").status_code == 409
+    assert authorized_client.post("/users/add_spot/9999").status_code == 404
+
+
+def test_add_and_remove_spots(authorized_client, create_test_spots):
+    first, second, third = (spot["id"] for spot in create_test_spots[:3])
+    authorized_client.post(f"/users/add_spot/{first}")
+
+    response = authorized_client.post(
+        "/users/add_spots", json={"spot_ids": [first, second, third, second, 9999]}
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "added": [second, third],
+        "already_present": [first],
+        "missing": [9999],
+    }
+    spots = authorized_client.get("/users/spots").json()["spots"]
+    assert {spot["id"] for spot in spots} == {first, second, third}
+
+    response = authorized_client.post(
+        "/users/remove_spots", json={"spot_ids": [second, 9999]}
+    )
+    assert response.json() == {"removed": [second], "not_present": [9999]}
+    spots = authorized_client.get("/users/spots").json()["spots"]
+    assert {spot["id"] for spot in spots} == {first, third}
+
+
+def test_user_spot_distances(authorized_client, create_test_spots):
+    tarifa, hel, jastarnia, _ = create_test_spots
+    authorized_client.post(
+        "/users/add_spots",
+        json={"spot_ids": [jastarnia["id"], tarifa["id"], hel["id"]]},
+    )
+
+    matrix = authorized_client.get("/users/spots/distances").json()
+    assert matrix["spot_ids"] == [tarifa["id"], hel["id"], jastarnia["id"]]
+    spots = [tarifa, hel, jastarnia]
+    for i, a in enumerate(spots):
+        for j, b in enumerate(spots):
+            assert matrix["distances_km"][i][j] == pytest.approx(
+                haversine_km(
+                    a["latitude"], a["longitude"], b["latitude"], b["longitude"]
+                )
+            )
+
+    closest = authorized_client.get(
+        "/users/spots/closest", params={"lat": 54.79, "lon": 18.40, "limit": 2}
+    ).json()
+    assert [spot["name"] for spot in closest] == ["Jastarnia", "Hel"]
+    assert closest[0]["distance_km"] < closest[1]["distance_km"]
+
+
+def test_user_spot_distances_without_spots(authorized_client):
+    assert authorized_client.get("/users/spots/distances").json() == {
+        "spot_ids": [],
+        "distances_km": [],
+    }
+    params = {"lat": 0, "lon": 0}
+    assert authorized_client.get("/users/spots/closest", params=params).json() == []
+
+
+def test_add_spots_validates_batch(authorized_client):
+    response = authorized_client.post("/users/add_spots", json={"spot_ids": []})
+    assert response.status_code == 422
+
+
+def test_update_and_delete_user(client, create_test_users):
+    user = create_test_users[0]
+    response = client.patch(f"/users/{user['id']}", json={"name": "Renamed"})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Renamed"
+    assert response.json()["email"] == user["email"]
+    assert client.patch(f"/users/{user['id']}", json={}).json()["name"] == "Renamed"
+    assert client.patch("/users/9999", json={"name": "Nobody"}).status_code == 404
+
+    assert client.delete(f"/users/{user['id']}").status_code == 204
+    assert client.delete(f"/users/{user['id']}").status_code == 404
@@ -1,12 +1,126 @@
-from passlib.context import CryptContext
+import multiprocessing
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+from typing import TYPE_CHECKING, TypeVar
 
+from fastapi import HTTPException, status
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .config import settings
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+T = TypeVar("T")
+
+
+@cache
+def crypt_context() -> "CryptContext":
+    """Built on first use, passlib is only imported by processes that hash."""
+    from passlib.context import CryptContext
+
+    # min/max rounds make hashes of any other cost report needs_update
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=settings.bcrypt_rounds,
+        bcrypt__min_rounds=settings.bcrypt_rounds,
+        bcrypt__max_rounds=settings.bcrypt_rounds,
+    )
+
+
+def _hash(password: str) -> str:
+    return crypt_context().hash(password)
+
+
+def _load_context() -> None:
+    crypt_context()
+
+
+def _verify_and_update(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    return crypt_context().verify_and_update(plain_password, hashed_password)
+
+
+class HashingPool:
+    """
+    Runs bcrypt in worker processes, off the GIL of the serving process.
+
+    At most `workers + queue_size` calls are in flight; further calls are
+    rejected with 503 instead of piling up in the threadpool.
+    With `workers=0` hashing runs inline.
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max(workers + queue_size, 1))
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn, forking a process running server threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def run(self, fn: Callable[..., T], *args) -> T:
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password operations in progress",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def start(self) -> None:
+        """Spawn the worker processes ahead of the first password operation."""
+        if self.workers:
+            executor = self._get_executor()
+            # each submit without an idle worker spawns one more process
+            futures = [executor.submit(_load_context) for _ in range(self.workers)]
+            for future in futures:
+                future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+hashing_pool = HashingPool(
+    workers=(
+        os.cpu_count() or 1
+        if settings.password_hash_workers is None
+        else settings.password_hash_workers
+    ),
+    queue_size=settings.password_hash_queue_size,
+)
 
 
 def get_password_hash(password) -> str:
-    return pwd_context.hash(password)
+    return hashing_pool.run(_hash, password)
 
 
 def verify_password(plain_password, hashed_password) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    verified, _ = verify_and_update_password(plain_password, hashed_password)
+    return verified
+
+
+def verify_and_update_password(
+    plain_password, hashed_password
+) -> tuple[bool, str | None]:
+    """Verify a password, returning a new hash if the stored one is outdated."""
+    return hashing_pool.run(_verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,146 @@
+"""Database seeding and app setup shared by the route benchmarks.
+
+The app is served in-process against its own database: a fresh SQLite file
+by default, or any DSN given with --dsn, e.g. a local Postgres database
+created for benchmarking. Results carry the commit and scale they were
+measured at, so runs can be compared across commits.
+"""
+
+import argparse
+import math
+import os
+import statistics
+import subprocess
+import tempfile
+from collections import Counter
+
+PASSWORD = "benchmark-password"
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--dsn", help="database to run against, SQLite by default")
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="drop and recreate the tables of --dsn before seeding",
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--spots", type=int, default=5000)
+    parser.add_argument("--favourites", type=int, default=20, help="spots per user")
+    # low cost by default, so login measures the route rather than bcrypt
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+
+
+def email(user: int) -> str:
+    return f"user{user}@example.com"
+
+
+def seed(engine, users: int, spots: int, favourites: int) -> None:
+    """Insert users, spots and `favourites` spots per user with Core."""
+    from sqlalchemy import insert
+
+    from backend import models, utils
+
+    password = utils._hash(PASSWORD)
+    user_spots = [
+        {"user_id": user, "spot_id": (user * favourites + i) % spots + 1}
+        for user in range(1, users + 1)
+        for i in range(min(favourites, spots))
+    ]
+    favourite_counts = Counter(row["spot_id"] for row in user_spots)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(models.User),
+            [
+                {"name": f"User {i}", "email": email(i), "password": password}
+                for i in range(1, users + 1)
+            ],
+        )
+        connection.execute(
+            insert(models.Spot),
+            [
+                {
+                    "latitude": round((i * 7.31) % 180 - 90, 4),
+                    "longitude": round((i * 13.17) % 360 - 180, 4),
+                    "name": f"Spot {i}",
+                    "country": "PL",
+                    "favourite_count": favourite_counts[i],
+                }
+                for i in range(1, spots + 1)
+            ],
+        )
+        connection.execute(insert(models.UserSpots), user_spots)
+        connection.execute(insert(models.CatalogVersion), {"id": 1, "version": 1})
+
+
+def setup(args: argparse.Namespace):
+    """Seed a database and return the app serving it."""
+    # read by backend.config, before anything imports it
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    # every client comes from one address, rate limits would only answer 429
+    os.environ.setdefault("ADMISSION_RATE_LIMITS", "{}")
+
+    from sqlalchemy import create_engine, inspect
+    from sqlalchemy.orm import sessionmaker
+
+    from backend.database import Base, get_db
+    from backend.main import app
+
+    dsn = args.dsn or f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+    engine = create_engine(dsn)
+    if args.reset:
+        Base.metadata.drop_all(engine)
+    elif args.dsn and inspect(engine).has_table("spots"):
+        raise SystemExit(f"{args.dsn} already has tables, pass --reset to drop them")
+    Base.metadata.create_all(engine)
+    seed(engine, args.users, args.spots, args.favourites)
+
+    BenchmarkSession = sessionmaker(autoflush=False, bind=engine)
+
+    def get_benchmark_db():
+        with BenchmarkSession() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_benchmark_db
+    return app, engine
+
+
+def environment(args: argparse.Namespace, engine) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "database": engine.dialect.name,
+        "users": args.users,
+        "spots": args.spots,
+        "favourites": args.favourites,
+        "bcrypt_rounds": args.bcrypt_rounds,
+    }
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)]
+
+
+def summarize(latencies_ms: list[float], seconds: float | None = None) -> dict:
+    values = sorted(latencies_ms)
+    summary = {
+        "requests": len(values),
+        "mean_ms": round(statistics.fmean(values), 3),
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3),
+    }
+    if seconds:
+        summary["requests_per_sec"] = round(len(values) / seconds, 2)
+    return summary
@@ -0,0 +1,77 @@
+"""Password hashing throughput.
+
+    python -m benchmarks.hashing --rounds 12 --seconds 5
+
+Reports bcrypt hashes/sec inline (one core) and through utils.HashingPool
+with one worker per core, as JSON.
+"""
+
+import argparse
+import json
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+PASSWORD = "benchmark-password"
+
+
+def measure(hash_password: Callable[[str], str], seconds: float, clients: int) -> float:
+    """Hash from `clients` threads for `seconds`, return hashes per second."""
+
+    def client() -> int:
+        hashes = 0
+        while time.perf_counter() < deadline:
+            hash_password(PASSWORD)
+            hashes += 1
+        return hashes
+
+    start = time.perf_counter()
+    deadline = start + seconds
+    with ThreadPoolExecutor(clients) as executor:
+        futures = [executor.submit(client) for _ in range(clients)]
+        total = sum(future.result() for future in futures)
+    return total / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    # read by backend.config in this process and in the spawned workers
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    from backend import utils
+
+    pool = utils.HashingPool(workers=args.workers, queue_size=args.workers)
+    try:
+        pool.run(utils._hash, PASSWORD)  # start the workers before measuring
+        pooled = measure(
+            lambda password: pool.run(utils._hash, password),
+            args.seconds,
+            args.workers,
+        )
+    finally:
+        pool.shutdown()
+    inline = measure(utils._hash, args.seconds, 1)
+
+    print(
+        json.dumps(
+            {
+                "rounds": args.rounds,
+                "inline": {"hashes_per_sec": round(inline, 2)},
+                "pool": {
+                    "workers": args.workers,
+                    "hashes_per_sec": round(pooled, 2),
+                    "hashes_per_sec_per_core": round(pooled / args.workers, 2),
+                },
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Concurrent load generator driving the ASGI app in-process.
+
+    python -m benchmarks.load --clients 32 --seconds 20
+
+Seeds a database (see benchmarks.harness), logs in one client per seeded
+user (up to --clients) and has them issue a weighted mix of requests
+through httpx's ASGI transport for --seconds. Reports latency percentiles
+and throughput overall and per route as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+from . import harness
+
+# (route, weight), reads dominate like in production
+MIX = [
+    ("GET /spots/", 40),
+    ("GET /spots/{id}", 25),
+    ("GET /spots/nearby", 10),
+    ("GET /users/spots", 15),
+    ("PATCH /spots/{id}", 5),
+    ("POST /login", 5),
+]
+
+
+class LoginFailed(Exception):
+    pass
+
+
+async def run(app, args: argparse.Namespace) -> dict:
+    import httpx
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    routes, weights = zip(*MIX, strict=True)
+
+    async def client(number: int) -> None:
+        rng = random.Random(number)
+        user = number % args.users + 1
+        login = {"username": harness.email(user), "password": harness.PASSWORD}
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as http:
+            response = await http.post("/login", data=login)
+            if response.status_code != 200:
+                await logged_in.abort()
+                raise LoginFailed(
+                    f"login of {login['username']} failed: "
+                    f"{response.status_code} {response.text}"
+                )
+            http.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+            # the clock starts once every client is logged in
+            await logged_in.wait()
+            await started.wait()
+            while time.perf_counter() < deadline:
+                route = rng.choices(routes, weights)[0]
+                method, path = route.split(" ")
+                spot_id = rng.randint(1, args.spots)
+                kwargs: dict = {}
+                if route == "GET /spots/nearby":
+                    kwargs["params"] = {
+                        "lat": rng.uniform(-90, 90),
+                        "lon": rng.uniform(-180, 180),
+                    }
+                elif route == "PATCH /spots/{id}":
+                    kwargs["json"] = {"latitude": round(rng.uniform(-90, 90), 4)}
+                elif route == "POST /login":
+                    kwargs["data"] = login
+                began = time.perf_counter()
+                response = await http.request(
+                    method, path.replace("{id}", str(spot_id)), **kwargs
+                )
+                latencies[route].append((time.perf_counter() - began) * 1000)
+                if response.status_code >= 400:
+                    errors[route] += 1
+
+    logged_in = asyncio.Barrier(args.clients + 1)
+    started = asyncio.Event()
+    deadline = float("inf")
+    tasks = [asyncio.create_task(client(number)) for number in range(args.clients)]
+    try:
+        await logged_in.wait()
+    except asyncio.BrokenBarrierError:
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, LoginFailed):
+                raise SystemExit(str(result)) from None
+        raise
+    began = time.perf_counter()
+    deadline = began + args.seconds
+    started.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - began
+
+    return {
+        "clients": args.clients,
+        "seconds": round(elapsed, 3),
+        "overall": harness.summarize(
+            [value for values in latencies.values() for value in values], elapsed
+        ),
+        "routes": {
+            route: {**harness.summarize(values, elapsed), "errors": errors[route]}
+            for route, values in sorted(latencies.items())
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    harness.add_arguments(parser)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+
+    app, engine = harness.setup(args)
+    report = asyncio.run(run(app, args))
+    print(
+        json.dumps(
+            {"environment": harness.environment(args, engine), **report}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Per-handler micro-benchmarks through the full ASGI stack.
+
+    python -m benchmarks.routes --users 1000 --spots 5000 --iterations 500
+
+Seeds a database (see benchmarks.harness) and calls each handler
+`--iterations` times in sequence from one client, reporting latency
+percentiles per handler as JSON.
+"""
+
+import argparse
+import json
+import random
+import time
+
+from . import harness
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    harness.add_arguments(parser)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--only", nargs="*", help="handlers to run, all by default")
+    args = parser.parse_args()
+
+    app, engine = harness.setup(args)
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    login = {"username": harness.email(1), "password": harness.PASSWORD}
+    token = client.post("/login", data=login).json()["access_token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+    rng = random.Random(0)
+    # spots user 1 does not have yet, see harness.seed
+    new_favourites = iter(
+        (2 * args.favourites + i) % args.spots + 1
+        for i in range(args.spots - args.favourites)
+    )
+
+    handlers = {
+        "login": lambda: client.post("/login", data=login),
+        "get_spots": lambda: client.get("/spots/"),
+        "get_user_spots": lambda: client.get("/users/spots"),
+        "add_spot_to_user": lambda: client.post(
+            f"/users/add_spot/{next(new_favourites)}"
+        ),
+        "update_spot": lambda: client.patch(
+            f"/spots/{rng.randint(1, args.spots)}",
+            json={"latitude": round(rng.uniform(-90, 90), 4)},
+        ),
+    }
+    iterations = {
+        "add_spot_to_user": min(args.iterations, args.spots - args.favourites)
+    }
+
+    results = {}
+    for name, call in handlers.items():
+        if args.only and name not in args.only:
+            continue
+        latencies, statuses = [], set()
+        for _ in range(iterations.get(name, args.iterations)):
+            start = time.perf_counter()
+            response = call()
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses.add(response.status_code)
+        results[name] = {**harness.summarize(latencies), "statuses": sorted(statuses)}
+
+    print(
+        json.dumps(
+            {"environment": harness.environment(args, engine), "handlers": results},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""List endpoint serialization: ORM + response_model against Core + orjson.
+
+    python -m benchmarks.serialization --spots 5000 --users 5000 --seconds 3
+
+Seeds an in-memory SQLite database and times building the response body of
+GET /spots/, GET /users/ and GET /users/spots both ways, reporting the median
+milliseconds per request as JSON. The ORM path reproduces what FastAPI does
+with a response_model: hydrate ORM objects, validate them with from_attributes,
+dump them in JSON mode and encode with json.dumps.
+"""
+
+import argparse
+import json
+import statistics
+import time
+from collections.abc import Callable
+
+PAGE_SIZE = 1000
+
+
+def measure(build: Callable[[], bytes], seconds: float) -> float:
+    """Call `build` repeatedly for `seconds`, return the median ms per call."""
+    timings = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline or len(timings) < 3:
+        start = time.perf_counter()
+        build()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--spots", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    import orjson
+    from pydantic import TypeAdapter
+    from sqlalchemy import create_engine, insert, select
+    from sqlalchemy.orm import Session, selectinload
+    from sqlalchemy.pool import StaticPool
+
+    from backend import models, pagination, schemas
+    from backend.database import Base
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.execute(
+            insert(models.Spot),
+            [
+                {
+                    "latitude": (i % 180) - 90 + 0.5,
+                    "longitude": (i % 360) - 180 + 0.5,
+                    "name": f"Spot {i}",
+                    "country": "Poland",
+                }
+                for i in range(args.spots)
+            ],
+        )
+        db.execute(
+            insert(models.User),
+            [
+                {"name": f"User {i}", "email": f"user{i}@example.com", "password": "x"}
+                for i in range(args.users)
+            ],
+        )
+        db.execute(
+            insert(models.UserSpots),
+            [{"user_id": 1, "spot_id": i + 1} for i in range(args.spots)],
+        )
+        db.commit()
+
+    def orm_body(adapter: TypeAdapter, value) -> bytes:
+        validated = adapter.validate_python(value, from_attributes=True)
+        return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+    spot_list = TypeAdapter(list[schemas.SpotOut])
+    user_list = TypeAdapter(list[schemas.UserOut])
+    user_with_spots = TypeAdapter(schemas.UserWithSpots)
+    spot_columns = pagination.columns(schemas.SpotOut, models.Spot)
+    user_columns = pagination.columns(schemas.UserOut, models.User)
+
+    # a fresh session per request, so the identity map starts empty
+    def spots_orm() -> bytes:
+        with Session(engine) as db:
+            spots = db.query(models.Spot).order_by(models.Spot.id).limit(PAGE_SIZE)
+            return orm_body(spot_list, spots.all())
+
+    def spots_core() -> bytes:
+        with Session(engine) as db:
+            stmt = select(*spot_columns).order_by(models.Spot.id).limit(PAGE_SIZE)
+            return pagination.dump_rows(db.execute(stmt).all())
+
+    def users_orm() -> bytes:
+        with Session(engine) as db:
+            users = db.query(models.User).order_by(models.User.id).limit(PAGE_SIZE)
+            return orm_body(user_list, users.all())
+
+    def users_core() -> bytes:
+        with Session(engine) as db:
+            stmt = select(*user_columns).order_by(models.User.id).limit(PAGE_SIZE)
+            return pagination.dump_rows(db.execute(stmt).all())
+
+    def user_spots_orm() -> bytes:
+        with Session(engine) as db:
+            user = (
+                db.query(models.User)
+                .options(selectinload(models.User.spots))
+                .filter(models.User.id == 1)
+                .first()
+            )
+            return orm_body(user_with_spots, user)
+
+    def user_spots_core() -> bytes:
+        with Session(engine) as db:
+            user = db.execute(select(*user_columns).where(models.User.id == 1)).one()
+            spots = db.execute(
+                select(*spot_columns)
+                .join(models.UserSpots, models.UserSpots.spot_id == models.Spot.id)
+                .where(models.UserSpots.user_id == 1)
+            )
+            return orjson.dumps(
+                {**user._asdict(), "spots": [spot._asdict() for spot in spots]}
+            )
+
+    results = {}
+    for endpoint, orm, core in [
+        ("GET /spots/", spots_orm, spots_core),
+        ("GET /users/", users_orm, users_core),
+        ("GET /users/spots", user_spots_orm, user_spots_core),
+    ]:
+        orm_ms, core_ms = measure(orm, args.seconds), measure(core, args.seconds)
+        results[endpoint] = {
+            "orm_ms": round(orm_ms, 3),
+            "core_ms": round(core_ms, 3),
+            "speedup": round(orm_ms / core_ms, 2),
+        }
+
+    print(
+        json.dumps(
+            {"spots": args.spots, "users": args.users, "results": results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()